@@ -0,0 +1,264 @@
+"""
+Async versions of the CRUD endpoints
+
+Enabled with DATABASE_ASYNC=true. The routes are registered ahead of the
+sync endpoints in main.py and therefore take precedence for the same paths.
+Each endpoint runs the shared crud.py function through AsyncSession.run_sync,
+so database I/O waits on the event loop instead of holding a threadpool
+worker for the whole request.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import crud
+import fastjson
+import schemas
+import sync
+import versions
+from auth import CurrentUser, get_current_user
+from database import get_async_db
+
+router = APIRouter()
+
+
+# ===== Projects Endpoints =====
+
+@router.get("/api/projects", response_model=List[schemas.ProjectResponse])
+async def get_projects(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all projects for current user"""
+    etag = await db.run_sync(versions.etag, current_user.id, versions.PROJECTS)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    projects = await db.run_sync(crud.list_projects, current_user.id, as_rows=fastjson.FAST_JSON)
+    if fastjson.FAST_JSON:
+        return fastjson.render(projects, response)
+    return fastjson.validated(schemas.ProjectListAdapter, projects, response)
+
+
+@router.post("/api/projects", response_model=schemas.ProjectResponse, status_code=status.HTTP_201_CREATED)
+async def create_project(
+    project: schemas.ProjectCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new project"""
+    return await db.run_sync(crud.create_project, current_user.id, project)
+
+
+@router.patch("/api/projects/{project_id}", response_model=schemas.ProjectResponse)
+async def update_project_status(
+    project_id: int,
+    project_update: schemas.ProjectUpdate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update project completion status"""
+    return await db.run_sync(crud.update_project, current_user.id, project_id, project_update)
+
+
+@router.delete("/api/projects/{project_id}")
+async def delete_project(
+    project_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a project (cascade deletes todos and time entries)"""
+    await db.run_sync(crud.delete_project, current_user.id, project_id)
+    return {"message": "Project deleted successfully"}
+
+
+# ===== Todos Endpoints =====
+
+@router.get("/api/todos", response_model=List[schemas.TodoResponse])
+async def get_todos(
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all todos for current user's projects"""
+    etag = await db.run_sync(versions.etag, current_user.id, versions.TODOS)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    todos = await db.run_sync(crud.list_todos, current_user.id, as_rows=fastjson.FAST_JSON)
+    if fastjson.FAST_JSON:
+        return fastjson.render(todos, response)
+    return fastjson.validated(schemas.TodoListAdapter, todos, response)
+
+
+@router.post("/api/todos", response_model=schemas.TodoResponse, status_code=status.HTTP_201_CREATED)
+async def create_todo(
+    todo: schemas.TodoCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new todo"""
+    return await db.run_sync(crud.create_todo, current_user.id, todo)
+
+
+@router.patch("/api/todos/{todo_id}", response_model=schemas.TodoResponse)
+async def update_todo_status(
+    todo_id: int,
+    todo_update: schemas.TodoUpdate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update todo status (todo | in-progress | done)"""
+    return await db.run_sync(crud.update_todo, current_user.id, todo_id, todo_update)
+
+
+@router.delete("/api/todos/{todo_id}")
+async def delete_todo(
+    todo_id: int,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete a todo"""
+    await db.run_sync(crud.delete_todo, current_user.id, todo_id)
+    return {"message": "Todo deleted successfully"}
+
+
+# ===== TimeEntries Endpoints =====
+
+@router.get("/api/timeentries", response_model=schemas.TimeEntryPage)
+async def get_time_entries(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    project_id: Optional[int] = None,
+    todo_id: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get time entries for current user, newest first (keyset paginated)"""
+    etag = await db.run_sync(versions.etag, current_user.id, versions.TIMEENTRIES, variant=request.url.query)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    page = await db.run_sync(
+        crud.list_time_entries, current_user.id, limit,
+        cursor=cursor, from_=from_, to=to, project_id=project_id, todo_id=todo_id,
+        as_rows=fastjson.FAST_JSON
+    )
+    if fastjson.FAST_JSON:
+        return fastjson.render(page, response)
+    return fastjson.validated(schemas.TimeEntryPageAdapter, page, response)
+
+
+@router.post("/api/timeentries", response_model=schemas.TimeEntryResponse, status_code=status.HTTP_201_CREATED)
+async def create_time_entry(
+    entry: schemas.TimeEntryCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new time entry"""
+    return await db.run_sync(crud.create_time_entry, current_user.id, entry)
+
+
+@router.post("/api/timeentries/bulk", response_model=schemas.TimeEntryBulkResponse)
+async def bulk_create_time_entries(
+    batch: schemas.TimeEntryBulkCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create up to 1000 time entries in one transaction (offline sync).
+
+    Returns a result per item; entries whose idempotency_key was already
+    stored are reported as duplicates, so retrying a batch is safe.
+    """
+    return await db.run_sync(crud.bulk_create_time_entries, current_user.id, batch.entries)
+
+
+# ===== Sync Endpoints =====
+
+@router.get("/api/sync", response_model=schemas.SyncResponse)
+async def get_sync(
+    since: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get projects, todos and time entries changed since a watermark"""
+    return await db.run_sync(sync.changes_since, current_user.id, since)
+
+
+# ===== Timer Session Endpoints =====
+
+@router.get("/api/sessions/current", response_model=Optional[schemas.ActiveSessionResponse])
+async def get_current_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the running or paused timer session (null if there is none); cheap to poll"""
+    return await db.run_sync(crud.get_active_session, current_user.id)
+
+
+@router.post("/api/sessions/start", response_model=schemas.ActiveSessionResponse, status_code=status.HTTP_201_CREATED)
+async def start_session(
+    session: schemas.ActiveSessionStart,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start the timer on a todo (409 if a session is already active)"""
+    return await db.run_sync(crud.start_session, current_user.id, session)
+
+
+@router.post("/api/sessions/pause", response_model=schemas.ActiveSessionResponse)
+async def pause_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Pause the running timer session"""
+    return await db.run_sync(crud.pause_session, current_user.id)
+
+
+@router.post("/api/sessions/resume", response_model=schemas.ActiveSessionResponse)
+async def resume_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Resume the paused timer session"""
+    return await db.run_sync(crud.resume_session, current_user.id)
+
+
+@router.post("/api/sessions/stop", response_model=schemas.TimeEntryResponse, status_code=status.HTTP_201_CREATED)
+async def stop_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Stop the timer session and record the tracked time as a time entry"""
+    return await db.run_sync(crud.stop_session, current_user.id)
+
+
+# ===== Settings Endpoints =====
+
+@router.get("/api/settings", response_model=schemas.PomodoroSettingsResponse)
+async def get_settings(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get pomodoro settings for current user (creates default if not exists)"""
+    return await db.run_sync(crud.get_settings, current_user.id)
+
+
+@router.put("/api/settings", response_model=schemas.PomodoroSettingsResponse)
+async def update_settings(
+    settings_update: schemas.PomodoroSettingsUpdate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Update pomodoro settings for current user"""
+    return await db.run_sync(crud.update_settings, current_user.id, settings_update)
@@ -1,25 +1,108 @@
 """
 JWT Authentication utilities
 """
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from cache import TTLCache
 from database import get_db
 from models import User
+import invalidation
 import os
+import time
 
 # Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production-please-use-env-variable")
+DEFAULT_SECRET_KEY = "your-secret-key-change-in-production-please-use-env-variable"
+SECRET_KEY = os.getenv("SECRET_KEY") or DEFAULT_SECRET_KEY
+# development | test accept the built-in key, every other environment needs SECRET_KEY
+APP_ENV = os.getenv("APP_ENV", "production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
+# Authenticated-user cache (AUTH_CACHE_TTL=0 disables it)
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+
+def check_secret_key() -> None:
+    """Refuse to start with the built-in SECRET_KEY outside development and tests"""
+    if SECRET_KEY == DEFAULT_SECRET_KEY and APP_ENV not in ("development", "test"):
+        raise RuntimeError(
+            "SECRET_KEY is not set: tokens would be signed with the public default key. "
+            "Set SECRET_KEY (e.g. in .env, loaded by serve.py or uvicorn --env-file) "
+            "or APP_ENV=development for local use"
+        )
+
+
 # HTTP Bearer security scheme
 security = HTTPBearer()
 
 
+@dataclass(frozen=True)
+class CurrentUser:
+    """Lightweight, session-independent record of the authenticated user"""
+    id: int
+    username: str
+    created_at: datetime
+
+
+# token -> verified subject, so identical tokens skip the HMAC verification
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# subject (username) -> CurrentUser, so authenticated requests skip the user lookup
+_user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def invalidate_user(username: str) -> None:
+    """Drop a user from the cache after it was changed or deleted"""
+    _user_cache.delete(username)
+
+
+# Changes made by other worker processes
+invalidation.subscribe("user", invalidate_user)
+
+
+def clear_auth_cache() -> None:
+    """Drop all cached tokens and users"""
+    _token_cache.clear()
+    _user_cache.clear()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    """Keep the user caches of all workers consistent with ORM updates and deletes"""
+    # A renamed user must also disappear under its old name
+    for username in [target.username, *(inspect(target).attrs.username.history.deleted or ())]:
+        invalidate_user(username)
+        invalidation.publish(connection, "user", username)
+
+
+def _verify_token(token: str) -> Optional[str]:
+    """Return the subject of a valid token (cached until expiry), or None"""
+    username = _token_cache.get(token)
+    if username is not None:
+        return username
+
+    # Imported on first use: jose pulls in cryptography, ~40 ms of startup
+    from jose import JWTError, jwt
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    # Never cache a token beyond its own expiry
+    expires_in = payload.get("exp", 0) - time.time()
+    _token_cache.set(token, username, ttl=expires_in)
+    return username
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token
@@ -31,6 +114,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         Encoded JWT token string
     """
+    from jose import jwt
+
     to_encode = data.copy()
     
     if expires_delta:
@@ -46,16 +131,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> User:
+) -> CurrentUser:
     """
     Dependency to get the current authenticated user from JWT token
     
+    Token verification and the user lookup are cached for AUTH_CACHE_TTL
+    seconds, so repeated requests with the same token skip both.
+    
     Args:
         credentials: HTTP Authorization credentials (Bearer token)
         db: Database session
         
     Returns:
-        User object if authentication successful
+        CurrentUser record if authentication successful
         
     Raises:
         HTTPException: 401 if token invalid or user not found
@@ -66,21 +154,20 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Extract and decode token
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            raise credentials_exception
-            
-    except JWTError:
+    # Extract and verify token
+    username = _verify_token(credentials.credentials)
+    if username is None:
         raise credentials_exception
     
+    current_user = _user_cache.get(username)
+    if current_user is not None:
+        return current_user
+    
     # Find user in database
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
-        
-    return user
+    
+    current_user = CurrentUser(id=user.id, username=user.username, created_at=user.created_at)
+    _user_cache.set(username, current_user)
+    return current_user
@@ -0,0 +1,130 @@
+"""
+Synthetic dataset for load tests
+
+Creates users bench1..benchN (password BENCH_PASSWORD) with projects, todos
+and time entries spread over the last three years, then rebuilds the
+rollups and runs ANALYZE. Rows are generated and written in batches of
+BATCH_SIZE through database.execute_many, so 10M entries need neither
+10M objects in memory nor per-row ORM overhead.
+
+Run with: python -m benchmarks.dataset --database sqlite:///./bench.db [--users 100] [--entries 1000000]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import bindparam, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import Base, create_db_engine, execute_many
+from migrations import migrate
+from passwords import hash_password
+import models
+import rollups
+
+BENCH_PASSWORD = "bench-password"
+BATCH_SIZE = 50_000
+HISTORY_SECONDS = 3 * 365 * 86400
+COLORS = ["blue", "green", "red", "orange", "purple", "slate"]
+
+
+def _insert(table, names):
+    """(columns, INSERT with one bindparam per column) for execute_many"""
+    columns = [table.c[name] for name in names]
+    return columns, insert(table).values({c.name: bindparam(c.name, type_=c.type) for c in columns})
+
+
+def _batches(rows: Iterator[tuple], size: int = BATCH_SIZE) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db: Session, users: int, entries: int, projects_per_user: int = 5,
+             todos_per_project: int = 5, seed: int = 42) -> None:
+    """
+    Insert a synthetic dataset into an empty database and commit it
+
+    Ids are assigned here: user u owns projects (u-1)*P+1 .. u*P, project p
+    owns todos (p-1)*T+1 .. p*T. Each user gets entries/users entries on
+    random todos of their own, evenly spread over HISTORY_SECONDS.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    hashed = hash_password(BENCH_PASSWORD)
+    projects = users * projects_per_user
+    todos = projects * todos_per_project
+
+    tables = [
+        (models.User, ["id", "username", "hashed_password", "created_at"],
+         ((u, f"bench{u}", hashed, now) for u in range(1, users + 1))),
+        (models.Project, ["id", "user_id", "name", "color", "is_completed", "created_at", "updated_at"],
+         ((p, (p - 1) // projects_per_user + 1, f"Project {p}", COLORS[p % len(COLORS)], False, now, now)
+          for p in range(1, projects + 1))),
+        (models.Todo, ["id", "project_id", "title", "status", "created_at", "updated_at"],
+         ((t, (t - 1) // todos_per_project + 1, f"Todo {t}", "todo", now, now)
+          for t in range(1, todos + 1))),
+    ]
+
+    def entry_rows():
+        # Per user in time order, as entries are recorded in practice; this
+        # also keeps the (user_id, timestamp) index appends mostly sequential
+        user_todos = projects_per_user * todos_per_project
+        random = rng.random
+        for user_id in range(1, users + 1):
+            count = entries // users + (user_id <= entries % users)
+            step = HISTORY_SECONDS / max(count, 1)
+            start = now - timedelta(seconds=HISTORY_SECONDS)
+            first_todo = (user_id - 1) * user_todos + 1
+            for i in range(count):
+                todo_id = first_todo + int(random() * user_todos)
+                yield (
+                    user_id, todo_id, (todo_id - 1) // todos_per_project + 1, 300 + int(random() * 2700),
+                    start + timedelta(seconds=(i + random()) * step), now,
+                )
+
+    tables.append((models.TimeEntry, ["user_id", "todo_id", "project_id", "duration", "timestamp", "updated_at"],
+                   entry_rows()))
+
+    for model, names, rows in tables:
+        columns, stmt = _insert(model.__table__, names)
+        for batch in _batches(rows):
+            execute_many(db, stmt, columns, batch)
+            db.commit()
+    rollups.rebuild(db)
+    db.commit()
+    if db.get_bind().dialect.name in ("sqlite", "postgresql"):
+        db.connection().exec_driver_sql("ANALYZE")
+        db.commit()
+
+
+def run(url: str, users: int, entries: int) -> None:
+    """Create the schema at url and fill it"""
+    engine = create_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+    migrate(engine)
+    with sessionmaker(bind=engine)() as db:
+        if db.query(models.User.id).first() is not None:
+            raise SystemExit(f"{url} is not empty")
+        start = time.perf_counter()
+        generate(db, users, entries)
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    print(f"{users} users, {entries} time entries in {elapsed:.1f} s ({entries / elapsed:,.0f} entries/s)")
+    print(f"Log in as bench1..bench{users} with password {BENCH_PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", required=True, help="SQLAlchemy URL of an empty database")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.database, args.users, args.entries)
@@ -0,0 +1,76 @@
+"""
+Throughput benchmark for the streaming time entry import
+
+Generates a CSV file in the export format with the given number of rows
+spread over 20 projects x 10 todos, imports it into a scratch SQLite
+database (production pragma profile) and reports rows per second. A second
+import of the same file under tracemalloc reports the peak traced memory;
+it is kept separate because tracing slows the run several times.
+
+Run with: python -m benchmarks.imports [--rows 200000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine
+from migrations import migrate
+import imports
+import models
+
+
+def write_csv(path: str, rows: int) -> None:
+    """Write a synthetic import file"""
+    rng = random.Random(42)
+    start = datetime(2020, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("timestamp,duration,project_name,todo_title\n")
+        for i in range(rows):
+            project = rng.randint(1, 20)
+            timestamp = start + timedelta(seconds=i * 600)
+            f.write(f"{timestamp.isoformat()},{rng.randint(300, 3000)},Project {project},"
+                    f"Todo {project}-{rng.randint(1, 10)}\n")
+
+
+def run(rows: int) -> None:
+    """Import a generated file and report the throughput"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        migrate(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all([models.User(id=user_id, username=f"bench{user_id}", hashed_password="x")
+                    for user_id in (1, 2)])
+        db.commit()
+
+        path = os.path.join(tmp, "import.csv")
+        write_csv(path, rows)
+
+        start = time.perf_counter()
+        with open(path, "rb") as stream:
+            result = imports.import_time_entries(db, 1, stream, "csv")
+        elapsed = time.perf_counter() - start
+        assert result["imported"] == rows, result["errors"]
+        print(f"imported {rows} rows in {elapsed:.2f} s: {rows / elapsed:,.0f} rows/s")
+
+        tracemalloc.start()
+        with open(path, "rb") as stream:
+            imports.import_time_entries(db, 2, stream, "csv")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak traced memory {peak / 1024 / 1024:.1f} MiB")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,69 @@
+"""
+Import-time benchmark of the app (cold start and worker spawn)
+
+Imports a module in fresh interpreters with `python -X importtime`,
+reports the median cumulative import time and wall-clock time per process,
+and lists the slowest imports of the last run by self and cumulative time.
+Importing main must stay free of side effects, so this measures exactly
+what every worker pays before it can serve.
+
+Run with: python -m benchmarks.importtime [--module main] [--repeat 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for each line of -X importtime output"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Import module in a fresh interpreter: (wall-clock seconds, parsed imports)"""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise SystemExit(process.stderr)
+    return elapsed, parse(process.stderr)
+
+
+def run(module: str, repeat: int, top: int) -> None:
+    """Report median import and process time and the slowest imports"""
+    walls, totals = [], []
+    for _ in range(repeat):
+        wall, imports = measure(module)
+        walls.append(wall)
+        totals.append(next(cumulative for name, _, cumulative in imports if name.strip() == module))
+    print(f"import {module}: {statistics.median(totals) / 1000:.1f} ms "
+          f"(process {statistics.median(walls) * 1000:.1f} ms, median of {repeat})")
+
+    for title, key in (("self", 1), ("cumulative", 2)):
+        print(f"\nSlowest imports by {title} time (last run):")
+        for entry in sorted(imports, key=lambda item: item[key], reverse=True)[:top]:
+            print(f"{entry[key] / 1000:8.1f} ms  {entry[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    run(args.module, args.repeat, args.top)
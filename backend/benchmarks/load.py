@@ -0,0 +1,366 @@
+"""
+Load generator for the API endpoints
+
+Drives every endpoint of main.py with concurrent clients, one scenario at a
+time, for each level of a concurrency sweep and records latency
+percentiles (p50/p95/p99), throughput and errors as JSON. Use a database
+filled by benchmarks.dataset; write scenarios add rows to it, so run against
+a copy when results must be comparable.
+
+Untimed preparation (e.g. creating the projects a delete scenario removes)
+happens before each measurement; only the scenario's request is timed.
+Generator and server share the machine, so compare runs from one host.
+
+Run with:
+    python -m benchmarks.load run --database sqlite:///./bench.db --serve [--concurrency 1,8,32]
+        [--requests 200] [--scenarios projects_list,stats_daily] [--output results.json]
+    python -m benchmarks.load run --url http://127.0.0.1:8000 --users 10
+    python -m benchmarks.load compare baseline.json current.json [--threshold 0.15]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.dataset import BENCH_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Relative change that counts as a regression, and the p95 change in ms
+# below which differences are treated as noise
+DEFAULT_THRESHOLD = 0.15
+NOISE_FLOOR_MS = 1.0
+
+
+class BenchUser:
+    """A logged-in dataset user with one of their projects and todos"""
+
+    def __init__(self, username: str, token: str, project_id: int, todo_id: int):
+        self.username = username
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.project_id = project_id
+        self.todo_id = todo_id
+
+
+async def login(client: httpx.AsyncClient, username: str) -> BenchUser:
+    response = await client.post("/api/auth/login", json={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    todos = await client.get("/api/todos", headers={"Authorization": f"Bearer {token}"})
+    todo = todos.json()[0]
+    return BenchUser(username, token, todo["project_id"], todo["id"])
+
+
+# ===== Scenarios =====
+# Each prepares one request (untimed) and returns the httpx.request kwargs
+
+Prepare = Callable[[httpx.AsyncClient, BenchUser], Awaitable[dict]]
+
+
+def _get(url: str, **params) -> Prepare:
+    async def prepare(client, user):
+        return {"method": "GET", "url": url, "params": params}
+    return prepare
+
+
+async def _new_project(client, user) -> int:
+    response = await client.post("/api/projects", json={"name": "Load", "color": "slate"}, headers=user.headers)
+    return response.json()["id"]
+
+
+async def _new_todo(client, user) -> int:
+    response = await client.post("/api/todos", json={"project_id": user.project_id, "title": "Load"},
+                                 headers=user.headers)
+    return response.json()["id"]
+
+
+def _since(days: int) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+
+def _import_file() -> bytes:
+    start = datetime.utcnow() - timedelta(days=1)
+    lines = ["timestamp,duration,project_name,todo_title"]
+    lines += [f"{(start + timedelta(minutes=i)).isoformat()},60,Imported,Load" for i in range(100)]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def _register(client, user):
+    return {"method": "POST", "url": "/api/auth/register",
+            "json": {"username": f"load-{uuid.uuid4().hex[:12]}", "password": BENCH_PASSWORD}}
+
+
+async def _login(client, user):
+    return {"method": "POST", "url": "/api/auth/login",
+            "json": {"username": user.username, "password": BENCH_PASSWORD}}
+
+
+async def _create_project(client, user):
+    return {"method": "POST", "url": "/api/projects", "json": {"name": "Load", "color": "slate"}}
+
+
+async def _update_project(client, user):
+    return {"method": "PATCH", "url": f"/api/projects/{user.project_id}", "json": {"is_completed": False}}
+
+
+async def _delete_project(client, user):
+    return {"method": "DELETE", "url": f"/api/projects/{await _new_project(client, user)}"}
+
+
+async def _create_todo(client, user):
+    return {"method": "POST", "url": "/api/todos", "json": {"project_id": user.project_id, "title": "Load"}}
+
+
+async def _update_todo(client, user):
+    return {"method": "PATCH", "url": f"/api/todos/{user.todo_id}", "json": {"status": "in-progress"}}
+
+
+async def _delete_todo(client, user):
+    return {"method": "DELETE", "url": f"/api/todos/{await _new_todo(client, user)}"}
+
+
+async def _create_time_entry(client, user):
+    return {"method": "POST", "url": "/api/timeentries", "json": {"todo_id": user.todo_id, "duration": 1500}}
+
+
+async def _bulk_time_entries(client, user):
+    return {"method": "POST", "url": "/api/timeentries/bulk", "json": {"entries": [
+        {"todo_id": user.todo_id, "duration": 1500, "idempotency_key": uuid.uuid4().hex} for _ in range(100)
+    ]}}
+
+
+async def _import_time_entries(client, user):
+    return {"method": "POST", "url": "/api/timeentries/import", "params": {"format": "csv"},
+            "files": {"file": ("import.csv", _import_file(), "text/csv")}}
+
+
+async def _export_time_entries(client, user):
+    return {"method": "GET", "url": "/api/timeentries/export", "params": {"format": "csv", "from": _since(30)}}
+
+
+async def _time_entries_range(client, user):
+    return {"method": "GET", "url": "/api/timeentries", "params": {"from": _since(30)}}
+
+
+async def _update_settings(client, user):
+    return {"method": "PUT", "url": "/api/settings", "json": {"focus_duration": 25, "break_duration": 5}}
+
+
+SCENARIOS: Dict[str, Prepare] = {
+    "health": _get("/"),
+    "metrics": _get("/metrics"),
+    "register": _register,
+    "login": _login,
+    "me": _get("/api/auth/me"),
+    "projects_list": _get("/api/projects"),
+    "projects_create": _create_project,
+    "projects_update": _update_project,
+    "projects_delete": _delete_project,
+    "todos_list": _get("/api/todos"),
+    "todos_create": _create_todo,
+    "todos_update": _update_todo,
+    "todos_delete": _delete_todo,
+    "timeentries_list": _get("/api/timeentries"),
+    "timeentries_list_range": _time_entries_range,
+    "timeentries_create": _create_time_entry,
+    "timeentries_bulk": _bulk_time_entries,
+    "timeentries_import": _import_time_entries,
+    "timeentries_export": _export_time_entries,
+    "sync": _get("/api/sync"),
+    "sessions_current": _get("/api/sessions/current"),
+    "stats_today": _get("/api/stats/today"),
+    "stats_totals": _get("/api/stats/totals"),
+    "stats_projects": _get("/api/stats/projects"),
+    "stats_daily": _get("/api/stats/daily"),
+    "stats_top_todos": _get("/api/stats/top-todos"),
+    "settings_get": _get("/api/settings"),
+    "settings_update": _update_settings,
+}
+
+
+# ===== Measurement =====
+
+def percentiles(samples: List[float]) -> dict:
+    """p50/p95/p99 of latencies in seconds, as milliseconds"""
+    if len(samples) == 1:
+        samples = samples * 2
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {f"p{p}_ms": round(cuts[p - 1] * 1000, 3) for p in (50, 95, 99)}
+
+
+async def measure(client: httpx.AsyncClient, users: List[BenchUser], name: str,
+                  concurrency: int, requests: int) -> dict:
+    """Fire `requests` prepared requests of one scenario with `concurrency` workers"""
+    prepare = SCENARIOS[name]
+    prepared = [(users[i % len(users)], await prepare(client, users[i % len(users)])) for i in range(requests)]
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while prepared:
+            user, kwargs = prepared.pop()
+            start = time.perf_counter()
+            response = await client.request(headers=user.headers, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        **percentiles(latencies),
+    }
+
+
+async def run_sweep(url: str, usernames: List[str], scenarios: List[str],
+                    levels: List[int], requests: int) -> dict:
+    """Measure every scenario at every concurrency level"""
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        users = await asyncio.gather(*(login(client, username) for username in usernames))
+        results = []
+        for concurrency in levels:
+            for name in scenarios:
+                result = await measure(client, users, name, concurrency, requests)
+                print(f"{name:<24} c={concurrency:<4} {result['throughput_rps']:9.1f} req/s  "
+                      f"p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+                      f"{'  errors ' + str(result['errors']) if result['errors'] else ''}")
+                results.append(result)
+    return {
+        "meta": {
+            "url": url,
+            "started_at": datetime.utcnow().isoformat(),
+            "users": len(usernames),
+            "concurrency": levels,
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+@contextmanager
+def serve(database_url: str, port: int, workers: int):
+    """Run uvicorn against database_url in a subprocess until the block exits"""
+    env = {**os.environ, "DATABASE_URL": database_url, "LOG_LEVEL": "WARNING"}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(url + "/", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit("Server did not start")
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+# ===== Comparison =====
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Regressions of current against baseline, matched by scenario and concurrency"""
+    before = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = (result["scenario"], result["concurrency"])
+        old = before.get(key)
+        if old is None:
+            continue
+        label = f"{key[0]} c={key[1]}"
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if (result[metric] - old[metric] > NOISE_FLOOR_MS
+                    and result[metric] > old[metric] * (1 + threshold)):
+                regressions.append(f"{label}: {metric} {old[metric]:.2f} -> {result[metric]:.2f}")
+        if result["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{label}: throughput {old['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s")
+        if result["errors"] > old["errors"]:
+            regressions.append(f"{label}: errors {old['errors']} -> {result['errors']}")
+    return regressions
+
+
+def _run_command(args) -> None:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    usernames = [f"bench{u}" for u in range(1, args.users + 1)]
+
+    def sweep(url):
+        return asyncio.run(run_sweep(url, usernames, scenarios, levels, args.requests))
+
+    if args.serve:
+        with serve(args.database, args.port, args.workers) as url:
+            report = sweep(url)
+    else:
+        report = sweep(args.url)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def _compare_command(args) -> None:
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise SystemExit(1)
+    print("No regressions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="measure a concurrency sweep")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8000")
+    run_parser.add_argument("--serve", action="store_true", help="start uvicorn against --database")
+    run_parser.add_argument("--database", default="sqlite:///./bench.db")
+    run_parser.add_argument("--port", type=int, default=8765)
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--users", type=int, default=10, help="dataset users bench1..benchN to log in")
+    run_parser.add_argument("--concurrency", default="1,8,32")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    run_parser.add_argument("--scenarios", default="", help="comma separated, default all")
+    run_parser.add_argument("--output", default="load-results.json")
+    run_parser.set_defaults(handler=_run_command)
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    compare_parser.set_defaults(handler=_compare_command)
+
+    args = parser.parse_args()
+    args.handler(args)
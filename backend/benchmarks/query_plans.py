@@ -0,0 +1,199 @@
+"""
+Query plan benchmark for the hot list and stats queries
+
+Seeds a scratch SQLite database, applies the schema migrations and checks
+with EXPLAIN QUERY PLAN that every hot query is served by an index instead
+of a full table scan. Also reports the median execution time per query.
+
+Run with: python -m benchmarks.query_plans [--entries 100000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import Base, local_date
+from migrations import migrate
+import models
+import rollups
+
+
+# Query builders mirroring the endpoints in main.py: (name, builder, expected index)
+def _list_time_entries(db: Session, user_id: int):
+    return db.query(models.TimeEntry).filter(
+        models.TimeEntry.user_id == user_id
+    ).order_by(models.TimeEntry.timestamp.desc(), models.TimeEntry.id.desc()).limit(101)
+
+
+def _list_time_entries_range(db: Session, user_id: int):
+    now = datetime.utcnow()
+    return db.query(models.TimeEntry).filter(
+        models.TimeEntry.user_id == user_id,
+        models.TimeEntry.timestamp >= now - timedelta(days=30),
+        models.TimeEntry.timestamp < now
+    ).order_by(models.TimeEntry.timestamp.desc(), models.TimeEntry.id.desc()).limit(101)
+
+
+def _stats_today(db: Session, user_id: int):
+    rollup = models.TimeEntryRollup
+    now = datetime.utcnow()
+    return db.query(
+        func.coalesce(func.sum(rollup.total_seconds), 0),
+        func.coalesce(func.sum(rollup.session_count), 0)
+    ).filter(
+        rollup.user_id == user_id,
+        rollup.hour >= now - timedelta(days=1),
+        rollup.hour < now
+    )
+
+
+def _stats_totals(db: Session, user_id: int):
+    rollup = models.TimeEntryRollup
+    return db.query(func.sum(rollup.total_seconds), func.sum(rollup.session_count)).filter(
+        rollup.user_id == user_id
+    )
+
+
+def _stats_projects(db: Session, user_id: int):
+    rollup = models.TimeEntryRollup
+    return db.query(
+        models.Project.id, func.sum(rollup.total_seconds), func.sum(rollup.session_count)
+    ).join(
+        models.Project, models.Project.id == rollup.project_id
+    ).filter(rollup.user_id == user_id).group_by(models.Project.id)
+
+
+def _stats_daily(db: Session, user_id: int):
+    rollup = models.TimeEntryRollup
+    now = datetime.utcnow()
+    day = local_date(rollup.hour, -60).label("day")
+    return db.query(day, func.sum(rollup.total_seconds)).filter(
+        rollup.user_id == user_id,
+        rollup.hour >= now - timedelta(days=7),
+        rollup.hour < now
+    ).group_by(day)
+
+
+def _stats_daily_tz(db: Session, user_id: int):
+    # Offsets that are no whole hours (here UTC+05:30) group the time entries
+    now = datetime.utcnow()
+    day = local_date(models.TimeEntry.timestamp, 330).label("day")
+    return db.query(day, func.sum(models.TimeEntry.duration)).filter(
+        models.TimeEntry.user_id == user_id,
+        models.TimeEntry.timestamp >= now - timedelta(days=7),
+        models.TimeEntry.timestamp < now
+    ).group_by(day)
+
+
+def _list_projects(db: Session, user_id: int):
+    return db.query(models.Project).filter(models.Project.user_id == user_id)
+
+
+def _list_todos(db: Session, user_id: int):
+    return db.query(models.Todo).join(models.Project).filter(models.Project.user_id == user_id)
+
+
+# SQLite's automatic index for the composite primary key of time_entry_rollups
+ROLLUP_PK = "sqlite_autoindex_time_entry_rollups_1"
+
+HOT_QUERIES = [
+    ("list_time_entries", _list_time_entries, "ix_time_entries_user_timestamp"),
+    ("list_time_entries_range", _list_time_entries_range, "ix_time_entries_user_timestamp"),
+    ("stats_today", _stats_today, ROLLUP_PK),
+    ("stats_totals", _stats_totals, ROLLUP_PK),
+    ("stats_projects", _stats_projects, ROLLUP_PK),
+    ("stats_daily", _stats_daily, ROLLUP_PK),
+    ("stats_daily_tz", _stats_daily_tz, "ix_time_entries_user_timestamp"),
+    ("list_projects", _list_projects, "ix_projects_user_id"),
+    ("list_todos", _list_todos, "ix_todos_project_id"),
+]
+
+
+def explain(db: Session, query) -> str:
+    """Return the EXPLAIN QUERY PLAN output of an ORM query as one string"""
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_uses_index(plan: str, index_name: str) -> None:
+    """Fail if the plan does not use the index or falls back to a table scan"""
+    assert f"INDEX {index_name}" in plan, f"expected {index_name} in plan:\n{plan}"
+    for line in plan.splitlines():
+        # A bare "SCAN <table>" (without USING INDEX) is a full table scan
+        assert not (line.startswith("SCAN") and "USING" not in line), f"full scan in plan:\n{plan}"
+
+
+def seed(db: Session, users: int, entries: int) -> None:
+    """Insert synthetic users, projects, todos and time entries"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(models.User, [
+        {"id": u, "username": f"user{u}", "hashed_password": "x", "created_at": now}
+        for u in range(1, users + 1)
+    ])
+    db.bulk_insert_mappings(models.Project, [
+        {"id": p, "user_id": (p - 1) % users + 1, "name": f"Project {p}", "color": "blue",
+         "is_completed": False, "created_at": now}
+        for p in range(1, users * 5 + 1)
+    ])
+    db.bulk_insert_mappings(models.Todo, [
+        {"id": t, "project_id": (t - 1) % (users * 5) + 1, "title": f"Todo {t}", "status": "todo",
+         "created_at": now}
+        for t in range(1, users * 25 + 1)
+    ])
+    rows = []
+    for _ in range(entries):
+        todo_id = rng.randint(1, users * 25)
+        project_id = (todo_id - 1) % (users * 5) + 1
+        rows.append({
+            "user_id": (project_id - 1) % users + 1,
+            "todo_id": todo_id,
+            "project_id": project_id,
+            "duration": rng.randint(300, 3000),
+            "timestamp": now - timedelta(seconds=rng.randint(0, 3 * 365 * 86400)),
+        })
+    db.bulk_insert_mappings(models.TimeEntry, rows)
+    rollups.rebuild(db)
+    db.commit()
+
+
+def run(entries: int, users: int, repeat: int) -> None:
+    """Seed a scratch database and report plan and timing for each hot query"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        migrate(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, users, entries)
+        db.connection().exec_driver_sql("ANALYZE")
+
+        for name, builder, index_name in HOT_QUERIES:
+            query = builder(db, 1)
+            plan = explain(db, query)
+            assert_uses_index(plan, index_name)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query.all()
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<26} {statistics.median(timings):8.2f} ms  [{index_name}]")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.entries, args.users, args.repeat)
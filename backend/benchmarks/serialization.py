@@ -0,0 +1,78 @@
+"""
+Serialization benchmark for the time entry listing
+
+Compares the default response path (ORM objects validated and serialized
+by schemas.TimeEntryPageAdapter) against the FAST_JSON path (column rows
+encoded with orjson) for one page of time entries, and checks both
+produce the same JSON.
+
+Run with: python -m benchmarks.serialization [--entries 10000]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.query_plans import seed
+from database import Base
+from migrations import migrate
+import crud
+import fastjson
+import schemas
+
+
+def default_path(db, user_id: int, limit: int) -> bytes:
+    """Serialize a page through the default list endpoint path"""
+    page = crud.list_time_entries(db, user_id, limit)
+    return fastjson.validated(schemas.TimeEntryPageAdapter, page).body
+
+
+def fast_path(db, user_id: int, limit: int) -> bytes:
+    """Serialize a page through the FAST_JSON path"""
+    page = crud.list_time_entries(db, user_id, limit, as_rows=True)
+    return fastjson.render(page).body
+
+
+def _median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(entries: int, repeat: int) -> None:
+    """Seed a scratch database with one user and time both paths"""
+    if fastjson.orjson is None:
+        raise SystemExit("orjson is not installed")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        migrate(engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, 1, entries)
+
+        assert json.loads(default_path(db, 1, entries)) == json.loads(fast_path(db, 1, entries))
+        for name, func in (("default", default_path), ("fast_json", fast_path)):
+            # Fresh session per run so the identity map does not carry over
+            def once():
+                with sessionmaker(bind=engine)() as session:
+                    func(session, 1, entries)
+            print(f"{name:<10} {_median_ms(once, repeat):8.2f} ms  ({entries} entries)")
+
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    run(args.entries, args.repeat)
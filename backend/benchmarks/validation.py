@@ -0,0 +1,84 @@
+"""
+Validation and serialization micro-benchmark for the response schemas
+
+Times the ways a list of time entries can be turned into JSON:
+
+- per_item: model_validate / model_dump per object, stdlib json (the
+  pattern of hand-written loops)
+- response_model: validate the whole list, dump to Python, stdlib json
+  (what FastAPI does for a response_model)
+- type_adapter: validate and dump_json in one pydantic-core call
+  (schemas.TimeEntryPageAdapter, used by the list endpoints)
+
+and the request side of a bulk upload (json.loads + model_validate vs.
+model_validate_json). Needs no database.
+
+Run with: python -m benchmarks.validation [--items 10000]
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import schemas
+
+
+def make_entries(count: int) -> list:
+    """Synthetic ORM-like time entries"""
+    now = datetime.utcnow()
+    return [
+        SimpleNamespace(id=i, todo_id=i % 50 + 1, project_id=i % 10 + 1, duration=1500,
+                        timestamp=now - timedelta(minutes=i))
+        for i in range(1, count + 1)
+    ]
+
+
+def per_item(entries: list) -> bytes:
+    items = [schemas.TimeEntryResponse.model_validate(e).model_dump(mode="json") for e in entries]
+    return json.dumps({"items": items, "next_cursor": None}).encode("utf-8")
+
+
+def response_model(entries: list) -> bytes:
+    adapter = schemas.TimeEntryPageAdapter
+    page = adapter.validate_python({"items": entries, "next_cursor": None}, from_attributes=True)
+    return json.dumps(adapter.dump_python(page, mode="json")).encode("utf-8")
+
+
+def type_adapter(entries: list) -> bytes:
+    adapter = schemas.TimeEntryPageAdapter
+    return adapter.dump_json(adapter.validate_python({"items": entries, "next_cursor": None}, from_attributes=True))
+
+
+def _median_ms(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(items: int, repeat: int) -> None:
+    """Report the median time of each path"""
+    entries = make_entries(items)
+    assert json.loads(per_item(entries)) == json.loads(type_adapter(entries))
+    for func in (per_item, response_model, type_adapter):
+        print(f"{func.__name__:<16} {_median_ms(lambda: func(entries), repeat):8.2f} ms  ({items} entries)")
+
+    batch = json.dumps({"entries": [
+        {"todo_id": 1, "duration": 1500, "idempotency_key": f"key-{i}"} for i in range(min(items, 1000))
+    ]})
+    bulk_python = lambda: schemas.TimeEntryBulkCreate.model_validate(json.loads(batch))
+    bulk_json = lambda: schemas.TimeEntryBulkCreate.model_validate_json(batch)
+    print(f"{'bulk_python':<16} {_median_ms(bulk_python, repeat):8.2f} ms  ({min(items, 1000)} items)")
+    print(f"{'bulk_json':<16} {_median_ms(bulk_json, repeat):8.2f} ms  ({min(items, 1000)} items)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.items, args.repeat)
@@ -0,0 +1,583 @@
+"""
+CRUD operations shared by the sync and async endpoints
+
+All functions take a synchronous Session. The sync endpoints in main.py call
+them directly; the async endpoints in async_api.py run them through
+AsyncSession.run_sync, so the query logic exists only once.
+"""
+import base64
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, delete, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import fastjson
+import models
+import rollups
+import schemas
+import sync
+import versions
+from database import dialect_insert
+
+
+# Column tuples in the shape of the response schemas. Read by the fast JSON
+# path and returned by writes via INSERT/UPDATE ... RETURNING, so responses
+# are built from the write itself instead of a refresh SELECT
+PROJECT_COLUMNS = fastjson.columns(models.Project, schemas.ProjectResponse)
+TODO_COLUMNS = fastjson.columns(models.Todo, schemas.TodoResponse)
+TIME_ENTRY_COLUMNS = fastjson.columns(models.TimeEntry, schemas.TimeEntryResponse)
+SETTINGS_COLUMNS = fastjson.columns(models.PomodoroSettings, schemas.PomodoroSettingsResponse)
+SESSION_COLUMNS = (
+    models.ActiveSession.todo_id, models.ActiveSession.project_id, models.ActiveSession.started_at,
+    models.ActiveSession.resumed_at, models.ActiveSession.elapsed
+)
+
+
+# ===== Projects =====
+
+def list_projects(db: Session, user_id: int, as_rows: bool = False):
+    """Get all projects of a user (as column rows with as_rows=True)"""
+    query = db.query(*PROJECT_COLUMNS) if as_rows else db.query(models.Project)
+    return query.filter(models.Project.user_id == user_id).all()
+
+
+def create_project(db: Session, user_id: int, project: schemas.ProjectCreate):
+    """Create a new project"""
+    created = db.execute(
+        insert(models.Project).values(
+            user_id=user_id,
+            name=project.name,
+            color=project.color
+        ).returning(*PROJECT_COLUMNS)
+    ).one()
+    versions.bump(db, user_id, versions.PROJECTS)
+    db.commit()
+    return created
+
+
+def update_project(db: Session, user_id: int, project_id: int, project_update: schemas.ProjectUpdate):
+    """Update project name, color or completion status"""
+    values = {}
+    if project_update.is_completed is not None:
+        values["is_completed"] = project_update.is_completed
+    if project_update.name is not None:
+        values["name"] = project_update.name
+    if project_update.color is not None:
+        values["color"] = project_update.color
+
+    updated = db.execute(
+        update(models.Project).where(
+            models.Project.id == project_id,
+            models.Project.user_id == user_id
+        ).values(**values).returning(*PROJECT_COLUMNS),
+        execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if not updated:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    versions.bump(db, user_id, versions.PROJECTS)
+    db.commit()
+    return updated
+
+
+def delete_project(db: Session, user_id: int, project_id: int) -> None:
+    """Delete a project (the database cascades to its todos, time entries and rollups)"""
+    deleted = db.execute(
+        delete(models.Project).where(
+            models.Project.id == project_id,
+            models.Project.user_id == user_id
+        ),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    sync.record_deletion(db, user_id, sync.PROJECT, project_id)
+    versions.bump(db, user_id, versions.PROJECTS, versions.TODOS, versions.TIMEENTRIES)
+    db.commit()
+
+
+# ===== Todos =====
+
+def list_todos(db: Session, user_id: int, as_rows: bool = False):
+    """Get all todos of a user's projects (as column rows with as_rows=True)"""
+    query = db.query(*TODO_COLUMNS) if as_rows else db.query(models.Todo)
+    return query.join(models.Project, models.Todo.project_id == models.Project.id).filter(
+        models.Project.user_id == user_id
+    ).all()
+
+
+def _owned_project_ids(user_id: int):
+    """Subquery of the ids of a user's projects, for ownership-scoped writes"""
+    return select(models.Project.id).where(models.Project.user_id == user_id)
+
+
+def _entry_project(user_id: int, project_id: Optional[int]):
+    """
+    (project_id expression, extra conditions) for INSERT ... SELECT from todos:
+    a client-given project_id must be one of the user's projects, otherwise
+    the todo's own project is used
+    """
+    if project_id is None:
+        return models.Todo.project_id, []
+    return literal(project_id), [literal(project_id).in_(_owned_project_ids(user_id))]
+
+
+def create_todo(db: Session, user_id: int, todo: schemas.TodoCreate):
+    """Create a new todo"""
+    # INSERT ... SELECT inserts nothing unless the project belongs to the user
+    created = db.execute(
+        insert(models.Todo).from_select(
+            ["project_id", "title", "status"],
+            select(models.Project.id, literal(todo.title), literal("todo")).where(
+                models.Project.id == todo.project_id,
+                models.Project.user_id == user_id
+            )
+        ).returning(*TODO_COLUMNS)
+    ).one_or_none()
+    if not created:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    versions.bump(db, user_id, versions.TODOS)
+    db.commit()
+    return created
+
+
+def update_todo(db: Session, user_id: int, todo_id: int, todo_update: schemas.TodoUpdate):
+    """Update todo status (todo | in-progress | done) or title"""
+    values = {}
+    if todo_update.status:
+        values["status"] = todo_update.status  # Validated by schemas.TodoStatus
+    if todo_update.title:
+        values["title"] = todo_update.title
+
+    updated = db.execute(
+        update(models.Todo).where(
+            models.Todo.id == todo_id,
+            models.Todo.project_id.in_(_owned_project_ids(user_id))
+        ).values(**values).returning(*TODO_COLUMNS),
+        execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if not updated:
+        raise HTTPException(status_code=404, detail="Todo not found")
+
+    versions.bump(db, user_id, versions.TODOS)
+    db.commit()
+    return updated
+
+
+def delete_todo(db: Session, user_id: int, todo_id: int) -> None:
+    """Delete a todo (the database cascades to its time entries and rollups)"""
+    deleted = db.execute(
+        delete(models.Todo).where(
+            models.Todo.id == todo_id,
+            models.Todo.project_id.in_(_owned_project_ids(user_id))
+        ),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Todo not found")
+
+    sync.record_deletion(db, user_id, sync.TODO, todo_id)
+    versions.bump(db, user_id, versions.TODOS, versions.TIMEENTRIES)
+    db.commit()
+
+
+# ===== TimeEntries =====
+
+def encode_cursor(entry) -> str:
+    """Encode the (timestamp, id) keyset position of an entry or row as an opaque cursor"""
+    raw = f"{entry.timestamp.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor created by encode_cursor into (timestamp, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, entry_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def list_time_entries(
+    db: Session,
+    user_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    from_: Optional[datetime] = None,
+    to: Optional[datetime] = None,
+    project_id: Optional[int] = None,
+    todo_id: Optional[int] = None,
+    as_rows: bool = False,
+) -> dict:
+    """
+    Get one page of a user's time entries, newest first.
+
+    Uses keyset pagination on (timestamp, id); returns {"items", "next_cursor"}
+    where next_cursor is None on the last page. With as_rows=True the items
+    are column rows instead of ORM objects.
+    """
+    query = db.query(*TIME_ENTRY_COLUMNS) if as_rows else db.query(models.TimeEntry)
+    query = query.filter(
+        models.TimeEntry.user_id == user_id
+    )
+    if from_ is not None:
+        query = query.filter(models.TimeEntry.timestamp >= from_)
+    if to is not None:
+        query = query.filter(models.TimeEntry.timestamp < to)
+    if project_id is not None:
+        query = query.filter(models.TimeEntry.project_id == project_id)
+    if todo_id is not None:
+        query = query.filter(models.TimeEntry.todo_id == todo_id)
+    if cursor is not None:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            models.TimeEntry.timestamp < cursor_timestamp,
+            and_(
+                models.TimeEntry.timestamp == cursor_timestamp,
+                models.TimeEntry.id < cursor_id
+            )
+        ))
+
+    # Fetch one extra row to know whether another page exists
+    entries = query.order_by(
+        models.TimeEntry.timestamp.desc(),
+        models.TimeEntry.id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1])
+
+    return {"items": entries, "next_cursor": next_cursor}
+
+
+def create_time_entry(db: Session, user_id: int, entry: schemas.TimeEntryCreate):
+    """Create a new time entry"""
+    # INSERT ... SELECT inserts nothing unless the todo (and a given
+    # project_id) belong to the user; project_id defaults to the todo's project
+    project_id, owned = _entry_project(user_id, entry.project_id)
+    created = db.execute(
+        insert(models.TimeEntry).from_select(
+            ["user_id", "todo_id", "project_id", "duration"],
+            select(literal(user_id), models.Todo.id, project_id, literal(entry.duration)).where(
+                models.Todo.id == entry.todo_id,
+                models.Todo.project_id.in_(_owned_project_ids(user_id)),
+                *owned
+            )
+        ).returning(*TIME_ENTRY_COLUMNS)
+    ).one_or_none()
+    if not created:
+        raise HTTPException(status_code=404, detail="Todo not found" if not owned else "Todo or project not found")
+
+    rollups.add_entries(db, [{
+        "user_id": user_id,
+        "project_id": created.project_id,
+        "todo_id": created.todo_id,
+        "timestamp": created.timestamp,
+        "duration": created.duration,
+    }])
+    versions.bump(db, user_id, versions.TIMEENTRIES)
+    db.commit()
+    return created
+
+
+def naive_utc(timestamp: datetime) -> datetime:
+    """Normalize a client timestamp to naive UTC, as stored in the database"""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def bulk_create_time_entries(
+    db: Session, user_id: int, items: List[schemas.TimeEntryBulkItem], retry: bool = True
+) -> dict:
+    """
+    Insert a batch of time entries in one transaction.
+
+    Ownership of the todos (and of explicit project_ids) is checked for the
+    whole batch with one query each and all new rows go in with a single
+    executemany. Items whose idempotency_key was
+    already stored (by an earlier attempt or earlier in this batch) are
+    reported as duplicates instead of being inserted again.
+    """
+    todo_ids = {item.todo_id for item in items}
+    owned_todos = dict(
+        db.query(models.Todo.id, models.Todo.project_id).join(models.Project).filter(
+            models.Todo.id.in_(todo_ids),
+            models.Project.user_id == user_id
+        ).all()
+    )
+    # Explicit project_ids must be the user's own as well
+    project_ids = {item.project_id for item in items if item.project_id is not None}
+    owned_projects = set()
+    if project_ids:
+        owned_projects = set(db.scalars(
+            _owned_project_ids(user_id).where(models.Project.id.in_(project_ids))
+        ))
+
+    keys = {item.idempotency_key for item in items if item.idempotency_key is not None}
+    existing_keys = {}
+    if keys:
+        existing_keys = dict(
+            db.query(models.TimeEntry.idempotency_key, models.TimeEntry.id).filter(
+                models.TimeEntry.user_id == user_id,
+                models.TimeEntry.idempotency_key.in_(keys)
+            ).all()
+        )
+
+    now = datetime.utcnow()
+    results = [None] * len(items)
+    rows = []
+    row_indexes = []
+    batch_keys = {}
+    for index, item in enumerate(items):
+        if item.todo_id not in owned_todos:
+            results[index] = {"index": index, "status": "error", "detail": "Todo not found"}
+            continue
+        if item.project_id is not None and item.project_id not in owned_projects:
+            results[index] = {"index": index, "status": "error", "detail": "Project not found"}
+            continue
+        key = item.idempotency_key
+        if key is not None and key in existing_keys:
+            results[index] = {"index": index, "status": "duplicate", "id": existing_keys[key]}
+            continue
+        if key is not None and key in batch_keys:
+            # Resolved to the id of the first occurrence after the insert
+            results[index] = {"index": index, "status": "duplicate", "first": batch_keys[key]}
+            continue
+        if key is not None:
+            batch_keys[key] = index
+        rows.append({
+            "user_id": user_id,
+            "todo_id": item.todo_id,
+            "project_id": item.project_id if item.project_id is not None else owned_todos[item.todo_id],
+            "duration": item.duration,
+            "timestamp": naive_utc(item.timestamp) if item.timestamp is not None else now,
+            "idempotency_key": key,
+        })
+        row_indexes.append(index)
+
+    if rows:
+        try:
+            new_ids = db.execute(
+                insert(models.TimeEntry).returning(models.TimeEntry.id, sort_by_parameter_order=True),
+                rows
+            ).scalars().all()
+            rollups.add_entries(db, rows)
+            versions.bump(db, user_id, versions.TIMEENTRIES)
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry stored one of the keys first; rerun to report it as duplicate
+            db.rollback()
+            if not retry:
+                raise
+            return bulk_create_time_entries(db, user_id, items, retry=False)
+        for index, new_id in zip(row_indexes, new_ids):
+            results[index] = {"index": index, "status": "created", "id": new_id}
+
+    for result in results:
+        if "first" in result:
+            result["id"] = results[result.pop("first")]["id"]
+
+    return {
+        "created": len(rows),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "errors": sum(1 for r in results if r["status"] == "error"),
+        "results": results,
+    }
+
+
+# ===== Active Sessions =====
+# One row per user with a running or paused timer. Tracked time is elapsed
+# (closed stretches) plus now - resumed_at while running, so the row only
+# changes on start/pause/resume/stop and polling is a primary key read.
+
+def _session_duration(session, now: datetime) -> int:
+    """Seconds tracked by a session row up to now"""
+    if session.resumed_at is None:
+        return session.elapsed
+    return session.elapsed + max(int((now - session.resumed_at).total_seconds()), 0)
+
+
+def _session_response(session, now: datetime) -> dict:
+    """A session row in the shape of ActiveSessionResponse"""
+    return {
+        "todo_id": session.todo_id,
+        "project_id": session.project_id,
+        "started_at": session.started_at,
+        "resumed_at": session.resumed_at,
+        "running": session.resumed_at is not None,
+        "duration": _session_duration(session, now),
+    }
+
+
+def _select_session(db: Session, user_id: int):
+    """The user's session row, None without one"""
+    return db.execute(
+        select(*SESSION_COLUMNS).where(models.ActiveSession.user_id == user_id)
+    ).one_or_none()
+
+
+def get_active_session(db: Session, user_id: int) -> Optional[dict]:
+    """The user's running or paused session, None without one"""
+    session = _select_session(db, user_id)
+    return _session_response(session, datetime.utcnow()) if session else None
+
+
+def start_session(db: Session, user_id: int, session: schemas.ActiveSessionStart) -> dict:
+    """Start a running session on a todo; 409 if the user has one already"""
+    now = datetime.utcnow()
+    # INSERT ... SELECT inserts nothing unless the todo (and project) belong to the user
+    project_id, owned = _entry_project(user_id, session.project_id)
+    started_at = literal(now, models.ActiveSession.started_at.type)
+    try:
+        created = db.execute(
+            insert(models.ActiveSession).from_select(
+                ["user_id", "todo_id", "project_id", "started_at", "resumed_at", "elapsed"],
+                select(literal(user_id), models.Todo.id, project_id, started_at, started_at, literal(0)).where(
+                    models.Todo.id == session.todo_id,
+                    models.Todo.project_id.in_(_owned_project_ids(user_id)),
+                    *owned
+                )
+            ).returning(*SESSION_COLUMNS)
+        ).one_or_none()
+    except IntegrityError:
+        # The primary key: another request or device started one first
+        db.rollback()
+        if _select_session(db, user_id) is None:
+            raise
+        raise HTTPException(status_code=409, detail="A session is already active")
+    if not created:
+        raise HTTPException(status_code=404, detail="Todo not found" if not owned else "Todo or project not found")
+    db.commit()
+    return _session_response(created, now)
+
+
+def pause_session(db: Session, user_id: int) -> dict:
+    """Pause the running session, adding the current stretch to elapsed"""
+    current = _select_session(db, user_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="No active session")
+    if current.resumed_at is None:
+        raise HTTPException(status_code=409, detail="Session is already paused")
+    now = datetime.utcnow()
+    # Only applies if no other device paused or resumed in between
+    paused = db.execute(
+        update(models.ActiveSession).where(
+            models.ActiveSession.user_id == user_id,
+            models.ActiveSession.resumed_at == current.resumed_at
+        ).values(
+            elapsed=_session_duration(current, now), resumed_at=None
+        ).returning(*SESSION_COLUMNS),
+        execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if not paused:
+        raise HTTPException(status_code=409, detail="Session was changed concurrently")
+    db.commit()
+    return _session_response(paused, now)
+
+
+def resume_session(db: Session, user_id: int) -> dict:
+    """Resume the paused session"""
+    now = datetime.utcnow()
+    resumed = db.execute(
+        update(models.ActiveSession).where(
+            models.ActiveSession.user_id == user_id,
+            models.ActiveSession.resumed_at.is_(None)
+        ).values(resumed_at=now).returning(*SESSION_COLUMNS),
+        execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if not resumed:
+        if _select_session(db, user_id) is None:
+            raise HTTPException(status_code=404, detail="No active session")
+        raise HTTPException(status_code=409, detail="Session is already running")
+    db.commit()
+    return _session_response(resumed, now)
+
+
+def stop_session(db: Session, user_id: int):
+    """
+    End the session and record its time as a time entry
+
+    Deleting the session, inserting the entry and updating the rollup happen
+    in one transaction; DELETE ... RETURNING hands the row to exactly one of
+    several concurrent stops.
+    """
+    now = datetime.utcnow()
+    session = db.execute(
+        delete(models.ActiveSession).where(
+            models.ActiveSession.user_id == user_id
+        ).returning(*SESSION_COLUMNS),
+        execution_options={"synchronize_session": False}
+    ).one_or_none()
+    if not session:
+        raise HTTPException(status_code=404, detail="No active session")
+
+    created = db.execute(
+        insert(models.TimeEntry).values(
+            user_id=user_id,
+            todo_id=session.todo_id,
+            project_id=session.project_id,
+            duration=_session_duration(session, now),
+            timestamp=now
+        ).returning(*TIME_ENTRY_COLUMNS)
+    ).one()
+    rollups.add_entries(db, [{
+        "user_id": user_id,
+        "project_id": created.project_id,
+        "todo_id": created.todo_id,
+        "timestamp": created.timestamp,
+        "duration": created.duration,
+    }])
+    versions.bump(db, user_id, versions.TIMEENTRIES)
+    db.commit()
+    return created
+
+
+# ===== Settings =====
+
+def get_settings(db: Session, user_id: int):
+    """Get pomodoro settings of a user (creates default if not exists)"""
+    settings = db.query(*SETTINGS_COLUMNS).filter(
+        models.PomodoroSettings.user_id == user_id
+    ).first()
+
+    if not settings:
+        # Create default settings for user
+        settings = db.execute(
+            insert(models.PomodoroSettings).values(
+                user_id=user_id,
+                focus_duration=25,
+                break_duration=5
+            ).returning(*SETTINGS_COLUMNS)
+        ).one()
+        db.commit()
+
+    return settings
+
+
+def update_settings(db: Session, user_id: int, settings_update: schemas.PomodoroSettingsUpdate):
+    """Update pomodoro settings of a user (creates them if not exists)"""
+    values = {}
+    if settings_update.focus_duration is not None:
+        values["focus_duration"] = settings_update.focus_duration
+    if settings_update.break_duration is not None:
+        values["break_duration"] = settings_update.break_duration
+
+    # Upsert on the unique user_id; without changes it only has to return the row
+    stmt = dialect_insert(db)(models.PomodoroSettings).values(user_id=user_id, **values)
+    settings = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_=values or {"user_id": stmt.excluded.user_id}
+        ).returning(*SETTINGS_COLUMNS)
+    ).one()
+    db.commit()
+    return settings
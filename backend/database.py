@@ -2,25 +2,212 @@
 Database configuration and session management
 """
 import os
-from sqlalchemy import create_engine
+import logging
+from contextlib import contextmanager
+from datetime import timezone
+from typing import Callable, Dict, Optional, Sequence
+
+from sqlalchemy import Column, Date, DateTime, create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no file lock, run a single process there
+    fcntl = None
+
+import profiling
+from metrics import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./timetracking.db")
 
+# Serve the CRUD endpoints from an AsyncSession (aiosqlite / asyncpg)
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Async drivers for the sync drivers DATABASE_URL may name
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+# Connection pool sizing (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Server databases (PostgreSQL): test connections on checkout, so a restarted
+# server or a dropped idle connection costs a reconnect instead of a failed
+# request; replace connections before firewalls/proxies drop them as idle
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, -1 disables
+# Statements running longer are cancelled by the server (ms, 0 disables)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# SQLite pragma profiles, applied to every new connection.
+# "production": WAL lets readers proceed while a writer commits, NORMAL sync
+# is durable in WAL mode except on power loss, busy_timeout makes writers
+# wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMA_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,        # ms
+        "mmap_size": 268435456,      # 256 MiB
+        "cache_size": -65536,        # negative = KiB, i.e. 64 MiB
+        "temp_store": "MEMORY",
+    },
+    "default": {},
+}
+SQLITE_PRAGMA_PROFILE = os.getenv("SQLITE_PRAGMA_PROFILE", "production")
+
+# Always on, independent of the profile: deletes cascade inside the database
+# (ON DELETE CASCADE) instead of loading child rows into the ORM
+SQLITE_REQUIRED_PRAGMAS = {"foreign_keys": "ON"}
+
+
+def sqlite_pragmas() -> dict:
+    """
+    Effective pragmas: the selected profile, with individual values
+    overridable via SQLITE_<PRAGMA> environment variables
+    (e.g. SQLITE_BUSY_TIMEOUT=10000).
+    """
+    if SQLITE_PRAGMA_PROFILE not in SQLITE_PRAGMA_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PRAGMA_PROFILE: {SQLITE_PRAGMA_PROFILE}")
+    pragmas = dict(SQLITE_PRAGMA_PROFILES[SQLITE_PRAGMA_PROFILE])
+    for name in SQLITE_PRAGMA_PROFILES["production"]:
+        override = os.getenv(f"SQLITE_{name.upper()}")
+        if override is not None:
+            pragmas[name] = override
+    return pragmas
+
+
+def _is_memory_sqlite(url) -> bool:
+    """True for in-memory SQLite URLs, which use a single-connection pool"""
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Connection event hook applying the required pragmas and the SQLite pragma profile"""
+    cursor = dbapi_connection.cursor()
+    for name, value in {**SQLITE_REQUIRED_PRAGMAS, **sqlite_pragmas()}.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def postgresql_settings() -> dict:
+    """Session settings of every PostgreSQL connection"""
+    # UTC sessions: timestamptz values are read and date() buckets are cut in UTC
+    return {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS), "timezone": "UTC"}
+
+
+def engine_options(url: str) -> dict:
+    """create_engine (or create_async_engine) keyword arguments for a database URL"""
+    parsed = make_url(url)
+    backend, driver = parsed.get_backend_name(), parsed.get_driver_name()
+    options = {}
+    if backend == "sqlite" and driver != "aiosqlite":
+        options["connect_args"] = {"check_same_thread": False}  # Needed for SQLite
+    elif backend == "postgresql":
+        settings = postgresql_settings()
+        if driver == "asyncpg":
+            options["connect_args"] = {"server_settings": settings}
+        else:  # libpq based (psycopg2, psycopg)
+            options["connect_args"] = {"options": " ".join(f"-c {k}={v}" for k, v in settings.items())}
+        options.update(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE)
+    if not _is_memory_sqlite(parsed):
+        options.update(
+            poolclass=TimedAsyncQueuePool if parsed.get_dialect().is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def configure_engine(engine: Engine) -> Engine:
+    """Attach the SQLite pragma hook, query metrics and profiling to an engine (sync engine of async ones too)"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    if profiling.SQL_PROFILE:
+        profiling.instrument_engine(engine)
+    return instrument_engine(engine)
+
+
+def create_db_engine(url: str) -> Engine:
+    """Create a sync engine with the configured pool and pragma settings"""
+    return configure_engine(create_engine(url, **engine_options(url)))
+
+
+def log_database_settings(engine: Engine) -> dict:
+    """Log and return the effective pool and SQLite pragma / PostgreSQL session values"""
+    settings = {"pool": engine.pool.status()}
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as connection:
+            for name in [*SQLITE_REQUIRED_PRAGMAS, *SQLITE_PRAGMA_PROFILES["production"]]:
+                settings[name] = connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+    elif engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            for name in ("statement_timeout", "timezone", "max_connections"):
+                settings[name] = connection.exec_driver_sql(f"SHOW {name}").scalar()
+        # Every worker process of every node has a pool of its own
+        workers = int(os.getenv("WEB_CONCURRENCY") or "1")
+        per_node = workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        if per_node > int(settings["max_connections"]):
+            logger.warning(
+                f"{workers} workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) = {per_node} connections "
+                f"exceed max_connections={settings['max_connections']}; lower the pool sizes "
+                f"or put PgBouncer in front of the server"
+            )
+    logger.info(f"Database settings ({engine.url.render_as_string()}): {settings}")
+    return settings
+
+
+# pg_advisory_lock key of schema_lock
+SCHEMA_LOCK_KEY = 0x74696D65
+
+
+@contextmanager
+def schema_lock(engine: Engine):
+    """
+    Hold an exclusive lock across worker processes, for one-time schema setup
+
+    PostgreSQL uses an advisory lock, a SQLite file a lock file next to it;
+    in-memory databases are private to their process and need none.
+    """
+    url = engine.url
+    if url.get_backend_name() == "postgresql":
+        with engine.connect() as connection:
+            connection.exec_driver_sql(f"SELECT pg_advisory_lock({SCHEMA_LOCK_KEY})")
+            try:
+                yield
+            finally:
+                connection.exec_driver_sql(f"SELECT pg_advisory_unlock({SCHEMA_LOCK_KEY})")
+                connection.commit()
+    elif fcntl is not None and url.get_backend_name() == "sqlite" and not _is_memory_sqlite(url):
+        with open(f"{url.database}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        yield
+
+
 # Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = create_db_engine(DATABASE_URL)
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create SessionLocal class. expire_on_commit=False: objects written in a
+# request are returned as they are instead of being reloaded after commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
@@ -36,3 +223,144 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db: Session):
+    """Dialect-specific insert construct supporting ON CONFLICT upserts"""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    DateTime stored as timestamptz on PostgreSQL (plain DATETIME on SQLite)
+
+    The application works with naive UTC datetimes throughout; aware values
+    are converted to UTC on the way in, and values read back are naive UTC
+    on every backend.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        if value is not None and dialect.name == "postgresql":
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class utc_hour(FunctionElement):
+    """utc_hour(timestamp): start of the UTC hour of a timestamp, as stored by UTCDateTime"""
+    type = UTCDateTime()
+    inherit_cache = True
+
+
+@compiles(utc_hour, "sqlite")
+def _utc_hour_sqlite(element, compiler, **kw):
+    # The text of the DATETIME bind processor, so rebuilt and incremental buckets compare equal
+    return f"strftime('%Y-%m-%d %H:00:00.000000', {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(utc_hour, "postgresql")
+def _utc_hour_postgresql(element, compiler, **kw):
+    return f"(date_trunc('hour', {compiler.process(element.clauses, **kw)} AT TIME ZONE 'UTC') AT TIME ZONE 'UTC')"
+
+
+class local_date(FunctionElement):
+    """local_date(timestamp, offset_minutes): calendar day of a UTC timestamp shifted by offset_minutes"""
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(local_date, "sqlite")
+def _local_date_sqlite(element, compiler, **kw):
+    timestamp, offset = element.clauses
+    return f"date({compiler.process(timestamp, **kw)}, {compiler.process(offset, **kw)} || ' minutes')"
+
+
+@compiles(local_date, "postgresql")
+def _local_date_postgresql(element, compiler, **kw):
+    timestamp, offset = element.clauses
+    return (f"CAST(({compiler.process(timestamp, **kw)} AT TIME ZONE 'UTC') "
+            f"+ make_interval(mins => {compiler.process(offset, **kw)}) AS DATE)")
+
+
+# (column, dialect) -> bind processor of the column's type, None if it has none
+_bind_processors: Dict[tuple, Optional[Callable]] = {}
+
+
+def _bind_processor(column: Column, dialect) -> Optional[Callable]:
+    """Bind processor of the column's dialect-specific type, looked up once per column and dialect"""
+    key = (column, dialect)
+    if key not in _bind_processors:
+        # dialect_impl: the generic type has no processor on SQLite, the driver would format values itself
+        _bind_processors[key] = column.type.dialect_impl(dialect).bind_processor(dialect)
+    return _bind_processors[key]
+
+
+def execute_many(db: Session, stmt, columns: Sequence[Column], rows: Sequence[tuple]) -> None:
+    """
+    Execute an INSERT (or upsert) for many rows directly on the DBAPI cursor
+
+    stmt binds exactly `columns` via .values({name: bindparam(name, type_)});
+    rows are tuples in the same order. The rows are transposed once, each
+    column's bind processor is mapped over its values and the columns are
+    zipped back in the statement's bind order, which costs a fraction
+    of SQLAlchemy's per-row parameter handling on large batches.
+    """
+    if not rows:
+        return
+    dialect = db.get_bind().dialect
+    compiled = stmt.compile(dialect=dialect)
+    names = [column.name for column in columns]
+    # Placeholder order for positional paramstyles (qmark, format), named ones bind by key
+    order = [names.index(name) for name in compiled.positiontup] if compiled.positional else range(len(names))
+    values = list(zip(*rows))
+    processed = []
+    for index in order:
+        processor = _bind_processor(columns[index], dialect)
+        processed.append(values[index] if processor is None else map(processor, values[index]))
+    params = list(zip(*processed))
+    if not compiled.positional:
+        keys = [names[index] for index in order]
+        params = [dict(zip(keys, row)) for row in params]
+    db.connection().exec_driver_sql(str(compiled), params)
+
+
+def to_async_url(url: str) -> str:
+    """Translate a sync DATABASE_URL into the matching async driver URL"""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+# Async engine and sessions, only created when enabled
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_url = to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(async_url, **engine_options(async_url))
+    configure_engine(async_engine.sync_engine)
+    # expire_on_commit=False: expired attributes cannot be lazy-loaded from async code
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+    Yields a session and closes it after use.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,95 @@
+"""
+Streaming export of time entries as CSV or NDJSON
+
+Rows are read from a server-side cursor in batches of EXPORT_BATCH_SIZE
+(yield_per) and encoded batch by batch, so memory stays constant for any
+history size. The generators are consumed by StreamingResponse, which runs
+each step on the threadpool, so a long export never blocks the event loop.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import and_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FIELDS = ["id", "timestamp", "duration", "project_id", "project_name", "todo_id", "todo_title"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _rows(bind: Engine, user_id: int, from_: Optional[datetime], to: Optional[datetime]) -> Iterator[list]:
+    """
+    Batches of export rows, oldest first
+
+    Uses its own session: the request's session is closed before the
+    streaming response body is sent.
+    """
+    owned_projects = select(models.Project.id).where(models.Project.user_id == user_id)
+    stmt = select(
+        models.TimeEntry.id,
+        models.TimeEntry.timestamp,
+        models.TimeEntry.duration,
+        models.TimeEntry.project_id,
+        models.Project.name,
+        models.TimeEntry.todo_id,
+        models.Todo.title,
+    ).join(
+        models.Project, and_(models.Project.id == models.TimeEntry.project_id,
+                             models.Project.id.in_(owned_projects))
+    ).join(
+        models.Todo, and_(models.Todo.id == models.TimeEntry.todo_id,
+                          models.Todo.project_id.in_(owned_projects))
+    ).where(models.TimeEntry.user_id == user_id)
+    if from_ is not None:
+        stmt = stmt.where(models.TimeEntry.timestamp >= from_)
+    if to is not None:
+        stmt = stmt.where(models.TimeEntry.timestamp < to)
+    stmt = stmt.order_by(models.TimeEntry.timestamp, models.TimeEntry.id)
+
+    with Session(bind=bind) as db:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            yield batch
+
+
+def iter_csv(bind: Engine, user_id: int, from_: Optional[datetime] = None,
+             to: Optional[datetime] = None) -> Iterator[str]:
+    """CSV export: a header line, then one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    for batch in _rows(bind, user_id, from_, to):
+        buffer.seek(0)
+        buffer.truncate()
+        for entry_id, timestamp, *rest in batch:
+            writer.writerow([entry_id, timestamp.isoformat(), *rest])
+        yield buffer.getvalue()
+
+
+def iter_ndjson(bind: Engine, user_id: int, from_: Optional[datetime] = None,
+                to: Optional[datetime] = None) -> Iterator[str]:
+    """NDJSON export: one JSON object per line, one chunk per batch"""
+    for batch in _rows(bind, user_id, from_, to):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, (entry_id, timestamp.isoformat(), *rest))),
+                       ensure_ascii=False, separators=(",", ":")) + "\n"
+            for entry_id, timestamp, *rest in batch
+        )
+
+
+EXPORTERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+}
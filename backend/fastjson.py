@@ -0,0 +1,78 @@
+"""
+Fast JSON paths for the list endpoints
+
+FastAPI's response_model handling validates the returned objects, turns
+them into plain Python data and encodes that with the stdlib json module,
+which dominates the CPU time of large listings. The list endpoints
+therefore return their response directly:
+
+- by default, validated and serialized in one pydantic-core call through
+  the TypeAdapters in schemas.py (validated)
+- with FAST_JSON=true, as plain column tuples labelled like the response
+  schema fields (no ORM identity map, no validation) encoded with orjson
+  (render)
+
+The response_model stays in place for the OpenAPI schema. FAST_JSON
+requires the optional orjson package and is ignored without it.
+"""
+import logging
+import os
+from typing import Any, List, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+if FAST_JSON and orjson is None:
+    logger.warning("FAST_JSON is enabled but orjson is not installed, using the default path")
+    FAST_JSON = False
+
+
+def columns(model, schema, **overrides) -> List[Any]:
+    """
+    Model columns labelled with the field names of a response schema
+
+    Args:
+        overrides: Column expressions for fields whose column type differs
+            from the schema type (e.g. an Integer flag exposed as bool)
+    """
+    return [overrides.get(name, getattr(model, name)).label(name) for name in schema.model_fields]
+
+
+def _default(value: Any) -> Any:
+    """orjson fallback encoding query result rows as objects"""
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, accepting query result rows"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def _headers(response: Optional[Response]) -> Optional[dict]:
+    """Headers (ETag, Cache-Control) set on the endpoint's Response parameter"""
+    return dict(response.headers) if response is not None else None
+
+
+def render(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """Encode column rows with orjson, bypassing response_model validation"""
+    return FastJSONResponse(content=content, headers=_headers(response))
+
+
+def validated(adapter: TypeAdapter, content: Any, response: Optional[Response] = None) -> Response:
+    """Validate ORM objects against a response adapter and serialize them in pydantic-core"""
+    body = adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=_headers(response))
@@ -0,0 +1,214 @@
+"""
+Streaming import of time entries from CSV or NDJSON
+
+Meant for migrating from other trackers: rows name their project and todo
+instead of referencing ids. The upload is parsed line by line and written
+in transactions of IMPORT_BATCH_SIZE rows, each a single executemany, so
+memory stays constant for any file size. The rollups are rebuilt once
+afterwards; until then the stats do not include the imported rows yet. Projects and todos are resolved
+through dictionaries loaded once per import; unknown names are created on
+first use.
+
+Accepted fields (the export format; ids are ignored):
+    timestamp     ISO 8601, naive values are UTC; defaults to now
+    duration      seconds, required
+    project_name  required
+    todo_title    required
+    project_color optional, for newly created projects
+"""
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from typing import IO, Dict, Iterator, Tuple
+
+from sqlalchemy import bindparam, insert
+from sqlalchemy.orm import Session
+
+import models
+import rollups
+import versions
+from crud import naive_utc
+from database import execute_many
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000
+# Only the first errors are reported, so the response stays small
+IMPORT_MAX_ERRORS = 100
+DEFAULT_PROJECT_COLOR = "slate"
+
+
+class RowError(ValueError):
+    """A row that cannot be imported"""
+
+
+def _parse_csv(stream: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """(line number, record) pairs of a CSV upload with header line"""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    header = next(reader, [])
+    # Plain reader and zip: DictReader's per-row bookkeeping costs more than the parsing
+    for row in reader:
+        if row:
+            yield reader.line_num, dict(zip(header, row))
+
+
+def _parse_ndjson(stream: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """(line number, record) pairs of an NDJSON upload, skipping blank lines"""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            yield line_number, RowError("Invalid JSON object")
+            continue
+        yield line_number, record
+
+
+PARSERS = {
+    "csv": _parse_csv,
+    "ndjson": _parse_ndjson,
+}
+
+
+class _Lookup:
+    """Name -> id dictionaries of a user's projects and todos, creating missing ones"""
+
+    def __init__(self, db: Session, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.projects: Dict[str, int] = dict(
+            db.query(models.Project.name, models.Project.id).filter(models.Project.user_id == user_id)
+        )
+        self.todos: Dict[Tuple[int, str], int] = {
+            (project_id, title): todo_id
+            for todo_id, project_id, title in db.query(
+                models.Todo.id, models.Todo.project_id, models.Todo.title
+            ).join(models.Project).filter(models.Project.user_id == user_id)
+        }
+        self.projects_created = 0
+        self.todos_created = 0
+        # Projects or todos created since the last committed batch
+        self.created_unflushed = False
+
+    def resolve(self, project_name: str, todo_title: str, color: str) -> Tuple[int, int]:
+        """(project_id, todo_id) for the names, inserting unknown ones (does not commit)"""
+        project_id = self.projects.get(project_name)
+        if project_id is None:
+            project_id = self.db.execute(
+                insert(models.Project).values(user_id=self.user_id, name=project_name, color=color)
+                .returning(models.Project.id)
+            ).scalar_one()
+            self.projects[project_name] = project_id
+            self.projects_created += 1
+            self.created_unflushed = True
+        todo_id = self.todos.get((project_id, todo_title))
+        if todo_id is None:
+            todo_id = self.db.execute(
+                insert(models.Todo).values(project_id=project_id, title=todo_title, status="todo")
+                .returning(models.Todo.id)
+            ).scalar_one()
+            self.todos[(project_id, todo_title)] = todo_id
+            self.todos_created += 1
+            self.created_unflushed = True
+        return project_id, todo_id
+
+
+def _to_row(record: dict, lookup: _Lookup, user_id: int, now: datetime) -> tuple:
+    """Validate a record and turn it into a time_entries row, in ENTRY_COLUMNS order"""
+    project_name = str(record.get("project_name") or "").strip()
+    todo_title = str(record.get("todo_title") or "").strip()
+    if not project_name or not todo_title:
+        raise RowError("project_name and todo_title are required")
+    try:
+        duration = record.get("duration")
+        if isinstance(duration, (bool, float)):
+            raise ValueError(duration)
+        duration = int(duration)
+    except (TypeError, ValueError):
+        raise RowError("duration must be an integer number of seconds")
+    if duration < 0:
+        raise RowError("duration must not be negative")
+    timestamp = record.get("timestamp")
+    try:
+        timestamp = naive_utc(datetime.fromisoformat(timestamp)) if timestamp else now
+    except (TypeError, ValueError):
+        raise RowError("timestamp must be an ISO 8601 date and time")
+
+    color = str(record.get("project_color") or DEFAULT_PROJECT_COLOR)
+    project_id, todo_id = lookup.resolve(project_name, todo_title, color)
+    return user_id, todo_id, project_id, duration, timestamp, now
+
+
+# Columns written per imported row, see database.execute_many
+ENTRY_COLUMNS = [models.TimeEntry.__table__.c[name] for name in (
+    "user_id", "todo_id", "project_id", "duration", "timestamp", "updated_at"
+)]
+INSERT_ENTRY = insert(models.TimeEntry.__table__).values(
+    {column.name: bindparam(column.name, type_=column.type) for column in ENTRY_COLUMNS}
+)
+
+
+def _flush(db: Session, user_id: int, rows: list, lookup: _Lookup) -> None:
+    """Insert one batch with a single executemany and commit it"""
+    if rows:
+        execute_many(db, INSERT_ENTRY, ENTRY_COLUMNS, rows)
+    collections = [versions.TIMEENTRIES] if rows else []
+    if lookup.created_unflushed:
+        collections += [versions.PROJECTS, versions.TODOS]
+        lookup.created_unflushed = False
+    if collections:
+        versions.bump(db, user_id, *collections)
+    db.commit()
+
+
+def import_time_entries(db: Session, user_id: int, stream: IO[bytes], file_format: str) -> dict:
+    """
+    Import time entries from an uploaded file, committing every IMPORT_BATCH_SIZE rows
+
+    Rows that fail validation are skipped and reported with their line
+    number; all other rows are imported. The user's rollups are rebuilt once
+    at the end, also if the import fails after some batches were committed.
+    """
+    lookup = _Lookup(db, user_id)
+    now = datetime.utcnow()
+    result = {"processed": 0, "imported": 0, "failed": 0, "batches": 0, "errors": []}
+    rows = []
+
+    try:
+        for line_number, record in PARSERS[file_format](stream):
+            result["processed"] += 1
+            try:
+                if isinstance(record, RowError):
+                    raise record
+                rows.append(_to_row(record, lookup, user_id, now))
+            except RowError as exc:
+                result["failed"] += 1
+                if len(result["errors"]) < IMPORT_MAX_ERRORS:
+                    result["errors"].append({"line": line_number, "detail": str(exc)})
+                continue
+            if len(rows) >= IMPORT_BATCH_SIZE:
+                _flush(db, user_id, rows, lookup)
+                result["imported"] += len(rows)
+                result["batches"] += 1
+                logger.info(f"Import for user {user_id}: {result['imported']} rows imported")
+                rows = []
+
+        _flush(db, user_id, rows, lookup)
+        if rows:
+            result["imported"] += len(rows)
+            result["batches"] += 1
+    finally:
+        # Set-based over the user's entries, instead of an upsert per batch
+        if result["imported"]:
+            db.rollback()
+            rollups.rebuild(db, user_id)
+            db.commit()
+
+    result["projects_created"] = lookup.projects_created
+    result["todos_created"] = lookup.todos_created
+    return result
@@ -1,9 +1,18 @@
 """
 Initialize database with correct schema
+
+The explicit migration step for deployments; the app itself also runs it
+on startup. Run with: python init_db.py (reads .env)
 """
-from database import Base, engine
+from dotenv import load_dotenv
+
+# Before importing database, which reads DATABASE_URL
+load_dotenv()
+
+from database import engine
+from migrations import init_schema, get_schema_version
 import models
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
-print("Database initialized successfully with all tables!")
+# Create all tables and bring existing databases up to date
+init_schema(engine)
+print(f"Database initialized successfully with all tables! (schema version {get_schema_version(engine)})")
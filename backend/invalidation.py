@@ -0,0 +1,120 @@
+"""
+Cache invalidation across worker processes
+
+In-process caches (the authenticated-user cache in auth.py) live once per
+worker. A change handled by one worker is therefore published as a row in
+cache_invalidations, written in the same transaction as the change itself,
+and every worker polls that table every CACHE_SYNC_INTERVAL seconds and
+applies the new rows to its own caches. A stale entry thus survives at most
+one interval instead of the cache TTL.
+
+Ids are no watermark: on PostgreSQL a transaction holding a lower sequence
+value can commit after one holding a higher value. Each poll therefore
+reads every row of the last CACHE_SYNC_OVERLAP_SECONDS and skips the ids it
+has already applied, so a row is only missed if its transaction takes
+longer than the overlap to commit.
+
+Only active with more than one worker (WEB_CONCURRENCY > 1); a single
+process invalidates its caches directly and needs neither table nor thread.
+"""
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Connection, Engine
+
+import models
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or "1")
+ENABLED = WEB_CONCURRENCY > 1
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1"))
+# Rows older than this have been seen by every live worker
+CACHE_INVALIDATION_RETENTION_SECONDS = 600
+# Rows are re-read this long after created_at; covers slow commits and clock skew between hosts
+CACHE_SYNC_OVERLAP_SECONDS = float(os.getenv("CACHE_SYNC_OVERLAP_SECONDS", "60"))
+
+Invalidation = models.CacheInvalidation
+
+# cache name -> callable dropping one key from this process's cache
+_handlers: Dict[str, Callable[[str], None]] = {}
+
+
+def subscribe(cache: str, handler: Callable[[str], None]) -> None:
+    """Register the local invalidation function of a cache"""
+    _handlers[cache] = handler
+
+
+def publish(connection: Connection, cache: str, key: str) -> None:
+    """
+    Tell the other workers to drop a key (part of the caller's transaction)
+
+    Also prunes rows older than CACHE_INVALIDATION_RETENTION_SECONDS.
+    """
+    if not ENABLED:
+        return
+    now = datetime.utcnow()
+    connection.execute(insert(Invalidation).values(cache=cache, key=key, created_at=now))
+    connection.execute(delete(Invalidation).where(
+        Invalidation.created_at < now - timedelta(seconds=CACHE_INVALIDATION_RETENTION_SECONDS)
+    ))
+
+
+class Listener:
+    """Polls cache_invalidations on a daemon thread and applies new rows locally"""
+
+    def __init__(self, engine: Engine, interval: float = CACHE_SYNC_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        # id -> created_at of the rows inside the overlap window already applied
+        self.seen: Dict[int, datetime] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # Everything before startup is irrelevant, the caches start empty
+        with self.engine.connect() as connection:
+            self.seen = dict(connection.execute(
+                select(Invalidation.id, Invalidation.created_at).where(Invalidation.created_at >= self._window_start())
+            ).all())
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _window_start(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=CACHE_SYNC_OVERLAP_SECONDS)
+
+    def poll(self) -> int:
+        """Apply the rows published since the last poll, returns their number"""
+        window_start = self._window_start()
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(Invalidation.id, Invalidation.cache, Invalidation.key, Invalidation.created_at)
+                .where(Invalidation.created_at >= window_start).order_by(Invalidation.id)
+            ).all()
+        applied = 0
+        for row_id, cache, key, created_at in rows:
+            if row_id in self.seen:
+                continue
+            handler = _handlers.get(cache)
+            if handler is not None:
+                handler(key)
+            self.seen[row_id] = created_at
+            applied += 1
+        self.seen = {row_id: created_at for row_id, created_at in self.seen.items() if created_at >= window_start}
+        return applied
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Polling cache invalidations failed")
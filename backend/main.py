@@ -3,36 +3,81 @@ FastAPI main application with CRUD endpoints
 """
 import os
 import logging
-from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import datetime, timedelta
-
+from typing import List, Literal, Optional
+from datetime import date, datetime, time, timedelta
+
+import crud
+import exports
+import imports
+import fastjson
+import invalidation
+import metrics
 import models
+import profiling
 import schemas
-from database import engine, get_db, Base
-from auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+import sync
+import versions
+from database import engine, get_db, local_date, log_database_settings, DATABASE_ASYNC
+from migrations import init_schema
+from passwords import PasswordHasherBusy, hash_password_async, needs_rehash, verify_password_async
+from auth import check_secret_key, create_access_token, get_current_user, CurrentUser, ACCESS_TOKEN_EXPIRE_MINUTES
+
+# Importing this module has no side effects beyond building the app: the
+# environment comes from the process (serve.py and `uvicorn --env-file .env`
+# load .env), logging and the database are set up in lifespan()
+logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# CORS with environment variable
+origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 
-# Setup logging
-logging.basicConfig(
-    level=os.getenv("LOG_LEVEL", "INFO"),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+def configure_logging() -> None:
+    """Root logger setup, done at startup instead of on import"""
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
 
-# Initialize FastAPI app
-app = FastAPI(title="Timetracking API")
 
-# CORS with environment variable
-origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup of each worker: logging, schema setup (done once across workers,
+    the others only check the version) and polling cache invalidations
+    """
+    configure_logging()
+    check_secret_key()
+    init_schema(engine)
+    log_database_settings(engine)
+    logger.info(f"CORS origins configured: {origins}")
+    if DATABASE_ASYNC:
+        logger.info("Serving CRUD endpoints with async database sessions")
+    if profiling.SQL_PROFILE:
+        logger.warning("SQL profiling enabled (SQL_PROFILE), not meant for production")
+
+    listener = None
+    if invalidation.ENABLED:
+        listener = invalidation.Listener(engine)
+        listener.start()
+        logger.info(f"Worker {os.getpid()} of {invalidation.WEB_CONCURRENCY} polling cache invalidations")
+    yield
+    if listener is not None:
+        listener.stop()
+
+
+# Initialize FastAPI app
+app = FastAPI(
+    title="Timetracking API",
+    lifespan=lifespan,
+    default_response_class=fastjson.FastJSONResponse if fastjson.FAST_JSON else JSONResponse
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,47 +87,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-logger.info(f"CORS origins configured: {origins}")
+# Development only: per-request statement log, N+1 warnings, Server-Timing
+if profiling.SQL_PROFILE:
+    profiling.install(app)
+
+# Outermost middleware, so latency covers CORS handling and the response body
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Async CRUD endpoints are registered first so they take precedence over the
+# sync endpoints with the same paths below
+if DATABASE_ASYNC:
+    import async_api
+    app.include_router(async_api.router)
 
 
 # ===== Auth Endpoints =====
 
+@app.exception_handler(PasswordHasherBusy)
+def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Reject auth requests quickly while the password pool is saturated"""
+    logger.warning("Password hashing pool saturated, rejecting request")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+
+# register and login are async so bcrypt can be awaited on the password pool
+# without holding a request thread; their (blocking) database work is
+# handed to the threadpool instead of running on the event loop
+
+def _get_user_by_username(db: Session, username: str) -> Optional[models.User]:
+    """User with the given username, None if unknown"""
+    return db.query(models.User).filter(models.User.username == username).first()
+
+
+def _add_and_commit(db: Session, *objects) -> None:
+    """Add objects to the session (if any) and commit"""
+    db.add_all(objects)
+    db.commit()
+
+
 @app.post("/api/auth/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
     # Check if username already exists
-    existing_user = db.query(models.User).filter(models.User.username == user_data.username).first()
+    existing_user = await run_in_threadpool(_get_user_by_username, db, user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
-    # Create new user
-    hashed_password = models.User.hash_password(user_data.password)
+    # Create new user (bcrypt runs on the password pool, not the request thread)
+    hashed_password = await hash_password_async(user_data.password)
     new_user = models.User(
         username=user_data.username,
         hashed_password=hashed_password
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await run_in_threadpool(_add_and_commit, db, new_user)
     
     logger.info(f"New user registered: {user_data.username}")
     return new_user
 
 
 @app.post("/api/auth/login", response_model=schemas.Token)
-def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
     """Login and get JWT token"""
-    user = db.query(models.User).filter(models.User.username == user_data.username).first()
-    if not user or not user.verify_password(user_data.password):
+    user = await run_in_threadpool(_get_user_by_username, db, user_data.username)
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Transparently upgrade hashes created with a different bcrypt cost
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_async(user_data.password)
+        await run_in_threadpool(_add_and_commit, db)
+        logger.info(f"Rehashed password for user: {user.username}")
+    
     access_token = create_access_token(
         data={"sub": user.username},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -93,7 +180,7 @@ def login(user_data: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 @app.get("/api/auth/me", response_model=schemas.UserResponse)
-def get_me(current_user: models.User = Depends(get_current_user)):
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Get current authenticated user"""
     return current_user
 
@@ -102,75 +189,51 @@ def get_me(current_user: models.User = Depends(get_current_user)):
 
 @app.get("/api/projects", response_model=List[schemas.ProjectResponse])
 def get_projects(
-    current_user: models.User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all projects for current user"""
-    projects = db.query(models.Project).filter(models.Project.user_id == current_user.id).all()
-    return projects
+    etag = versions.etag(db, current_user.id, versions.PROJECTS)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    projects = crud.list_projects(db, current_user.id, as_rows=fastjson.FAST_JSON)
+    if fastjson.FAST_JSON:
+        return fastjson.render(projects, response)
+    return fastjson.validated(schemas.ProjectListAdapter, projects, response)
 
 
 @app.post("/api/projects", response_model=schemas.ProjectResponse, status_code=status.HTTP_201_CREATED)
 def create_project(
     project: schemas.ProjectCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new project"""
-    db_project = models.Project(
-        user_id=current_user.id,
-        name=project.name,
-        color=project.color
-    )
-    db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
-    return db_project
+    return crud.create_project(db, current_user.id, project)
 
 
 @app.patch("/api/projects/{project_id}", response_model=schemas.ProjectResponse)
 def update_project_status(
     project_id: int,
     project_update: schemas.ProjectUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update project completion status"""
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    if project_update.is_completed is not None:
-        project.is_completed = 1 if project_update.is_completed else 0
-    if project_update.name is not None:
-        project.name = project_update.name
-    if project_update.color is not None:
-        project.color = project_update.color
-        
-    db.commit()
-    db.refresh(project)
-    return project
+    return crud.update_project(db, current_user.id, project_id, project_update)
 
 
 @app.delete("/api/projects/{project_id}")
 def delete_project(
     project_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a project (cascade deletes todos and time entries)"""
-    project = db.query(models.Project).filter(
-        models.Project.id == project_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    db.delete(project)
-    db.commit()
+    crud.delete_project(db, current_user.id, project_id)
     return {"message": "Project deleted successfully"}
 
 
@@ -178,185 +241,436 @@ def delete_project(
 
 @app.get("/api/todos", response_model=List[schemas.TodoResponse])
 def get_todos(
-    current_user: models.User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all todos for current user's projects"""
-    todos = db.query(models.Todo).join(models.Project).filter(
-        models.Project.user_id == current_user.id
-    ).all()
-    return todos
+    etag = versions.etag(db, current_user.id, versions.TODOS)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    todos = crud.list_todos(db, current_user.id, as_rows=fastjson.FAST_JSON)
+    if fastjson.FAST_JSON:
+        return fastjson.render(todos, response)
+    return fastjson.validated(schemas.TodoListAdapter, todos, response)
 
 
 @app.post("/api/todos", response_model=schemas.TodoResponse, status_code=status.HTTP_201_CREATED)
 def create_todo(
     todo: schemas.TodoCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new todo"""
-    # Verify project exists and belongs to user
-    project = db.query(models.Project).filter(
-        models.Project.id == todo.project_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    db_todo = models.Todo(
-        project_id=todo.project_id,
-        title=todo.title,
-        status="todo"
-    )
-    db.add(db_todo)
-    db.commit()
-    db.refresh(db_todo)
-    return db_todo
+    return crud.create_todo(db, current_user.id, todo)
 
 
 @app.patch("/api/todos/{todo_id}", response_model=schemas.TodoResponse)
 def update_todo_status(
     todo_id: int,
     todo_update: schemas.TodoUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update todo status (todo | in-progress | done)"""
-    todo = db.query(models.Todo).join(models.Project).filter(
-        models.Todo.id == todo_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    
-    if todo_update.status:
-        # Validate status
-        valid_statuses = ["todo", "in-progress", "done"]
-        if todo_update.status not in valid_statuses:
-            raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
-        todo.status = todo_update.status
-    
-    if todo_update.title:
-        todo.title = todo_update.title
-    
-    db.commit()
-    db.refresh(todo)
-    return todo
+    return crud.update_todo(db, current_user.id, todo_id, todo_update)
 
 
 @app.delete("/api/todos/{todo_id}")
 def delete_todo(
     todo_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a todo"""
-    todo = db.query(models.Todo).join(models.Project).filter(
-        models.Todo.id == todo_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    
-    db.delete(todo)
-    db.commit()
+    crud.delete_todo(db, current_user.id, todo_id)
     return {"message": "Todo deleted successfully"}
 
 
 # ===== TimeEntries Endpoints =====
 
-@app.get("/api/timeentries", response_model=List[schemas.TimeEntryResponse])
+@app.get("/api/timeentries", response_model=schemas.TimeEntryPage)
 def get_time_entries(
-    current_user: models.User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    project_id: Optional[int] = None,
+    todo_id: Optional[int] = None,
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all time entries for current user"""
-    entries = db.query(models.TimeEntry).filter(
-        models.TimeEntry.user_id == current_user.id
-    ).all()
-    return entries
+    """
+    Get time entries for current user, newest first.
+
+    Uses keyset pagination on (timestamp, id): pass the returned next_cursor
+    to fetch the following page. next_cursor is null on the last page.
+    """
+    etag = versions.etag(db, current_user.id, versions.TIMEENTRIES, variant=request.url.query)
+    not_modified = versions.not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
+    page = crud.list_time_entries(
+        db, current_user.id, limit,
+        cursor=cursor, from_=from_, to=to, project_id=project_id, todo_id=todo_id,
+        as_rows=fastjson.FAST_JSON
+    )
+    if fastjson.FAST_JSON:
+        return fastjson.render(page, response)
+    return fastjson.validated(schemas.TimeEntryPageAdapter, page, response)
 
 
 @app.post("/api/timeentries", response_model=schemas.TimeEntryResponse, status_code=status.HTTP_201_CREATED)
 def create_time_entry(
     entry: schemas.TimeEntryCreate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Create a new time entry"""
-    # Verify todo exists and belongs to user
-    todo = db.query(models.Todo).join(models.Project).filter(
-        models.Todo.id == entry.todo_id,
-        models.Project.user_id == current_user.id
-    ).first()
-    if not todo:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    
-    # Use provided project_id or get it from the todo
-    project_id = entry.project_id if entry.project_id is not None else todo.project_id
-    
-    db_entry = models.TimeEntry(
-        user_id=current_user.id,
-        todo_id=entry.todo_id,
-        project_id=project_id,
-        duration=entry.duration
+    return crud.create_time_entry(db, current_user.id, entry)
+
+
+@app.post("/api/timeentries/bulk", response_model=schemas.TimeEntryBulkResponse)
+def bulk_create_time_entries(
+    batch: schemas.TimeEntryBulkCreate,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create up to 1000 time entries in one transaction (offline sync).
+
+    Returns a result per item; entries whose idempotency_key was already
+    stored are reported as duplicates, so retrying a batch is safe.
+    """
+    return crud.bulk_create_time_entries(db, current_user.id, batch.entries)
+
+
+@app.post("/api/timeentries/import", response_model=schemas.TimeEntryImportResponse)
+def import_time_entries(
+    file: UploadFile,
+    import_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Import time entries from a CSV or NDJSON file (e.g. another tracker's export).
+
+    Projects and todos are matched by name and created if missing. The file
+    is parsed incrementally and committed in batches; invalid rows are
+    skipped and reported with their line number.
+    """
+    return imports.import_time_entries(db, current_user.id, file.file, import_format)
+
+
+@app.get("/api/timeentries/export")
+def export_time_entries(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Export time entries with project and todo names, oldest first.
+
+    The file is streamed in batches from a server-side cursor, so any
+    history size is exported with constant memory.
+    """
+    chunks = exports.EXPORTERS[export_format](db.get_bind(), current_user.id, from_, to)
+    return StreamingResponse(
+        chunks,
+        media_type=exports.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="timeentries.{export_format}"'}
     )
-    db.add(db_entry)
-    db.commit()
-    db.refresh(db_entry)
-    return db_entry
+
+
+# ===== Sync Endpoints =====
+
+@app.get("/api/sync", response_model=schemas.SyncResponse)
+def get_sync(
+    since: Optional[str] = None,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get projects, todos and time entries changed since a watermark.
+
+    Without since (or with an expired one) a full snapshot is returned.
+    Pass the returned watermark as since on the next call.
+    """
+    return sync.changes_since(db, current_user.id, since)
+
+
+# ===== Stats Endpoints =====
+
+# Upper bound for the daily stats range so the payload stays small
+MAX_STATS_DAYS = 366
+
+
+def _utc_bounds(start_day: date, end_day: date, tz_offset: int):
+    """
+    Convert an inclusive range of local days into a half-open UTC range.
+
+    tz_offset uses the sign convention of JavaScript's Date.getTimezoneOffset()
+    (minutes to add to local time to get UTC, e.g. -60 for CET).
+    """
+    start = datetime.combine(start_day, time.min) + timedelta(minutes=tz_offset)
+    end = datetime.combine(end_day + timedelta(days=1), time.min) + timedelta(minutes=tz_offset)
+    return start, end
+
+
+def _local_today(tz_offset: int) -> date:
+    """Current date in the client's timezone"""
+    return (datetime.utcnow() - timedelta(minutes=tz_offset)).date()
+
+
+def _rollup_aligned(tz_offset: int) -> bool:
+    """Whether local days start on rollup hour boundaries (not for e.g. UTC+05:30)"""
+    return tz_offset % 60 == 0
+
+
+@app.get("/api/stats/today", response_model=schemas.StatsTotals)
+def get_stats_today(
+    tz_offset: int = Query(0, ge=-840, le=840),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get tracked time and session count for the current (local) day"""
+    today = _local_today(tz_offset)
+    start, end = _utc_bounds(today, today, tz_offset)
+    if _rollup_aligned(tz_offset):
+        rollup = models.TimeEntryRollup
+        total, count = db.query(
+            func.coalesce(func.sum(rollup.total_seconds), 0),
+            func.coalesce(func.sum(rollup.session_count), 0)
+        ).filter(
+            rollup.user_id == current_user.id,
+            rollup.hour >= start,
+            rollup.hour < end
+        ).one()
+    else:
+        total, count = db.query(
+            func.coalesce(func.sum(models.TimeEntry.duration), 0),
+            func.count(models.TimeEntry.id)
+        ).filter(
+            models.TimeEntry.user_id == current_user.id,
+            models.TimeEntry.timestamp >= start,
+            models.TimeEntry.timestamp < end
+        ).one()
+    return {"total_duration": total, "session_count": count}
+
+
+@app.get("/api/stats/totals", response_model=schemas.StatsTotals)
+def get_stats_totals(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get all-time tracked time and session count"""
+    total, count = db.query(
+        func.coalesce(func.sum(models.TimeEntryRollup.total_seconds), 0),
+        func.coalesce(func.sum(models.TimeEntryRollup.session_count), 0)
+    ).filter(
+        models.TimeEntryRollup.user_id == current_user.id
+    ).one()
+    return {"total_duration": total, "session_count": count}
+
+
+@app.get("/api/stats/projects", response_model=List[schemas.ProjectStats])
+def get_stats_projects(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get total tracked time per project, largest first"""
+    total = func.sum(models.TimeEntryRollup.total_seconds).label("total_duration")
+    rows = db.query(
+        models.Project.id,
+        models.Project.name,
+        models.Project.color,
+        total,
+        func.sum(models.TimeEntryRollup.session_count)
+    ).join(
+        models.Project, and_(
+            models.Project.id == models.TimeEntryRollup.project_id,
+            models.Project.user_id == current_user.id
+        )
+    ).filter(
+        models.TimeEntryRollup.user_id == current_user.id
+    ).group_by(
+        models.Project.id
+    ).order_by(total.desc()).all()
+
+    return [
+        {
+            "project_id": project_id,
+            "name": name,
+            "color": color,
+            "total_duration": total_duration,
+            "session_count": session_count,
+        }
+        for project_id, name, color, total_duration, session_count in rows
+    ]
+
+
+@app.get("/api/stats/daily", response_model=List[schemas.DailyStats])
+def get_stats_daily(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tz_offset: int = Query(0, ge=-840, le=840),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get tracked time per local day for an inclusive date range.
+    Defaults to the last 7 days; days without entries are omitted.
+    Whole-hour offsets are served from the rollup, others from time_entries.
+    """
+    end = end or _local_today(tz_offset)
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_STATS_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range must not exceed {MAX_STATS_DAYS} days")
+
+    range_start, range_end = _utc_bounds(start, end, tz_offset)
+    if _rollup_aligned(tz_offset):
+        rollup = models.TimeEntryRollup
+        day = local_date(rollup.hour, -tz_offset).label("day")
+        rows = db.query(
+            day,
+            func.sum(rollup.total_seconds),
+            func.sum(rollup.session_count)
+        ).filter(
+            rollup.user_id == current_user.id,
+            rollup.hour >= range_start,
+            rollup.hour < range_end
+        ).group_by(day).order_by(day).all()
+    else:
+        day = local_date(models.TimeEntry.timestamp, -tz_offset).label("day")
+        rows = db.query(
+            day,
+            func.sum(models.TimeEntry.duration),
+            func.count(models.TimeEntry.id)
+        ).filter(
+            models.TimeEntry.user_id == current_user.id,
+            models.TimeEntry.timestamp >= range_start,
+            models.TimeEntry.timestamp < range_end
+        ).group_by(day).order_by(day).all()
+
+    return [
+        {"date": day_str, "total_duration": total_duration, "session_count": session_count}
+        for day_str, total_duration, session_count in rows
+    ]
+
+
+@app.get("/api/stats/top-todos", response_model=List[schemas.TodoStats])
+def get_stats_top_todos(
+    limit: int = Query(5, ge=1, le=50),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the todos with the most tracked time"""
+    total = func.sum(models.TimeEntryRollup.total_seconds).label("total_duration")
+    rows = db.query(
+        models.Todo.id,
+        models.Todo.title,
+        models.Project.id,
+        models.Project.name,
+        models.Project.color,
+        total
+    ).join(
+        models.Todo, models.Todo.id == models.TimeEntryRollup.todo_id
+    ).join(
+        models.Project, models.Project.id == models.Todo.project_id
+    ).filter(
+        models.TimeEntryRollup.user_id == current_user.id
+    ).group_by(
+        models.Todo.id, models.Project.id
+    ).order_by(total.desc()).limit(limit).all()
+
+    return [
+        {
+            "todo_id": todo_id,
+            "title": title,
+            "project_id": project_id,
+            "project_name": project_name,
+            "project_color": project_color,
+            "total_duration": total_duration,
+        }
+        for todo_id, title, project_id, project_name, project_color, total_duration in rows
+    ]
+
+
+# ===== Timer Session Endpoints =====
+
+@app.get("/api/sessions/current", response_model=Optional[schemas.ActiveSessionResponse])
+def get_current_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the running or paused timer session (null if there is none); cheap to poll"""
+    return crud.get_active_session(db, current_user.id)
+
+
+@app.post("/api/sessions/start", response_model=schemas.ActiveSessionResponse, status_code=status.HTTP_201_CREATED)
+def start_session(
+    session: schemas.ActiveSessionStart,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start the timer on a todo (409 if a session is already active)"""
+    return crud.start_session(db, current_user.id, session)
+
+
+@app.post("/api/sessions/pause", response_model=schemas.ActiveSessionResponse)
+def pause_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Pause the running timer session"""
+    return crud.pause_session(db, current_user.id)
+
+
+@app.post("/api/sessions/resume", response_model=schemas.ActiveSessionResponse)
+def resume_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Resume the paused timer session"""
+    return crud.resume_session(db, current_user.id)
+
+
+@app.post("/api/sessions/stop", response_model=schemas.TimeEntryResponse, status_code=status.HTTP_201_CREATED)
+def stop_session(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stop the timer session and record the tracked time as a time entry"""
+    return crud.stop_session(db, current_user.id)
 
 
 # ===== Settings Endpoints =====
 
 @app.get("/api/settings", response_model=schemas.PomodoroSettingsResponse)
 def get_settings(
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get pomodoro settings for current user (creates default if not exists)"""
-    settings = db.query(models.PomodoroSettings).filter(
-        models.PomodoroSettings.user_id == current_user.id
-    ).first()
-    
-    if not settings:
-        # Create default settings for user
-        settings = models.PomodoroSettings(
-            user_id=current_user.id,
-            focus_duration=25,
-            break_duration=5
-        )
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
-    
-    return settings
+    return crud.get_settings(db, current_user.id)
 
 
 @app.put("/api/settings", response_model=schemas.PomodoroSettingsResponse)
 def update_settings(
     settings_update: schemas.PomodoroSettingsUpdate,
-    current_user: models.User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update pomodoro settings for current user"""
-    settings = db.query(models.PomodoroSettings).filter(
-        models.PomodoroSettings.user_id == current_user.id
-    ).first()
-    
-    if not settings:
-        # Create if doesn't exist
-        settings = models.PomodoroSettings(user_id=current_user.id)
-        db.add(settings)
-    
-    if settings_update.focus_duration is not None:
-        settings.focus_duration = settings_update.focus_duration
-    if settings_update.break_duration is not None:
-        settings.break_duration = settings_update.break_duration
-    
-    db.commit()
-    db.refresh(settings)
-    return settings
+    return crud.update_settings(db, current_user.id, settings_update)
 
 
 # ===== Health Check =====
@@ -367,5 +681,15 @@ def root():
     return {"status": "ok", "message": "Timetracking API is running"}
 
 
+# ===== Metrics =====
+
+if metrics.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        """Prometheus metrics in the text exposition format"""
+        body, content_type = metrics.render()
+        return Response(content=body, media_type=content_type)
+
+
 # Note: StaticFiles mount will be added later for production
 # app.mount("/", StaticFiles(directory="static", html=True), name="static")
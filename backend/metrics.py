@@ -0,0 +1,188 @@
+"""
+Prometheus metrics for requests, database queries and password hashing
+
+MetricsMiddleware records per-route request counts, latency histograms and
+in-flight gauges. Routes are labelled with their path template
+(/api/todos/{todo_id}), unmatched paths share one label so scanners cannot
+blow up the series count. Query counts and times are collected by cursor
+events (instrument_engine) into a per-request context, so they are reported
+per route as well. Served in the text exposition format at /metrics.
+
+With several worker processes (serve.py) every worker writes its samples
+to PROMETHEUS_MULTIPROC_DIR and /metrics aggregates all of them.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency including the response body",
+    ["method", "route"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served",
+    ["method", "route"], multiprocess_mode="livesum",
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request", "Database queries executed per request",
+    ["method", "route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_QUERY_DURATION = Histogram(
+    "db_query_duration_per_request_seconds", "Time spent in database queries per request",
+    ["method", "route"],
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Duration of single database statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool, including waiting",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+PASSWORD_HASHING = Histogram(
+    "password_hashing_seconds", "bcrypt time per operation on the password pool",
+    ["operation"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5),
+)
+PASSWORD_REJECTED = Counter(
+    "password_hashing_rejected_total", "Password operations rejected because the pool was saturated",
+)
+
+
+class RequestStats:
+    """Database work done while serving one request"""
+
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# Set by the middleware; threadpool endpoints and streaming bodies run in a
+# copy of the request context and update the same object
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Stats of the request being served, None outside of requests"""
+    return _request_stats.get()
+
+
+# ===== Database =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    QUERY_DURATION.observe(elapsed)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Time the statements of an engine (the sync engine of async ones); idempotent"""
+    if METRICS_ENABLED and not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+class _TimedCheckout:
+    """Pool mixin observing how long getting a connection takes"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+# ===== HTTP =====
+
+def route_label(app, scope: Scope) -> str:
+    """Path template of the route a request is dispatched to"""
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # path matches, method does not (405)
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request and per-request database metrics"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_label(scope["app"], scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - start)
+            in_progress.dec()
+            _request_stats.reset(token)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_QUERY_DURATION.labels(method, route).observe(stats.query_seconds)
+
+
+def render() -> tuple:
+    """(body, content type) of the current metrics in the text exposition format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
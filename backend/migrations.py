@@ -0,0 +1,170 @@
+"""
+Versioned schema migrations
+
+Base.metadata.create_all only creates missing tables, it never alters
+existing ones. Schema changes for existing databases are therefore listed
+here as numbered migrations. Applied versions are recorded in the
+schema_migrations table, so running the migrations is idempotent and safe
+against a live database file.
+
+Run with: python migrations.py
+"""
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Dialect, Engine
+from sqlalchemy.types import TypeEngine
+
+import models
+import rollups
+from database import Base, UTCDateTime, schema_lock
+
+logger = logging.getLogger(__name__)
+
+# A step is either a SQL statement or a callable receiving the connection
+Step = Union[str, Callable[[Connection], None]]
+
+
+def add_column_ddl(dialect: Dialect, table: str, column: str, ddl: Union[str, TypeEngine]) -> str:
+    """ALTER TABLE statement adding a column; types are compiled for the dialect"""
+    if not isinstance(ddl, str):
+        ddl = ddl.compile(dialect=dialect)
+    return f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"
+
+
+def add_column(table: str, column: str, ddl: Union[str, TypeEngine]) -> Callable[[Connection], None]:
+    """
+    Step adding a column unless it exists already (fresh databases get all
+    columns from create_all before the migrations run)
+    """
+    def step(connection: Connection) -> None:
+        columns = {c["name"] for c in inspect(connection).get_columns(table)}
+        if column not in columns:
+            connection.execute(text(add_column_ddl(connection.dialect, table, column, ddl)))
+    return step
+
+
+# (version, description, steps) - append only, never edit applied migrations
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "Add indexes for hot query patterns", [
+        "CREATE INDEX IF NOT EXISTS ix_time_entries_user_timestamp ON time_entries (user_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_time_entries_todo_id ON time_entries (todo_id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_entries_project_id ON time_entries (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_projects_user_id ON projects (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_todos_project_id ON todos (project_id)",
+    ]),
+    (2, "Add idempotency keys to time entries", [
+        add_column("time_entries", "idempotency_key", "VARCHAR"),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_time_entries_idempotency_key_user "
+        "ON time_entries (idempotency_key, user_id)",
+    ]),
+    (3, "Create and backfill time entry rollups", [
+        lambda connection: models.TimeEntryRollup.__table__.create(connection, checkfirst=True),
+        lambda connection: rollups.rebuild(connection),
+    ]),
+    (4, "Create collection versions", [
+        lambda connection: models.CollectionVersion.__table__.create(connection, checkfirst=True),
+    ]),
+    (5, "Track updated_at and deletions for delta sync", [
+        add_column("projects", "updated_at", UTCDateTime()),
+        add_column("todos", "updated_at", UTCDateTime()),
+        add_column("time_entries", "updated_at", UTCDateTime()),
+        "UPDATE projects SET updated_at = created_at WHERE updated_at IS NULL",
+        "UPDATE todos SET updated_at = created_at WHERE updated_at IS NULL",
+        "UPDATE time_entries SET updated_at = timestamp WHERE updated_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_projects_user_updated_at ON projects (user_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_time_entries_user_updated_at ON time_entries (user_id, updated_at)",
+        lambda connection: models.DeletedRecord.__table__.create(connection, checkfirst=True),
+    ]),
+    (6, "Index rollup foreign keys for database-side cascades", [
+        "CREATE INDEX IF NOT EXISTS ix_time_entry_rollups_project_id ON time_entry_rollups (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_time_entry_rollups_todo_id ON time_entry_rollups (todo_id)",
+    ]),
+    (7, "Create cache invalidations for multi-worker deployments", [
+        lambda connection: models.CacheInvalidation.__table__.create(connection, checkfirst=True),
+    ]),
+    (8, "Create active timer sessions", [
+        lambda connection: models.ActiveSession.__table__.create(connection, checkfirst=True),
+    ]),
+    (9, "Bucket time entry rollups by UTC hour", [
+        "DROP TABLE IF EXISTS time_entry_rollups",
+        lambda connection: models.TimeEntryRollup.__table__.create(connection),
+        lambda connection: rollups.rebuild(connection),
+    ]),
+]
+
+
+def _ensure_version_table(connection: Connection) -> None:
+    """Create the schema_migrations bookkeeping table if missing"""
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def get_schema_version(engine: Engine) -> int:
+    """Return the highest applied migration version (0 if none)"""
+    with engine.begin() as connection:
+        _ensure_version_table(connection)
+        version = connection.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return version or 0
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Apply all pending migrations, each in its own transaction
+
+    Args:
+        engine: Engine bound to the database to migrate
+
+    Returns:
+        List of versions that were applied by this call
+    """
+    current = get_schema_version(engine)
+    applied = []
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            for step in steps:
+                if callable(step):
+                    step(connection)
+                else:
+                    connection.execute(text(step))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {"version": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+        logger.info(f"Applied migration {version}: {description}")
+        applied.append(version)
+
+    return applied
+
+
+def init_schema(engine: Engine) -> List[int]:
+    """
+    Create missing tables and apply pending migrations, once across processes
+
+    Every worker process calls this on startup. Only the first one finds the
+    schema out of date and does the work under schema_lock; the others wait
+    for it and then see nothing left to do.
+    """
+    if get_schema_version(engine) >= MIGRATIONS[-1][0]:
+        return []
+    with schema_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        return migrate(engine)
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    applied = init_schema(engine)
+    print(f"Schema at version {get_schema_version(engine)} (applied: {applied or 'none'})")
@@ -2,10 +2,10 @@
 SQLAlchemy models for the timetracking application
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
-from database import Base
-import bcrypt
+from database import Base, UTCDateTime
+import passwords
 
 
 class User(Base):
@@ -15,7 +15,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
 
     # Relationships
     projects = relationship("Project", back_populates="user", cascade="all, delete-orphan")
@@ -24,12 +24,12 @@ class User(Base):
 
     def verify_password(self, password: str) -> bool:
         """Verify password against hashed password"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.hashed_password.encode('utf-8'))
+        return passwords.verify_password(password, self.hashed_password)
 
     @staticmethod
     def hash_password(password: str) -> str:
         """Hash a password using bcrypt"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return passwords.hash_password(password)
 
 
 class Project(Base):
@@ -40,13 +40,23 @@ class Project(Base):
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String, nullable=False)
     color = Column(String, nullable=False)
-    is_completed = Column(Integer, default=0)  # SQLite: 0=False, 1=True
-    created_at = Column(DateTime, default=datetime.utcnow)
+    is_completed = Column(Boolean, default=False)  # SQLite stores 0/1
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_projects_user_id", "user_id"),
+        Index("ix_projects_user_updated_at", "user_id", "updated_at"),
+    )
 
     # Relationships
     user = relationship("User", back_populates="projects")
-    todos = relationship("Todo", back_populates="project", cascade="all, delete-orphan")
-    time_entries = relationship("TimeEntry", back_populates="project", cascade="all, delete-orphan")
+    # passive_deletes: the ON DELETE CASCADE of the child tables removes them,
+    # the ORM never loads a project's history just to delete it
+    todos = relationship("Todo", back_populates="project", cascade="all, delete-orphan",
+                         passive_deletes=True)
+    time_entries = relationship("TimeEntry", back_populates="project", cascade="all, delete-orphan",
+                                passive_deletes=True)
 
 
 class Todo(Base):
@@ -57,11 +67,18 @@ class Todo(Base):
     project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     title = Column(String, nullable=False)
     status = Column(String, default="todo")  # todo | in-progress | done
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(UTCDateTime, default=datetime.utcnow)
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_todos_project_id", "project_id"),
+    )
 
     # Relationships
     project = relationship("Project", back_populates="todos")
-    time_entries = relationship("TimeEntry", back_populates="todo", cascade="all, delete-orphan")
+    # passive_deletes: the ON DELETE CASCADE of time_entries.todo_id removes them
+    time_entries = relationship("TimeEntry", back_populates="todo", cascade="all, delete-orphan",
+                                passive_deletes=True)
 
 
 class TimeEntry(Base):
@@ -73,7 +90,19 @@ class TimeEntry(Base):
     todo_id = Column(Integer, ForeignKey("todos.id", ondelete="CASCADE"), nullable=False)
     project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     duration = Column(Integer, nullable=False)  # Duration in seconds
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(UTCDateTime, default=datetime.utcnow)
+    idempotency_key = Column(String, nullable=True)  # Client-chosen, makes bulk retries safe
+    updated_at = Column(UTCDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Serves the per-user listing (ordered by timestamp) and range-filtered stats
+        Index("ix_time_entries_user_timestamp", "user_id", "timestamp"),
+        Index("ix_time_entries_todo_id", "todo_id"),
+        Index("ix_time_entries_project_id", "project_id"),
+        # Key first, so the planner never prefers it over user_timestamp for user_id lookups
+        Index("ix_time_entries_idempotency_key_user", "idempotency_key", "user_id", unique=True),
+        Index("ix_time_entries_user_updated_at", "user_id", "updated_at"),
+    )
 
     # Relationships
     user = relationship("User", back_populates="time_entries")
@@ -81,6 +110,85 @@ class TimeEntry(Base):
     project = relationship("Project", back_populates="time_entries")
 
 
+class ActiveSession(Base):
+    """ActiveSession model - the running or paused timer of a user (at most
+    one), kept on the server so it survives closed tabs and is shared by
+    all devices. Stopping it turns it into a TimeEntry."""
+    __tablename__ = "active_sessions"
+
+    # Keyed by user: the current session is a primary key lookup
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    todo_id = Column(Integer, ForeignKey("todos.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    started_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
+    resumed_at = Column(UTCDateTime, nullable=True)  # Start of the running stretch, NULL while paused
+    elapsed = Column(Integer, nullable=False, default=0)  # Seconds tracked before resumed_at
+
+    __table_args__ = (
+        # Child-key indexes for the ON DELETE CASCADE of projects and todos
+        Index("ix_active_sessions_todo_id", "todo_id"),
+        Index("ix_active_sessions_project_id", "project_id"),
+    )
+
+
+class TimeEntryRollup(Base):
+    """TimeEntryRollup model - tracked time per user, project, todo and UTC hour,
+    maintained on write so stats don't have to scan time_entries"""
+    __tablename__ = "time_entry_rollups"
+
+    # Primary key order (user_id, hour, ...) also serves the per-user time range scans
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    hour = Column(UTCDateTime, primary_key=True)  # Start of the UTC hour
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    todo_id = Column(Integer, ForeignKey("todos.id", ondelete="CASCADE"), primary_key=True)
+    total_seconds = Column(Integer, nullable=False, default=0)
+    session_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Child-key indexes for the ON DELETE CASCADE of projects and todos
+        Index("ix_time_entry_rollups_project_id", "project_id"),
+        Index("ix_time_entry_rollups_todo_id", "todo_id"),
+    )
+
+
+class CollectionVersion(Base):
+    """CollectionVersion model - per-user change counter of a list endpoint,
+    bumped by every write and used as its ETag"""
+    __tablename__ = "collection_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    collection = Column(String, primary_key=True)  # projects | todos | timeentries
+    version = Column(Integer, nullable=False, default=0)
+
+
+class DeletedRecord(Base):
+    """DeletedRecord model - tombstone of a deleted project or todo
+    for delta sync. Cascaded children get no tombstone of their own: a
+    deleted project implies its todos and time entries."""
+    __tablename__ = "deleted_records"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(String, nullable=False)  # project | todo
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_deleted_records_user_deleted_at", "user_id", "deleted_at"),
+    )
+
+
+class CacheInvalidation(Base):
+    """CacheInvalidation model - a key to drop from an in-process cache,
+    polled by every worker process (see invalidation.py)"""
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache = Column(String, nullable=False)  # user
+    key = Column(String, nullable=False)
+    created_at = Column(UTCDateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
 class PomodoroSettings(Base):
     """PomodoroSettings model - user-specific timer configuration"""
     __tablename__ = "pomodoro_settings"
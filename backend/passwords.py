@@ -0,0 +1,86 @@
+"""
+Password hashing on a dedicated, bounded worker pool
+
+bcrypt is deliberately slow (~250 ms at cost 12). Running it on the request
+threadpool lets a burst of logins starve all other endpoints, so hashing
+and verification run on their own small executor instead. When more than
+PASSWORD_QUEUE_LIMIT operations are pending, new ones are rejected at once
+with PasswordHasherBusy rather than queueing up behind the burst.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import PASSWORD_HASHING, PASSWORD_REJECTED
+
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads give real parallelism here
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Maximum number of running plus queued operations before rejecting
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(PASSWORD_WORKERS * 8)))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the password worker pool is saturated"""
+
+
+def hash_password(password: str) -> str:
+    """Hash a password using bcrypt with the configured cost (blocking)"""
+    import bcrypt  # imported on first use, keeps worker startup lean
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """Verify a password against a bcrypt hash (blocking)"""
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Check whether a hash was created with a different cost than configured"""
+    try:
+        # Format: $2b$<cost>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def _timed(operation: str, func, *args):
+    """Run func and record its duration, excluding the time queued"""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        PASSWORD_HASHING.labels(operation).observe(time.perf_counter() - start)
+
+
+async def _run(operation: str, func, *args):
+    """Run func on the password pool, rejecting immediately when saturated"""
+    if not _slots.acquire(blocking=False):
+        PASSWORD_REJECTED.inc()
+        raise PasswordHasherBusy("Password hashing capacity exhausted")
+    try:
+        future = _executor.submit(_timed, operation, func, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    # Free the slot when the work finishes, even if the request was cancelled
+    future.add_done_callback(lambda _: _slots.release())
+    return await asyncio.wrap_future(future)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password worker pool"""
+    return await _run("hash", hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool"""
+    return await _run("verify", verify_password, password, hashed_password)
@@ -0,0 +1,166 @@
+"""
+Request-scoped SQL profiling for development (SQL_PROFILE=true)
+
+Records every statement a request issues and, when the request finishes:
+
+- logs the statement count and database time per request,
+- warns about N+1 patterns: the same statement shape (the SQL text with
+  its placeholders) executed SQL_PROFILE_REPEAT_THRESHOLD times or more,
+- logs statements slower than SQL_PROFILE_SLOW_MS together with their
+  EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (PostgreSQL) output,
+- adds a Server-Timing header (db and app time) for the browser devtools.
+
+Finished profiles are also passed to the callables in OBSERVERS, which is
+how the query_budget pytest plugin checks budgets per endpoint.
+"""
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() in ("1", "true", "yes")
+SQL_PROFILE_SLOW_MS = float(os.getenv("SQL_PROFILE_SLOW_MS", "50"))
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+
+
+class RequestProfile:
+    """Statements issued while serving one request"""
+
+    def __init__(self, method: str, route: str):
+        self.method = method
+        self.route = route
+        self.statements: List[Tuple[str, float]] = []  # (SQL, seconds)
+        self.status_code: Optional[int] = None
+
+    @property
+    def query_count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def query_seconds(self) -> float:
+        return sum(duration for _, duration in self.statements)
+
+    def repeated(self, threshold: int = SQL_PROFILE_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statement shapes executed at least threshold times, most frequent first"""
+        counts = Counter(statement for statement, _ in self.statements)
+        return [(statement, count) for statement, count in counts.most_common() if count >= threshold]
+
+    def __repr__(self) -> str:
+        return f"<{self.method} {self.route}: {self.query_count} queries, {self.query_seconds * 1000:.1f} ms>"
+
+
+_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+# Callables receiving each finished RequestProfile
+OBSERVERS: List[Callable[[RequestProfile], None]] = []
+
+
+# ===== Database =====
+
+def explain(connection, statement: str, parameters) -> str:
+    """Query plan of a statement, run on the raw DBAPI connection so it is not profiled itself"""
+    if connection.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif connection.dialect.name == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return "(no plan for this dialect)"
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as exc:
+        return f"(plan unavailable: {exc})"
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profile_start"].pop()
+    profile = _profile.get()
+    if profile is None:
+        return
+    profile.statements.append((statement, elapsed))
+    if elapsed * 1000 >= SQL_PROFILE_SLOW_MS:
+        plan = "(executemany)" if executemany else explain(conn, statement, parameters)
+        logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms) in {profile.method} {profile.route}:\n"
+            f"{statement}\nPlan:\n{plan}"
+        )
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Record the statements of an engine into the current request profile; idempotent"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+# ===== HTTP =====
+
+def _report(profile: RequestProfile, elapsed: float) -> None:
+    logger.info(
+        f"{profile.method} {profile.route} -> {profile.status_code}: {profile.query_count} queries, "
+        f"{profile.query_seconds * 1000:.1f} ms in db, {elapsed * 1000:.1f} ms total"
+    )
+    for statement, count in profile.repeated():
+        logger.warning(f"Possible N+1 in {profile.method} {profile.route}: {count}x {statement}")
+    for observer in OBSERVERS:
+        observer(profile)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware collecting a RequestProfile per request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], route_label(scope["app"], scope))
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                # Streaming bodies may still query after this point
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", (
+                    f'db;dur={profile.query_seconds * 1000:.1f};desc="{profile.query_count} queries", '
+                    f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+                ))
+            await send(message)
+
+        token = _profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile.reset(token)
+            _report(profile, time.perf_counter() - start)
+
+
+def install(app, *engines: Engine) -> None:
+    """Profile the requests of an app and the statements of the given engines"""
+    for engine in engines:
+        instrument_engine(engine)
+    if not any(middleware.cls is ProfilingMiddleware for middleware in app.user_middleware):
+        app.add_middleware(ProfilingMiddleware)
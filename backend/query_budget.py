@@ -0,0 +1,58 @@
+"""
+pytest plugin asserting SQL query budgets per request
+
+Loaded with `pytest_plugins = ["query_budget"]`; the app and the test
+engine must be profiled (profiling.install(app, engine)). Then:
+
+    def test_list_projects(auth_client, query_budget):
+        with query_budget(2):
+            auth_client.get("/api/projects")
+
+fails if any request inside the block issues more than 2 statements or
+repeats one statement shape SQL_PROFILE_REPEAT_THRESHOLD times (N+1).
+"""
+from contextlib import contextmanager
+from typing import List, Optional
+
+import pytest
+
+import profiling
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request issued more statements than its budget allows"""
+
+
+def check_budget(profiles: List[profiling.RequestProfile], max_queries: int,
+                 max_repeats: Optional[int] = None) -> None:
+    """Raise QueryBudgetExceeded listing every request over budget"""
+    if not profiles:
+        raise QueryBudgetExceeded("No requests were profiled, is profiling.install(app, engine) called?")
+    threshold = max_repeats + 1 if max_repeats is not None else profiling.SQL_PROFILE_REPEAT_THRESHOLD
+    problems = []
+    for profile in profiles:
+        if profile.query_count > max_queries:
+            statements = "\n".join(f"    {statement}" for statement, _ in profile.statements)
+            problems.append(f"{profile!r} exceeds the budget of {max_queries}:\n{statements}")
+        for statement, count in profile.repeated(threshold):
+            problems.append(f"{profile!r} repeats a statement {count}x (N+1):\n    {statement}")
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems))
+
+
+@pytest.fixture
+def query_budget():
+    """Context manager factory: query_budget(max_queries, max_repeats=None)"""
+
+    @contextmanager
+    def budget(max_queries: int, max_repeats: Optional[int] = None):
+        profiles: List[profiling.RequestProfile] = []
+        observer = profiles.append
+        profiling.OBSERVERS.append(observer)
+        try:
+            yield profiles
+        finally:
+            profiling.OBSERVERS.remove(observer)
+        check_budget(profiles, max_queries, max_repeats)
+
+    return budget
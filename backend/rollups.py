@@ -0,0 +1,98 @@
+"""
+Maintenance of the time_entry_rollups table
+
+The rollup holds total_seconds and session_count per (user, project, todo,
+UTC hour). It is updated in the same transaction as every time entry insert;
+rows of deleted projects and todos go with the ON DELETE CASCADE of
+project_id and todo_id. Stats queries therefore read O(active hours x todos)
+rollup rows instead of every time entry. Hours rather than days, so that
+local days of every whole-hour timezone offset are sums of whole buckets.
+
+Rebuild from time_entries with: python rollups.py
+"""
+from collections import defaultdict
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import bindparam, delete, func, insert, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import models
+from database import dialect_insert, execute_many, utc_hour
+
+Rollup = models.TimeEntryRollup
+
+ROLLUP_COLUMNS = [Rollup.__table__.c[name] for name in (
+    "user_id", "hour", "project_id", "todo_id", "total_seconds", "session_count"
+)]
+
+
+def add_entries(db: Session, entries: Iterable[dict]) -> None:
+    """
+    Add time entries to the rollup (does not commit)
+
+    Args:
+        db: Session whose transaction also inserts the entries
+        entries: Dicts with user_id, project_id, todo_id, timestamp and duration
+    """
+    buckets = defaultdict(lambda: [0, 0])
+    for entry in entries:
+        hour = entry["timestamp"].replace(minute=0, second=0, microsecond=0)
+        key = (entry["user_id"], hour, entry["project_id"], entry["todo_id"])
+        buckets[key][0] += entry["duration"]
+        buckets[key][1] += 1
+    if not buckets:
+        return
+
+    # One statement run as executemany: a multi-row VALUES clause would be
+    # compiled anew for every distinct number of buckets
+    stmt = dialect_insert(db)(Rollup.__table__).values(
+        {column.name: bindparam(column.name, type_=column.type) for column in ROLLUP_COLUMNS}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "hour", "project_id", "todo_id"],
+        set_={
+            "total_seconds": Rollup.total_seconds + stmt.excluded.total_seconds,
+            "session_count": Rollup.session_count + stmt.excluded.session_count,
+        }
+    )
+    execute_many(db, stmt, ROLLUP_COLUMNS, [
+        (user_id, hour, project_id, todo_id, total, count)
+        for (user_id, hour, project_id, todo_id), (total, count) in buckets.items()
+    ])
+
+
+def rebuild(db: Union[Session, Connection], user_id: Optional[int] = None) -> None:
+    """
+    Recompute the rollup from time_entries (does not commit)
+
+    Args:
+        db: Session or connection
+        user_id: Only rebuild this user's rows; all users if None
+    """
+    entry = models.TimeEntry
+    hour = utc_hour(entry.timestamp)
+    source = select(
+        entry.user_id, hour, entry.project_id, entry.todo_id,
+        func.sum(entry.duration), func.count(entry.id)
+    ).group_by(entry.user_id, hour, entry.project_id, entry.todo_id)
+
+    clear = delete(Rollup)
+    if user_id is not None:
+        source = source.where(entry.user_id == user_id)
+        clear = clear.where(Rollup.user_id == user_id)
+
+    db.execute(clear)
+    db.execute(insert(Rollup).from_select(
+        ["user_id", "hour", "project_id", "todo_id", "total_seconds", "session_count"], source
+    ))
+
+
+if __name__ == "__main__":
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        rebuild(connection)
+        rows = connection.execute(select(func.count()).select_from(Rollup)).scalar()
+    print(f"Rollup rebuilt: {rows} rows")
@@ -1,9 +1,16 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, validator
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
+from datetime import date, datetime
+from typing import Annotated, List, Literal, Optional
+
+
+# ===== Constrained Types =====
+# Checked inside pydantic-core; strict rejects coercion such as "60" or 60.5
+
+Duration = Annotated[int, Field(strict=True, ge=0)]  # seconds
+TodoStatus = Literal["todo", "in-progress", "done"]
 
 
 # ===== User Schemas =====
@@ -13,14 +20,16 @@ class UserCreate(BaseModel):
     username: str
     password: str
     
-    @validator('username')
-    def username_min_length(cls, v):
+    @field_validator('username')
+    @classmethod
+    def username_min_length(cls, v: str) -> str:
         if len(v) < 3:
             raise ValueError('Username must be at least 3 characters')
         return v
     
-    @validator('password')
-    def password_min_length(cls, v):
+    @field_validator('password')
+    @classmethod
+    def password_min_length(cls, v: str) -> str:
         if len(v) < 6:
             raise ValueError('Password must be at least 6 characters')
         return v
@@ -37,9 +46,8 @@ class UserResponse(BaseModel):
     id: int
     username: str
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 class Token(BaseModel):
@@ -78,9 +86,8 @@ class ProjectResponse(ProjectBase):
     id: int
     is_completed: bool
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ===== Todo Schemas =====
@@ -99,17 +106,16 @@ class TodoCreate(TodoBase):
 class TodoUpdate(BaseModel):
     """Schema for updating a todo"""
     title: Optional[str] = None
-    status: Optional[str] = None
+    status: Optional[TodoStatus] = None
 
 
 class TodoResponse(TodoBase):
     """Schema for todo response"""
     id: int
-    status: str
+    status: TodoStatus
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ===== TimeEntry Schemas =====
@@ -118,7 +124,51 @@ class TimeEntryCreate(BaseModel):
     """Schema for creating a time entry"""
     todo_id: int
     project_id: Optional[int] = None
-    duration: int  # seconds
+    duration: Duration
+
+
+class TimeEntryBulkItem(TimeEntryCreate):
+    """Schema for one time entry of a bulk upload"""
+    timestamp: Optional[datetime] = None  # When the session ended; defaults to now
+    idempotency_key: Optional[str] = None  # Retrying with the same key never duplicates
+
+
+class TimeEntryBulkCreate(BaseModel):
+    """Schema for uploading a batch of time entries"""
+    entries: Annotated[List[TimeEntryBulkItem], Field(min_length=1, max_length=1000)]
+
+
+class TimeEntryBulkResult(BaseModel):
+    """Schema for the outcome of one bulk item"""
+    index: int
+    status: Literal["created", "duplicate", "error"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class TimeEntryBulkResponse(BaseModel):
+    """Schema for the bulk upload response"""
+    created: int
+    duplicates: int
+    errors: int
+    results: List[TimeEntryBulkResult]
+
+
+class TimeEntryImportError(BaseModel):
+    """Schema for a rejected row of an import"""
+    line: int
+    detail: str
+
+
+class TimeEntryImportResponse(BaseModel):
+    """Schema for the import summary"""
+    processed: int
+    imported: int
+    failed: int
+    batches: int  # Committed transactions
+    projects_created: int
+    todos_created: int
+    errors: List[TimeEntryImportError]  # The first IMPORT_MAX_ERRORS failures
 
 
 class TimeEntryResponse(BaseModel):
@@ -126,11 +176,52 @@ class TimeEntryResponse(BaseModel):
     id: int
     todo_id: int
     project_id: int
-    duration: int
+    duration: Duration
     timestamp: datetime
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TimeEntryPage(BaseModel):
+    """Schema for a page of time entries"""
+    items: List[TimeEntryResponse]
+    next_cursor: Optional[str] = None
+
+
+# ===== ActiveSession Schemas =====
+
+class ActiveSessionStart(BaseModel):
+    """Schema for starting a timer session"""
+    todo_id: int
+    project_id: Optional[int] = None
+
+
+class ActiveSessionResponse(BaseModel):
+    """Schema for the running or paused timer session"""
+    todo_id: int
+    project_id: int
+    started_at: datetime
+    resumed_at: Optional[datetime] = None  # null while paused
+    running: bool
+    duration: Duration  # Seconds tracked so far, as of the response
+
+
+# ===== Sync Schemas =====
+
+class DeletedRecord(BaseModel):
+    """Schema for a deletion since the sync watermark"""
+    entity: Literal["project", "todo"]
+    id: int
+
+
+class SyncResponse(BaseModel):
+    """Schema for the changes since a sync watermark"""
+    projects: List[ProjectResponse]
+    todos: List[TodoResponse]
+    time_entries: List[TimeEntryResponse]
+    deleted: List[DeletedRecord]
+    watermark: str  # Pass as ?since= on the next sync
+    full: bool  # True: snapshot replacing all local data
 
 
 # ===== PomodoroSettings Schemas =====
@@ -146,6 +237,43 @@ class PomodoroSettingsResponse(BaseModel):
     id: int
     focus_duration: int
     break_duration: int
-    
-    class Config:
-        from_attributes = True
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# ===== Stats Schemas =====
+
+class StatsTotals(BaseModel):
+    """Schema for aggregated tracked time"""
+    total_duration: int  # seconds
+    session_count: int
+
+
+class ProjectStats(StatsTotals):
+    """Schema for tracked time per project"""
+    project_id: int
+    name: str
+    color: str
+
+
+class DailyStats(StatsTotals):
+    """Schema for tracked time per day"""
+    date: date
+
+
+class TodoStats(BaseModel):
+    """Schema for tracked time per todo"""
+    todo_id: int
+    title: str
+    project_id: int
+    project_name: str
+    project_color: str
+    total_duration: int  # seconds
+
+
+# ===== List Adapters =====
+# Validate and serialize whole list responses in one pydantic-core call
+
+ProjectListAdapter = TypeAdapter(List[ProjectResponse])
+TodoListAdapter = TypeAdapter(List[TodoResponse])
+TimeEntryPageAdapter = TypeAdapter(TimeEntryPage)
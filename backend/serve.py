@@ -0,0 +1,75 @@
+"""
+Production entry point: uvicorn with one worker process per CPU
+
+Worker count comes from WEB_CONCURRENCY (default: CPUs available to this
+process). Workers share nothing but the database:
+
+- the schema is set up once, here before the workers start (the workers'
+  own startup check then finds it current; see migrations.init_schema)
+- in-process caches are invalidated across workers through the
+  cache_invalidations table (invalidation.py)
+- Prometheus samples are aggregated over PROMETHEUS_MULTIPROC_DIR, a fresh
+  temporary directory unless set
+
+Run with: python serve.py (HOST, PORT and WEB_CONCURRENCY from the environment)
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def default_workers() -> int:
+    """CPUs this process may run on (respects cpusets, e.g. in containers)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main() -> None:
+    load_dotenv()
+    workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+
+    from sqlalchemy.engine import make_url
+    url = make_url(os.getenv("DATABASE_URL", "sqlite:///./timetracking.db"))
+    if workers > 1 and url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        print("In-memory SQLite is private to one process, starting a single worker")
+        workers = 1
+    # Read by the workers (invalidation.ENABLED)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if workers > 1:
+        if multiproc_dir:
+            # Samples of a previous run would be added to the new ones
+            shutil.rmtree(multiproc_dir, ignore_errors=True)
+            os.makedirs(multiproc_dir)
+        else:
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="timetracking-metrics-")
+
+    # Imported only now, so DATABASE_URL and friends come from .env
+    from auth import check_secret_key
+    from database import engine
+    from migrations import init_schema
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    check_secret_key()  # before spawning workers that would each fail
+    init_schema(engine)
+    engine.dispose()  # no connections inherited by the workers
+
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "127.0.0.1"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        log_level=os.getenv("LOG_LEVEL", "INFO").lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Delta sync: changes of a user's data since a client watermark
+
+Projects, todos and time entries carry an updated_at column; deletions are
+recorded as tombstones in deleted_records. A client stores the watermark of
+its last sync and sends it back, receiving only rows changed after it
+instead of re-downloading every collection.
+
+Rows are selected with an overlap window before the watermark, so a write
+that committed with a slightly older updated_at than a concurrent sync saw
+is still delivered. Clients therefore upsert by id and must tolerate
+receiving the same row twice. Tombstones are kept for
+SYNC_TOMBSTONE_RETENTION_DAYS; a watermark older than that gets a full
+snapshot instead.
+"""
+import base64
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+import models
+
+PROJECT = "project"
+TODO = "todo"
+
+# Seconds before the watermark that are re-read on every delta sync
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+# Tombstones older than this are pruned; older watermarks get a full snapshot
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+
+def encode_watermark(moment: datetime) -> str:
+    """Encode a server timestamp as an opaque watermark token"""
+    return base64.urlsafe_b64encode(moment.isoformat().encode("utf-8")).decode("ascii")
+
+
+def decode_watermark(token: str) -> datetime:
+    """Decode a watermark created by encode_watermark"""
+    try:
+        return datetime.fromisoformat(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid sync watermark")
+
+
+def record_deletion(db: Session, user_id: int, entity: str, entity_id: int) -> None:
+    """
+    Store a tombstone for a deleted project or todo (does not commit)
+
+    Children removed by the cascade get no tombstone of their own, the
+    client drops them together with their parent.
+    """
+    now = datetime.utcnow()
+    db.add(models.DeletedRecord(user_id=user_id, entity=entity, entity_id=entity_id, deleted_at=now))
+    # Expired tombstones are no longer needed, see changes_since
+    db.query(models.DeletedRecord).filter(
+        models.DeletedRecord.user_id == user_id,
+        models.DeletedRecord.deleted_at < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    ).delete(synchronize_session=False)
+
+
+def changes_since(db: Session, user_id: int, since: Optional[str] = None) -> dict:
+    """
+    Collect the changes of a user's data after a watermark
+
+    Returns a full snapshot (full=True, no tombstones) when since is missing
+    or older than the tombstone retention, otherwise only rows updated after
+    the watermark minus the overlap window plus the tombstones since then.
+    """
+    watermark = datetime.utcnow()
+    since_at = decode_watermark(since) if since else None
+    full = since_at is None or since_at < watermark - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+
+    projects = db.query(models.Project).filter(models.Project.user_id == user_id)
+    todos = db.query(models.Todo).join(models.Project).filter(models.Project.user_id == user_id)
+    time_entries = db.query(models.TimeEntry).filter(models.TimeEntry.user_id == user_id)
+    deleted = []
+
+    if not full:
+        cutoff = since_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        projects = projects.filter(models.Project.updated_at > cutoff)
+        todos = todos.filter(models.Todo.updated_at > cutoff)
+        time_entries = time_entries.filter(models.TimeEntry.updated_at > cutoff)
+        deleted = [
+            {"entity": entity, "id": entity_id}
+            for entity, entity_id in db.query(
+                models.DeletedRecord.entity, models.DeletedRecord.entity_id
+            ).filter(
+                models.DeletedRecord.user_id == user_id,
+                models.DeletedRecord.deleted_at > cutoff
+            ).order_by(models.DeletedRecord.id)
+        ]
+
+    return {
+        "projects": projects.all(),
+        "todos": todos.all(),
+        "time_entries": time_entries.all(),
+        "deleted": deleted,
+        "watermark": encode_watermark(watermark),
+        "full": full,
+    }
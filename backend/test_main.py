@@ -2,18 +2,60 @@
 Unit tests for the Timetracking API
 Run with: pytest test_main.py -v
 """
+import os
+os.environ.setdefault("BCRYPT_ROUNDS", "4")  # keep password hashing fast in tests
+os.environ.setdefault("APP_ENV", "test")  # accept the built-in SECRET_KEY
+
+import asyncio
+import csv
+import io
+import json
 import pytest
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, event, func, insert, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from database import Base, get_db
+from sqlalchemy.pool import NullPool
+from database import Base, UTCDateTime, configure_engine, create_db_engine, get_async_db, get_db, log_database_settings, to_async_url
 from main import app
+import main
+import auth
+from auth import clear_auth_cache
+import async_api
+import database
+import exports
+import imports
+import invalidation
+import fastjson
+import metrics
+import passwords
+import profiling
+import rollups
+import sync
+import versions
+from migrations import MIGRATIONS, add_column_ddl, get_schema_version, init_schema, migrate
+from benchmarks import dataset, load
+from benchmarks.query_plans import HOT_QUERIES, assert_uses_index, explain
 import models
 
-# Test database (in-memory SQLite)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Test database: the SQLite file test.db, or any database in TEST_DATABASE_URL,
+# e.g. TEST_DATABASE_URL=postgresql://localhost/timetracking_test (dropped and
+# recreated per test, so never point it at real data)
+SQLALCHEMY_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "sqlite:///./test.db")
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
+sqlite_only = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite-specific")
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 
 def override_get_db():
@@ -27,10 +69,15 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+# Request profiles for the query_budget fixture
+profiling.install(app, engine)
+pytest_plugins = ["query_budget"]
+
 
 @pytest.fixture(scope="function")
 def test_db():
     """Create a fresh database for each test"""
+    clear_auth_cache()
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
@@ -42,6 +89,44 @@ def client(test_db):
     return TestClient(app)
 
 
+@pytest.fixture
+def auth_client(client):
+    """Test client fixture authenticated as a freshly registered user"""
+    credentials = {"username": "tester", "password": "secret123"}
+    client.post("/api/auth/register", json=credentials)
+    token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+def switch_user(client, username="other"):
+    """Register another user and authenticate the client as them"""
+    credentials = {"username": username, "password": "secret123"}
+    client.post("/api/auth/register", json=credentials)
+    token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+def create_project_with_todo(client, name="Test", color="blue", title="Test"):
+    """Create a project with one todo and return (project_id, todo_id)"""
+    project_id = client.post("/api/projects", json={"name": name, "color": color}).json()["id"]
+    todo_id = client.post("/api/todos", json={"project_id": project_id, "title": title}).json()["id"]
+    return project_id, todo_id
+
+
+@contextmanager
+def recorded_statements():
+    """Collect the SQL statements executed on the test engine"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+
 # ===== Health Check Tests =====
 
 def test_root_endpoint(client):
@@ -51,6 +136,205 @@ def test_root_endpoint(client):
     assert response.json() == {"status": "ok", "message": "Timetracking API is running"}
 
 
+# ===== Metrics Tests =====
+
+def test_metrics_per_route(auth_client):
+    """Test request counts, latency and query counts are labelled by route template"""
+    _, todo_id = create_project_with_todo(auth_client)
+    labels = {"method": "PATCH", "route": "/api/todos/{todo_id}"}
+    sample = lambda name, **extra: REGISTRY.get_sample_value(name, {**labels, **extra}) or 0
+    requests_before = sample("http_requests_total", status="200")
+    queries_before = sample("db_queries_per_request_sum")
+
+    for status in ("in-progress", "done"):
+        assert auth_client.patch(f"/api/todos/{todo_id}", json={"status": status}).status_code == 200
+    auth_client.get("/does-not-exist/42")
+
+    assert sample("http_requests_total", status="200") == requests_before + 2
+    assert sample("http_request_duration_seconds_count") >= 2
+    assert sample("http_requests_in_progress") == 0
+    assert sample("db_queries_per_request_sum") >= queries_before + 2
+    assert REGISTRY.get_sample_value("http_requests_total", {
+        "method": "GET", "route": metrics.UNMATCHED_ROUTE, "status": "404"
+    })
+
+    response = auth_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'password_hashing_seconds_count{operation="hash"}' in response.text
+    assert "db_pool_checkout_seconds_count" in response.text
+
+
+# ===== Startup Tests =====
+
+def test_import_has_no_side_effects(tmp_path):
+    """Test importing the app neither touches the database nor loads jose or bcrypt"""
+    database_file = tmp_path / "untouched.db"
+    code = "import sys, main; print(sorted(m for m in ('jose', 'bcrypt') if m in sys.modules))"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database_file}"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+    assert not database_file.exists()
+
+
+def test_lifespan_initializes_schema(tmp_path, monkeypatch):
+    """Test the schema is created on startup instead of on import"""
+    startup_engine = create_db_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    monkeypatch.setattr(main, "engine", startup_engine)
+    with TestClient(app):
+        pass
+    assert get_schema_version(startup_engine) == MIGRATIONS[-1][0]
+    assert "time_entries" in inspect(startup_engine).get_table_names()
+    startup_engine.dispose()
+
+
+def test_startup_requires_secret_key(monkeypatch):
+    """Test the app refuses to start with the built-in SECRET_KEY in production"""
+    monkeypatch.setattr(auth, "APP_ENV", "production")
+    monkeypatch.setattr(auth, "SECRET_KEY", auth.DEFAULT_SECRET_KEY)
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        with TestClient(app):
+            pass
+
+    monkeypatch.setattr(auth, "SECRET_KEY", "a-real-secret")
+    auth.check_secret_key()
+
+
+# ===== Auth Tests =====
+
+def test_me_is_served_from_cache(auth_client):
+    """Test that repeated authenticated requests skip the user lookup"""
+    assert auth_client.get("/api/auth/me").json()["username"] == "tester"
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = auth_client.get("/api/auth/me")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert response.json()["username"] == "tester"
+    assert not any("FROM users" in statement for statement in statements)
+
+
+def test_cache_invalidated_on_user_delete(auth_client):
+    """Test that a deleted user is no longer authenticated from the cache"""
+    assert auth_client.get("/api/auth/me").status_code == 200
+
+    db = TestingSessionLocal()
+    db.delete(db.query(models.User).filter(models.User.username == "tester").one())
+    db.commit()
+    db.close()
+
+    assert auth_client.get("/api/auth/me").status_code == 401
+
+
+def test_cache_invalidated_across_workers(auth_client, monkeypatch):
+    """Test a user change published by another worker evicts the cached user here"""
+    monkeypatch.setattr(invalidation, "ENABLED", True)
+    assert auth_client.get("/api/auth/me").status_code == 200
+    listener = invalidation.Listener(engine)
+    listener.start()
+    listener.stop()
+
+    # Another worker renames the user: it publishes, this process only polls
+    with engine.begin() as connection:
+        connection.execute(update(models.User).where(models.User.username == "tester").values(username="renamed"))
+        invalidation.publish(connection, "user", "tester")
+    assert auth_client.get("/api/auth/me").json()["username"] == "tester"  # stale until polled
+
+    assert listener.poll() == 1
+    assert listener.poll() == 0
+    assert auth_client.get("/api/auth/me").status_code == 401
+
+    # ORM changes publish for the other workers in their own transaction
+    db = TestingSessionLocal()
+    db.delete(db.query(models.User).filter(models.User.username == "renamed").one())
+    db.commit()
+    db.close()
+    assert listener.poll() == 1
+
+
+def test_cache_invalidation_committed_out_of_id_order(auth_client, monkeypatch):
+    """Test a row committed after one with a higher id is still applied"""
+    monkeypatch.setattr(invalidation, "ENABLED", True)
+    evicted = []
+    monkeypatch.setitem(invalidation._handlers, "test", evicted.append)
+    listener = invalidation.Listener(engine)
+    listener.start()
+    listener.stop()
+
+    # As with PostgreSQL sequences: id 1000 commits first, id 999 later
+    for row_id in (1000, 999):
+        with engine.begin() as connection:
+            connection.execute(insert(models.CacheInvalidation).values(
+                id=row_id, cache="test", key=str(row_id), created_at=datetime.utcnow()
+            ))
+        assert listener.poll() == 1
+    assert listener.poll() == 0
+    assert evicted == ["1000", "999"]
+
+
+def test_login_rehashes_on_cost_change(client, monkeypatch):
+    """Test that login upgrades a hash created with a different bcrypt cost"""
+    credentials = {"username": "tester", "password": "secret123"}
+    client.post("/api/auth/register", json=credentials)
+
+    monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 5)
+    assert client.post("/api/auth/login", json=credentials).status_code == 200
+
+    db = TestingSessionLocal()
+    user = db.query(models.User).filter(models.User.username == "tester").one()
+    assert user.hashed_password.startswith("$2b$05$")
+    assert user.verify_password("secret123")
+    db.close()
+    assert client.post("/api/auth/login", json=credentials).status_code == 200
+
+
+def test_auth_database_work_off_the_event_loop(client, monkeypatch):
+    """Test register and login (including the rehash commit) never query on the event loop"""
+    on_loop = []
+
+    def listener(conn, cursor, statement, *args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(statement)
+        except RuntimeError:
+            pass  # a threadpool worker
+
+    credentials = {"username": "tester", "password": "secret123"}
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.post("/api/auth/register", json=credentials).status_code == 201
+        monkeypatch.setattr(passwords, "BCRYPT_ROUNDS", 5)
+        assert client.post("/api/auth/login", json=credentials).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert on_loop == []
+
+
+def test_login_rejected_when_hasher_saturated(client, monkeypatch):
+    """Test fast 503 rejection when the password pool has no free slots"""
+    credentials = {"username": "tester", "password": "secret123"}
+    client.post("/api/auth/register", json=credentials)
+
+    monkeypatch.setattr(passwords, "_slots", threading.BoundedSemaphore(1))
+    passwords._slots.acquire()
+    response = client.post("/api/auth/login", json=credentials)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_invalid_token_rejected(client):
+    """Test that a tampered token is rejected"""
+    response = client.get("/api/auth/me", headers={"Authorization": "Bearer not.a.token"})
+    assert response.status_code == 401
+
+
 # ===== Project Tests =====
 
 def test_create_project(client):
@@ -212,8 +496,8 @@ def test_update_todo_invalid_status(client):
     todo_id = todo_response.json()["id"]
     
     response = client.patch(f"/api/todos/{todo_id}", json={"status": "invalid"})
-    assert response.status_code == 400
-    assert "invalid status" in response.json()["detail"].lower()
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "status"]
 
 
 def test_delete_todo(client):
@@ -296,7 +580,7 @@ def test_get_time_entries(client):
     
     response = client.get("/api/timeentries")
     assert response.status_code == 200
-    assert len(response.json()) == 2
+    assert len(response.json()["items"]) == 2
 
 
 def test_cascade_delete_project_time_entries(client):
@@ -313,7 +597,7 @@ def test_cascade_delete_project_time_entries(client):
     
     # Verify time entries are gone
     response = client.get("/api/timeentries")
-    assert len(response.json()) == 0
+    assert len(response.json()["items"]) == 0
 
 
 def test_cascade_delete_todo_time_entries(client):
@@ -330,7 +614,460 @@ def test_cascade_delete_todo_time_entries(client):
     
     # Verify time entries are gone
     response = client.get("/api/timeentries")
-    assert len(response.json()) == 0
+    assert len(response.json()["items"]) == 0
+
+
+def test_delete_todo_cascades_in_database(auth_client):
+    """Test that a todo delete is one ownership-scoped DELETE cascading in the database"""
+    _, todo_id = create_project_with_todo(auth_client)
+    auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "duration": 60} for _ in range(500)
+    ]})
+
+    with recorded_statements() as statements:
+        assert auth_client.delete(f"/api/todos/{todo_id}").status_code == 200
+    assert not any("FROM time_entries" in statement for statement in statements)
+    assert [s for s in statements if s.lstrip().startswith("DELETE FROM todos")] != []
+
+    db = TestingSessionLocal()
+    assert db.query(models.TimeEntry).count() == 0
+    assert db.query(models.TimeEntryRollup).count() == 0
+    db.close()
+
+
+def test_todo_writes_check_ownership(auth_client):
+    """Test that another user's todo can be neither changed, deleted nor tracked"""
+    _, todo_id = create_project_with_todo(auth_client)
+    switch_user(auth_client)
+
+    assert auth_client.patch(f"/api/todos/{todo_id}", json={"status": "done"}).status_code == 404
+    assert auth_client.delete(f"/api/todos/{todo_id}").status_code == 404
+    assert auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 60}).status_code == 404
+
+
+def test_delete_project_with_large_history(auth_client):
+    """Test that deleting a project with 100k entries runs in the database, in bounded time and memory"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    db = TestingSessionLocal()
+    user_id = db.query(models.User.id).filter(models.User.username == "tester").scalar()
+    now = datetime.utcnow()
+    db.execute(models.TimeEntry.__table__.insert(), [
+        {"user_id": user_id, "todo_id": todo_id, "project_id": project_id, "duration": 60,
+         "timestamp": now - timedelta(minutes=i), "updated_at": now}
+        for i in range(100_000)
+    ])
+    rollups.rebuild(db, user_id)
+    db.commit()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    with recorded_statements() as statements:
+        response = auth_client.delete(f"/api/projects/{project_id}")
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert response.status_code == 200
+    assert not any("FROM time_entries" in statement or "FROM todos" in statement for statement in statements)
+    assert elapsed < 10
+    assert peak < 10 * 1024 * 1024
+    assert db.query(models.TimeEntry).count() == 0
+    assert db.query(models.TimeEntryRollup).count() == 0
+    db.close()
+
+
+def test_time_entries_cursor_pagination(auth_client):
+    """Test that cursor pages are disjoint, ordered newest first and complete"""
+    _, todo_id = create_project_with_todo(auth_client)
+    for duration in range(1, 8):
+        auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": duration})
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        page = auth_client.get("/api/timeentries", params=params).json()
+        assert len(page["items"]) <= 3
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [e["duration"] for e in seen] == [7, 6, 5, 4, 3, 2, 1]
+    assert len({e["id"] for e in seen}) == 7
+
+
+def test_time_entries_filters(auth_client):
+    """Test project, todo and time range filters"""
+    project1_id, todo1_id = create_project_with_todo(auth_client, name="A")
+    _, todo2_id = create_project_with_todo(auth_client, name="B")
+    auth_client.post("/api/timeentries", json={"todo_id": todo1_id, "duration": 100})
+    auth_client.post("/api/timeentries", json={"todo_id": todo2_id, "duration": 200})
+
+    items = auth_client.get("/api/timeentries", params={"project_id": project1_id}).json()["items"]
+    assert [e["duration"] for e in items] == [100]
+    items = auth_client.get("/api/timeentries", params={"todo_id": todo2_id}).json()["items"]
+    assert [e["duration"] for e in items] == [200]
+
+    future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    assert auth_client.get("/api/timeentries", params={"from": future}).json()["items"] == []
+    assert len(auth_client.get("/api/timeentries", params={"to": future}).json()["items"]) == 2
+
+
+def test_time_entries_invalid_cursor(auth_client):
+    """Test that a malformed cursor is rejected"""
+    response = auth_client.get("/api/timeentries", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_bulk_create_time_entries(auth_client):
+    """Test batch upload with per-item results and one invalid todo"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    batch = {"entries": [
+        {"todo_id": todo_id, "duration": 1500, "timestamp": "2025-01-02T10:00:00Z"},
+        {"todo_id": 999, "duration": 900},
+        {"todo_id": todo_id, "duration": 600, "timestamp": "2025-01-02T12:00:00+01:00"},
+    ]}
+    response = auth_client.post("/api/timeentries/bulk", json=batch)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["duplicates"], data["errors"]) == (2, 0, 1)
+    assert [r["status"] for r in data["results"]] == ["created", "error", "created"]
+    assert data["results"][1]["detail"] == "Todo not found"
+
+    items = auth_client.get("/api/timeentries").json()["items"]
+    assert [(e["duration"], e["timestamp"]) for e in items] == [
+        (600, "2025-01-02T11:00:00"),
+        (1500, "2025-01-02T10:00:00"),
+    ]
+    assert all(e["project_id"] == project_id for e in items)
+
+
+def test_bulk_create_rejects_foreign_project(auth_client):
+    """Test that bulk items cannot reference another user's project"""
+    foreign_project_id, _ = create_project_with_todo(auth_client, name="AliceSecret")
+    switch_user(auth_client, "bob")
+    project_id, todo_id = create_project_with_todo(auth_client, name="Bob")
+
+    data = auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "project_id": foreign_project_id, "duration": 60},
+        {"todo_id": todo_id, "project_id": project_id, "duration": 90},
+    ]}).json()
+    assert [r["status"] for r in data["results"]] == ["error", "created"]
+    assert data["results"][0]["detail"] == "Project not found"
+    assert [row[1:] for row in rollup_rows(user_id=2)] == [(project_id, todo_id, 90, 1)]
+
+
+def test_bulk_create_is_idempotent(auth_client):
+    """Test that retrying a batch with idempotency keys creates nothing new"""
+    _, todo_id = create_project_with_todo(auth_client)
+    batch = {"entries": [
+        {"todo_id": todo_id, "duration": 1500, "idempotency_key": "a"},
+        {"todo_id": todo_id, "duration": 900, "idempotency_key": "b"},
+        {"todo_id": todo_id, "duration": 900, "idempotency_key": "b"},
+    ]}
+    first = auth_client.post("/api/timeentries/bulk", json=batch).json()
+    assert (first["created"], first["duplicates"]) == (2, 1)
+    assert first["results"][2]["id"] == first["results"][1]["id"]
+
+    retry = auth_client.post("/api/timeentries/bulk", json=batch).json()
+    assert (retry["created"], retry["duplicates"]) == (0, 3)
+    assert [r["id"] for r in retry["results"]] == [r["id"] for r in first["results"]]
+    assert len(auth_client.get("/api/timeentries").json()["items"]) == 2
+
+
+def test_time_entry_duration_is_strict(auth_client):
+    """Test that durations must be non-negative integers, without coercion"""
+    _, todo_id = create_project_with_todo(auth_client)
+    for duration in (-1, "60", 60.5, True):
+        response = auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": duration})
+        assert response.status_code == 422
+
+
+def test_bulk_create_rejects_empty_batch(auth_client):
+    """Test batch size validation"""
+    response = auth_client.post("/api/timeentries/bulk", json={"entries": []})
+    assert response.status_code == 422
+
+
+@pytest.mark.skipif(fastjson.orjson is None, reason="orjson not installed")
+def test_fast_json_matches_default_path(auth_client, monkeypatch):
+    """Test that the FAST_JSON list path returns the same JSON and headers"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    auth_client.patch(f"/api/projects/{project_id}", json={"is_completed": True})
+    for duration in (60, 120, 180):
+        auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": duration})
+
+    for path in ("/api/projects", "/api/todos", "/api/timeentries?limit=2"):
+        monkeypatch.setattr(fastjson, "FAST_JSON", False)
+        default = auth_client.get(path)
+        monkeypatch.setattr(fastjson, "FAST_JSON", True)
+        fast = auth_client.get(path)
+        assert fast.status_code == 200
+        assert fast.json() == default.json()
+        assert fast.headers["etag"] == default.headers["etag"]
+        assert fast.headers["content-type"] == "application/json"
+    assert auth_client.get("/api/projects").json()[0]["is_completed"] is True
+
+
+def test_export_time_entries_csv(auth_client, monkeypatch):
+    """Test the CSV export across several cursor batches"""
+    monkeypatch.setattr(exports, "EXPORT_BATCH_SIZE", 2)
+    project_id, todo_id = create_project_with_todo(auth_client, name="Alpha, Inc", title="Write \"docs\"")
+    auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "duration": 60 * i, "timestamp": f"2025-01-0{i}T10:00:00"} for i in range(1, 6)
+    ]})
+
+    response = auth_client.get("/api/timeentries/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "timeentries.csv" in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["duration"]) for row in rows] == [60, 120, 180, 240, 300]
+    assert rows[0]["timestamp"] == "2025-01-01T10:00:00"
+    assert rows[0]["project_name"] == "Alpha, Inc"
+    assert rows[0]["todo_title"] == 'Write "docs"'
+    assert int(rows[0]["project_id"]) == project_id
+
+
+def test_export_time_entries_ndjson_filtered(auth_client):
+    """Test the NDJSON export with a time range"""
+    _, todo_id = create_project_with_todo(auth_client)
+    auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "duration": 60 * i, "timestamp": f"2025-01-0{i}T10:00:00"} for i in range(1, 6)
+    ]})
+
+    response = auth_client.get("/api/timeentries/export", params={
+        "format": "ndjson", "from": "2025-01-02T00:00:00", "to": "2025-01-04T00:00:00"
+    })
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["duration"] for line in lines] == [120, 180]
+    assert set(lines[0]) == set(exports.EXPORT_FIELDS)
+
+    assert auth_client.get("/api/timeentries/export", params={"format": "xml"}).status_code == 422
+
+
+def test_export_excludes_foreign_projects(auth_client):
+    """Test the export never reveals another user's project"""
+    foreign_project_id, _ = create_project_with_todo(auth_client, name="AliceSecret")
+    switch_user(auth_client, "bob")
+    _, todo_id = create_project_with_todo(auth_client, name="Bob")
+    auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 60})
+
+    db = TestingSessionLocal()
+    bob_id = db.query(models.User.id).filter(models.User.username == "bob").scalar()
+    db.add(models.TimeEntry(user_id=bob_id, todo_id=todo_id, project_id=foreign_project_id, duration=120))
+    db.commit()
+    db.close()
+
+    response = auth_client.get("/api/timeentries/export", params={"format": "csv"})
+    assert "AliceSecret" not in response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["project_name"], int(row["duration"])) for row in rows] == [("Bob", 60)]
+
+
+def test_import_time_entries_csv(auth_client, monkeypatch):
+    """Test a CSV import resolving existing and new projects and todos in batches"""
+    monkeypatch.setattr(imports, "IMPORT_BATCH_SIZE", 2)
+    project_id, todo_id = create_project_with_todo(auth_client, name="Alpha", title="Docs")
+    upload = (
+        "timestamp,duration,project_name,todo_title,project_color\n"
+        "2025-01-01T10:00:00,600,Alpha,Docs,\n"
+        "2025-01-01T11:00:00+01:00,300,Alpha,Review,\n"
+        "2025-01-02T09:00:00,900,Beta,Planning,red\n"
+        "2025-01-02T10:00:00,abc,Beta,Planning,\n"
+        "2025-01-02T11:00:00,120,,Planning,\n"
+        "2025-01-03T09:00:00,60,Beta,Planning,\n"
+    )
+    response = auth_client.post(
+        "/api/timeentries/import", params={"format": "csv"},
+        files={"file": ("other-tracker.csv", upload.encode("utf-8"), "text/csv")}
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["processed"], result["imported"], result["failed"], result["batches"]) == (6, 4, 2, 2)
+    assert (result["projects_created"], result["todos_created"]) == (1, 2)
+    assert [error["line"] for error in result["errors"]] == [5, 6]
+    # Bumped by the two batches creating projects or todos, not by the final empty flush
+    db = TestingSessionLocal()
+    assert versions.etag(db, 1, versions.PROJECTS) == '"projects-1-3"'
+    db.close()
+
+    projects = {p["name"]: p for p in auth_client.get("/api/projects").json()}
+    assert projects["Beta"]["color"] == "red"
+    todos = {t["title"]: t for t in auth_client.get("/api/todos").json()}
+    assert todos["Docs"]["id"] == todo_id and todos["Review"]["project_id"] == project_id
+
+    entries = auth_client.get("/api/timeentries").json()["items"]
+    assert sorted(e["duration"] for e in entries) == [60, 300, 600, 900]
+    assert any(e["timestamp"] == "2025-01-01T10:00:00" and e["duration"] == 300 for e in entries)
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": 1860, "session_count": 4}
+
+
+@sqlite_only
+def test_import_stores_orm_datetime_format(auth_client):
+    """Test imported timestamps are stored as text in the same format as ORM writes"""
+    upload = "timestamp,duration,project_name,todo_title\n2025-01-01T10:00:00,60,Alpha,Docs\n"
+    auth_client.post(
+        "/api/timeentries/import", params={"format": "csv"},
+        files={"file": ("import.csv", upload.encode("utf-8"), "text/csv")}
+    )
+    with engine.connect() as connection:
+        stored = connection.exec_driver_sql("SELECT timestamp FROM time_entries").scalar()
+    assert stored == "2025-01-01 10:00:00.000000"
+
+
+def test_import_accepts_ndjson_export(auth_client):
+    """Test that an NDJSON export imports unchanged into another account"""
+    _, todo_id = create_project_with_todo(auth_client, name="Alpha", title="Docs")
+    auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "duration": 60 * i, "timestamp": f"2025-01-0{i}T10:00:00"} for i in range(1, 4)
+    ]})
+    exported = auth_client.get("/api/timeentries/export", params={"format": "ndjson"}).content
+
+    switch_user(auth_client)
+
+    result = auth_client.post(
+        "/api/timeentries/import", params={"format": "ndjson"},
+        files={"file": ("export.ndjson", exported + b"\nnot json\n", "application/x-ndjson")}
+    ).json()
+    assert (result["imported"], result["failed"]) == (3, 1)
+    assert result["errors"] == [{"line": 5, "detail": "Invalid JSON object"}]
+    assert [p["name"] for p in auth_client.get("/api/projects").json()] == ["Alpha"]
+    assert len(auth_client.get("/api/timeentries").json()["items"]) == 3
+
+
+# ===== Timer Session Tests =====
+
+def backdate_session(user_id=1, seconds=0):
+    """Move the running stretch of a user's session into the past"""
+    db = TestingSessionLocal()
+    session = db.get(models.ActiveSession, user_id)
+    session.resumed_at -= timedelta(seconds=seconds)
+    db.commit()
+    db.close()
+
+
+def test_timer_session_workflow(auth_client):
+    """Test start, pause, resume and stop of a server-side timer session"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    assert auth_client.get("/api/sessions/current").json() is None
+
+    response = auth_client.post("/api/sessions/start", json={"todo_id": todo_id})
+    assert response.status_code == 201
+    session = response.json()
+    assert session["project_id"] == project_id
+    assert session["running"] is True
+    assert session["duration"] == 0
+    assert auth_client.post("/api/sessions/start", json={"todo_id": todo_id}).status_code == 409
+
+    backdate_session(seconds=100)
+    paused = auth_client.post("/api/sessions/pause").json()
+    assert paused["running"] is False
+    assert paused["resumed_at"] is None
+    assert 100 <= paused["duration"] <= 101
+    assert auth_client.post("/api/sessions/pause").status_code == 409
+    # Paused time does not count
+    assert auth_client.get("/api/sessions/current").json()["duration"] == paused["duration"]
+
+    assert auth_client.post("/api/sessions/resume").json()["running"] is True
+    assert auth_client.post("/api/sessions/resume").status_code == 409
+    backdate_session(seconds=50)
+
+    response = auth_client.post("/api/sessions/stop")
+    assert response.status_code == 201
+    entry = response.json()
+    assert entry["todo_id"] == todo_id
+    assert 150 <= entry["duration"] <= 152
+    assert auth_client.get("/api/timeentries").json()["items"] == [entry]
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": entry["duration"], "session_count": 1}
+
+    assert auth_client.get("/api/sessions/current").json() is None
+    for action in ("stop", "pause", "resume"):
+        assert auth_client.post(f"/api/sessions/{action}").status_code == 404
+
+
+def test_timer_session_requires_own_todo(auth_client):
+    """Test sessions only start on the user's todos and go away with them"""
+    _, todo_id = create_project_with_todo(auth_client)
+    assert auth_client.post("/api/sessions/start", json={"todo_id": 999}).status_code == 404
+
+    auth_client.post("/api/sessions/start", json={"todo_id": todo_id})
+    auth_client.delete(f"/api/todos/{todo_id}")
+    assert auth_client.get("/api/sessions/current").json() is None
+
+
+def test_timer_session_rejects_foreign_project(auth_client):
+    """Test a session cannot be booked onto another user's project"""
+    foreign_project_id, _ = create_project_with_todo(auth_client, name="AliceSecret")
+    switch_user(auth_client, "bob")
+    project_id, todo_id = create_project_with_todo(auth_client, name="Bob")
+
+    response = auth_client.post("/api/sessions/start", json={"todo_id": todo_id, "project_id": foreign_project_id})
+    assert response.status_code == 404
+    assert auth_client.get("/api/sessions/current").json() is None
+
+    response = auth_client.post("/api/sessions/start", json={"todo_id": todo_id, "project_id": project_id})
+    assert response.status_code == 201
+
+
+# ===== Sync Tests =====
+
+def test_sync_full_snapshot(auth_client):
+    """Test that a sync without watermark returns all data"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 60})
+
+    data = auth_client.get("/api/sync").json()
+    assert data["full"] is True
+    assert [p["id"] for p in data["projects"]] == [project_id]
+    assert [t["id"] for t in data["todos"]] == [todo_id]
+    assert len(data["time_entries"]) == 1
+    assert data["deleted"] == []
+    assert data["watermark"]
+
+
+def test_sync_delta_since_watermark(auth_client, monkeypatch):
+    """Test that a sync with watermark returns only changes and deletions after it"""
+    monkeypatch.setattr(sync, "SYNC_OVERLAP_SECONDS", 0)
+    project_id, todo1_id = create_project_with_todo(auth_client)
+    todo2_id = auth_client.post("/api/todos", json={"project_id": project_id, "title": "2"}).json()["id"]
+    other_project_id, _ = create_project_with_todo(auth_client, name="Other")
+    watermark = auth_client.get("/api/sync").json()["watermark"]
+
+    assert auth_client.get("/api/sync", params={"since": watermark}).json()["projects"] == []
+
+    auth_client.patch(f"/api/todos/{todo1_id}", json={"status": "done"})
+    auth_client.delete(f"/api/todos/{todo2_id}")
+    auth_client.delete(f"/api/projects/{other_project_id}")
+    entry_id = auth_client.post("/api/timeentries", json={"todo_id": todo1_id, "duration": 60}).json()["id"]
+
+    data = auth_client.get("/api/sync", params={"since": watermark}).json()
+    assert data["full"] is False
+    assert data["projects"] == []
+    assert [(t["id"], t["status"]) for t in data["todos"]] == [(todo1_id, "done")]
+    assert [e["id"] for e in data["time_entries"]] == [entry_id]
+    assert data["deleted"] == [
+        {"entity": "todo", "id": todo2_id},
+        {"entity": "project", "id": other_project_id},
+    ]
+
+
+def test_sync_expired_or_invalid_watermark(auth_client):
+    """Test that an expired watermark falls back to a full snapshot"""
+    create_project_with_todo(auth_client)
+    expired = sync.encode_watermark(
+        datetime.utcnow() - timedelta(days=sync.SYNC_TOMBSTONE_RETENTION_DAYS + 1)
+    )
+    data = auth_client.get("/api/sync", params={"since": expired}).json()
+    assert data["full"] is True
+    assert len(data["projects"]) == 1
+
+    assert auth_client.get("/api/sync", params={"since": "garbage"}).status_code == 400
 
 
 # ===== Settings Tests =====
@@ -383,6 +1120,548 @@ def test_settings_are_singleton(client):
     assert data["focus_duration"] == 30  # Last update
 
 
+def test_settings_roundtrip(auth_client):
+    """Test default creation, partial update and empty update of the settings"""
+    created = auth_client.get("/api/settings").json()
+    assert (created["focus_duration"], created["break_duration"]) == (25, 5)
+
+    updated = auth_client.put("/api/settings", json={"break_duration": 10}).json()
+    assert updated == {"id": created["id"], "focus_duration": 25, "break_duration": 10}
+    assert auth_client.put("/api/settings", json={}).json() == updated
+
+
+# ===== Write Round-Trip Tests =====
+
+@pytest.mark.parametrize("method,path,body", [
+    ("post", "/api/projects", {"name": "New", "color": "red"}),
+    ("patch", "/api/projects/{project_id}", {"is_completed": True}),
+    ("post", "/api/todos", {"project_id": "{project_id}", "title": "New"}),
+    ("patch", "/api/todos/{todo_id}", {"status": "done"}),
+    ("post", "/api/timeentries", {"todo_id": "{todo_id}", "duration": 60}),
+    ("put", "/api/settings", {"focus_duration": 50}),
+])
+def test_writes_return_rows_without_reload(auth_client, method, path, body):
+    """Test that writes build their response from RETURNING, without a SELECT of the written table"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    ids = {"project_id": project_id, "todo_id": todo_id}
+    body = {key: int(value.format(**ids)) if isinstance(value, str) and "{" in value else value
+            for key, value in body.items()}
+
+    with recorded_statements() as statements:
+        response = getattr(auth_client, method)(path.format(**ids), json=body)
+    assert response.status_code in (200, 201)
+
+    table = {"projects": "projects", "todos": "todos", "timeentries": "time_entries",
+             "settings": "pomodoro_settings"}[path.split("/")[2]]
+    writes = [s for s in statements if s.lstrip().startswith(("INSERT", "UPDATE")) and f" {table} " in s]
+    assert len(writes) == 1 and "RETURNING" in writes[0]
+    assert not any(s.lstrip().startswith("SELECT") and f"FROM {table} " in s for s in statements)
+
+
+# ===== Conditional GET Tests =====
+
+@pytest.mark.parametrize("path", ["/api/projects", "/api/todos", "/api/timeentries"])
+def test_list_endpoints_answer_304_when_unchanged(auth_client, path):
+    """Test ETag revalidation of unchanged collections"""
+    create_project_with_todo(auth_client)
+    response = auth_client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = auth_client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+def test_etag_changes_on_write(auth_client):
+    """Test that writes invalidate exactly the affected collections"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    etags = {path: auth_client.get(path).headers["ETag"]
+             for path in ["/api/projects", "/api/todos", "/api/timeentries"]}
+
+    def changed():
+        return {path for path, etag in etags.items()
+                if auth_client.get(path, headers={"If-None-Match": etag}).status_code == 200}
+
+    auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 60})
+    assert changed() == {"/api/timeentries"}
+
+    etags = {path: auth_client.get(path).headers["ETag"] for path in etags}
+    auth_client.patch(f"/api/todos/{todo_id}", json={"status": "done"})
+    assert changed() == {"/api/todos"}
+
+    etags = {path: auth_client.get(path).headers["ETag"] for path in etags}
+    auth_client.delete(f"/api/projects/{project_id}")
+    assert changed() == {"/api/projects", "/api/todos", "/api/timeentries"}
+
+
+def test_etag_depends_on_query(auth_client):
+    """Test that different pages or filters never share an ETag"""
+    create_project_with_todo(auth_client)
+    first = auth_client.get("/api/timeentries", params={"limit": 1}).headers["ETag"]
+    second = auth_client.get("/api/timeentries", params={"limit": 2}).headers["ETag"]
+    assert first != second
+
+
+# ===== Stats Tests =====
+
+def test_stats_requires_auth(client):
+    """Test that stats endpoints are protected"""
+    response = client.get("/api/stats/today")
+    assert response.status_code == 403
+
+
+def test_stats_empty(auth_client):
+    """Test stats for a user without time entries"""
+    assert auth_client.get("/api/stats/today").json() == {"total_duration": 0, "session_count": 0}
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": 0, "session_count": 0}
+    assert auth_client.get("/api/stats/projects").json() == []
+    assert auth_client.get("/api/stats/daily").json() == []
+    assert auth_client.get("/api/stats/top-todos").json() == []
+
+
+def test_stats_aggregation(auth_client):
+    """Test today, per-project, daily and top-todo aggregations"""
+    project1_id, todo1_id = create_project_with_todo(auth_client, name="Alpha", color="red", title="A")
+    project2_id, todo2_id = create_project_with_todo(auth_client, name="Beta", color="green", title="B")
+    auth_client.post("/api/timeentries", json={"todo_id": todo1_id, "duration": 1500})
+    auth_client.post("/api/timeentries", json={"todo_id": todo1_id, "duration": 900})
+    auth_client.post("/api/timeentries", json={"todo_id": todo2_id, "duration": 600})
+
+    # Backdate one entry so it falls outside of today
+    db = TestingSessionLocal()
+    entry = db.query(models.TimeEntry).filter(models.TimeEntry.duration == 600).one()
+    entry.timestamp = entry.timestamp - timedelta(days=3)
+    db.flush()
+    rollups.rebuild(db)
+    db.commit()
+    db.close()
+
+    assert auth_client.get("/api/stats/today").json() == {"total_duration": 2400, "session_count": 2}
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": 3000, "session_count": 3}
+
+    projects = auth_client.get("/api/stats/projects").json()
+    assert [p["project_id"] for p in projects] == [project1_id, project2_id]
+    assert projects[0] == {
+        "project_id": project1_id, "name": "Alpha", "color": "red",
+        "total_duration": 2400, "session_count": 2,
+    }
+
+    daily = auth_client.get("/api/stats/daily").json()
+    assert [d["total_duration"] for d in daily] == [600, 2400]
+    assert daily[1]["date"] == datetime.utcnow().date().isoformat()
+
+    top = auth_client.get("/api/stats/top-todos", params={"limit": 1}).json()
+    assert len(top) == 1
+    assert top[0]["todo_id"] == todo1_id
+    assert top[0]["project_name"] == "Alpha"
+    assert top[0]["total_duration"] == 2400
+
+
+def test_stats_daily_local_days(auth_client):
+    """Test that daily stats bucket by the client's local day on every backend"""
+    _, todo_id = create_project_with_todo(auth_client)
+    entry_id = auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 600}).json()["id"]
+
+    # Aware datetimes are stored as UTC and read back naive
+    db = TestingSessionLocal()
+    entry = db.get(models.TimeEntry, entry_id)
+    entry.timestamp = datetime(2025, 3, 11, 0, 30, tzinfo=timezone(timedelta(hours=1)))
+    db.flush()
+    rollups.rebuild(db)
+    db.commit()
+    db.expire_all()
+    assert db.get(models.TimeEntry, entry_id).timestamp == datetime(2025, 3, 10, 23, 30)
+    db.close()
+
+    params = {"start": "2025-03-10", "end": "2025-03-11"}
+    utc = auth_client.get("/api/stats/daily", params=params).json()
+    assert [d["date"] for d in utc] == ["2025-03-10"]
+    with recorded_statements() as statements:
+        local = auth_client.get("/api/stats/daily", params={**params, "tz_offset": -60}).json()
+        today = auth_client.get("/api/stats/today", params={"tz_offset": -60}).json()
+    assert local == [{"date": "2025-03-11", "total_duration": 600, "session_count": 1}]
+    assert today == {"total_duration": 0, "session_count": 0}
+    # Whole-hour offsets are served from the rollup
+    assert not any("time_entries" in statement for statement in statements)
+    # UTC+05:30 days do not start on rollup hours and are grouped from time_entries
+    local = auth_client.get("/api/stats/daily", params={**params, "tz_offset": -330}).json()
+    assert local == [{"date": "2025-03-11", "total_duration": 600, "session_count": 1}]
+    local = auth_client.get("/api/stats/daily", params={**params, "tz_offset": 600}).json()
+    assert local == [{"date": "2025-03-10", "total_duration": 600, "session_count": 1}]
+
+
+def test_stats_only_own_entries(auth_client):
+    """Test that stats never include other users' entries"""
+    _, todo_id = create_project_with_todo(auth_client)
+    auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 1500})
+
+    switch_user(auth_client)
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": 0, "session_count": 0}
+    assert auth_client.get("/api/stats/projects").json() == []
+
+
+def test_foreign_project_id_is_rejected(auth_client):
+    """Test entries cannot reference another user's project, nor do stats reveal one"""
+    foreign_project_id, _ = create_project_with_todo(auth_client, name="AliceSecret", color="#f00")
+    switch_user(auth_client, "bob")
+    _, todo_id = create_project_with_todo(auth_client, name="Bob")
+
+    response = auth_client.post("/api/timeentries", json={
+        "todo_id": todo_id, "project_id": foreign_project_id, "duration": 60
+    })
+    assert response.status_code == 404
+
+    # A row written before the check existed is not joined to the foreign project
+    db = TestingSessionLocal()
+    bob_id = db.query(models.User.id).filter(models.User.username == "bob").scalar()
+    db.add(models.TimeEntry(user_id=bob_id, todo_id=todo_id, project_id=foreign_project_id, duration=60))
+    db.flush()
+    rollups.rebuild(db)
+    db.commit()
+    db.close()
+    assert auth_client.get("/api/stats/projects").json() == []
+
+
+def test_stats_daily_invalid_range(auth_client):
+    """Test that inverted or oversized daily ranges are rejected"""
+    response = auth_client.get("/api/stats/daily", params={"start": "2025-02-01", "end": "2025-01-01"})
+    assert response.status_code == 400
+    response = auth_client.get("/api/stats/daily", params={"start": "2020-01-01", "end": "2025-01-01"})
+    assert response.status_code == 400
+
+
+# ===== Async CRUD Tests =====
+
+@pytest.fixture
+def async_client(auth_client):
+    """Authenticated client for an app serving the async CRUD endpoints"""
+    async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+    configure_engine(async_engine.sync_engine)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+
+    async_app = FastAPI()
+    async_app.include_router(async_api.router)
+    async_app.dependency_overrides[get_db] = override_get_db
+    async_app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(async_app, headers=auth_client.headers) as client:
+        yield client
+
+
+def test_to_async_url():
+    """Test translation of sync database URLs to async drivers"""
+    assert to_async_url("sqlite:///./timetracking.db") == "sqlite+aiosqlite:///./timetracking.db"
+    assert to_async_url("postgresql://u:p@db/tt") == "postgresql+asyncpg://u:p@db/tt"
+
+
+def test_async_crud_workflow(async_client):
+    """Test projects, todos, time entries and settings through the async endpoints"""
+    project = async_client.post("/api/projects", json={"name": "Async", "color": "blue"})
+    assert project.status_code == 201
+    project_id = project.json()["id"]
+
+    todo = async_client.post("/api/todos", json={"project_id": project_id, "title": "Task"})
+    assert todo.status_code == 201
+    todo_id = todo.json()["id"]
+
+    response = async_client.patch(f"/api/todos/{todo_id}", json={"status": "done"})
+    assert response.json()["status"] == "done"
+    response = async_client.patch(f"/api/todos/{todo_id}", json={"status": "invalid"})
+    assert response.status_code == 422
+
+    entry = async_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 1500})
+    assert entry.status_code == 201
+    assert entry.json()["project_id"] == project_id
+
+    page = async_client.get("/api/timeentries").json()
+    assert [e["duration"] for e in page["items"]] == [1500]
+    assert page["next_cursor"] is None
+
+    assert async_client.post("/api/sessions/start", json={"todo_id": todo_id}).status_code == 201
+    assert async_client.get("/api/sessions/current").json()["todo_id"] == todo_id
+    assert async_client.post("/api/sessions/pause").json()["running"] is False
+    assert async_client.post("/api/sessions/resume").json()["running"] is True
+    assert async_client.post("/api/sessions/stop").status_code == 201
+    assert len(async_client.get("/api/timeentries").json()["items"]) == 2
+
+    assert async_client.get("/api/settings").json()["focus_duration"] == 25
+    assert async_client.put("/api/settings", json={"focus_duration": 50}).json()["focus_duration"] == 50
+
+    assert async_client.delete(f"/api/projects/{project_id}").status_code == 200
+    assert async_client.get("/api/projects").json() == []
+    assert async_client.delete(f"/api/projects/{project_id}").status_code == 404
+
+
+# ===== Database Settings Tests =====
+
+def test_sqlite_production_pragmas(tmp_path):
+    """Test that new connections get the production pragma profile"""
+    tuned_engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    settings = log_database_settings(tuned_engine)
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == 1  # NORMAL
+    assert settings["busy_timeout"] == 5000
+    assert settings["temp_store"] == 2  # MEMORY
+    assert tuned_engine.pool.size() == database.DB_POOL_SIZE
+    tuned_engine.dispose()
+
+
+def test_sqlite_pragma_env_override(tmp_path, monkeypatch):
+    """Test that single pragmas can be overridden from the environment"""
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT", "1234")
+    tuned_engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    with tuned_engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == 1234
+    tuned_engine.dispose()
+
+
+def test_postgresql_engine_options(monkeypatch):
+    """Test pool health checks and session settings for PostgreSQL URLs"""
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    options = database.engine_options("postgresql://u:p@db/tt")
+    assert options["pool_pre_ping"] is True
+    assert options["pool_recycle"] == database.DB_POOL_RECYCLE
+    assert options["poolclass"] is metrics.TimedQueuePool
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000 -c timezone=UTC"}
+
+    async_options = database.engine_options(to_async_url("postgresql://u:p@db/tt"))
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000", "timezone": "UTC"}}
+    assert async_options["poolclass"] is metrics.TimedAsyncQueuePool
+    assert "connect_args" not in database.engine_options("sqlite+aiosqlite:///./timetracking.db")
+
+
+# ===== Rollup Tests =====
+
+def rollup_rows(user_id=1):
+    """Current rollup rows of a user as comparable tuples"""
+    db = TestingSessionLocal()
+    rows = sorted(
+        (r.hour, r.project_id, r.todo_id, r.total_seconds, r.session_count)
+        for r in db.query(models.TimeEntryRollup).filter(models.TimeEntryRollup.user_id == user_id)
+    )
+    db.close()
+    return rows
+
+
+def test_rollup_maintained_on_write(auth_client):
+    """Test that single and bulk inserts update the rollup like a full rebuild would"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    created = auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 1500}).json()
+    auth_client.post("/api/timeentries/bulk", json={"entries": [
+        {"todo_id": todo_id, "duration": 600, "timestamp": "2025-01-02T10:59:59.5"},
+        {"todo_id": todo_id, "duration": 300, "timestamp": "2025-01-02T10:00:00"},
+        {"todo_id": todo_id, "duration": 60, "timestamp": "2025-01-02T11:00:00"},
+    ]})
+
+    incremental = rollup_rows()
+    hour = datetime.fromisoformat(created["timestamp"]).replace(minute=0, second=0, microsecond=0)
+    assert incremental == [
+        (datetime(2025, 1, 2, 10), project_id, todo_id, 900, 2),
+        (datetime(2025, 1, 2, 11), project_id, todo_id, 60, 1),
+        (hour, project_id, todo_id, 1500, 1),
+    ]
+
+    db = TestingSessionLocal()
+    rollups.rebuild(db)
+    db.commit()
+    db.close()
+    assert rollup_rows() == incremental
+
+
+def test_rollup_reconciled_on_delete(auth_client):
+    """Test that deleting todos and projects removes their rollup rows"""
+    project_id, todo1_id = create_project_with_todo(auth_client)
+    todo2_id = auth_client.post("/api/todos", json={"project_id": project_id, "title": "2"}).json()["id"]
+    auth_client.post("/api/timeentries", json={"todo_id": todo1_id, "duration": 100})
+    auth_client.post("/api/timeentries", json={"todo_id": todo2_id, "duration": 200})
+
+    auth_client.delete(f"/api/todos/{todo1_id}")
+    assert [row[2] for row in rollup_rows()] == [todo2_id]
+    assert auth_client.get("/api/stats/totals").json() == {"total_duration": 200, "session_count": 1}
+
+    auth_client.delete(f"/api/projects/{project_id}")
+    assert rollup_rows() == []
+    assert auth_client.get("/api/stats/top-todos").json() == []
+
+
+# ===== Migration Tests =====
+
+def test_init_schema_runs_once_across_workers(tmp_path):
+    """Test concurrent startups create the schema exactly once under the lock"""
+    worker_engine = create_db_engine(f"sqlite:///{tmp_path / 'workers.db'}")
+    results, errors = [], []
+
+    def start_worker():
+        try:
+            results.append(init_schema(worker_engine))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=start_worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(results, key=len) == [[], [], [], [version for version, _, _ in MIGRATIONS]]
+    assert get_schema_version(worker_engine) == MIGRATIONS[-1][0]
+    worker_engine.dispose()
+
+
+def test_migrate_legacy_database(tmp_path):
+    """Test that migrations add the indexes to a database created before they existed"""
+    legacy_engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE projects (id INTEGER PRIMARY KEY, user_id INTEGER, created_at DATETIME)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE todos (id INTEGER PRIMARY KEY, project_id INTEGER, created_at DATETIME)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE time_entries (id INTEGER PRIMARY KEY, user_id INTEGER, todo_id INTEGER, "
+            "project_id INTEGER, duration INTEGER, timestamp DATETIME)"
+        )
+
+    assert get_schema_version(legacy_engine) == 0
+    assert migrate(legacy_engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(legacy_engine) == []
+    assert get_schema_version(legacy_engine) == MIGRATIONS[-1][0]
+
+    indexes = {index["name"] for index in inspect(legacy_engine).get_indexes("time_entries")}
+    assert "ix_time_entries_user_timestamp" in indexes
+    legacy_engine.dispose()
+
+
+def test_migration_column_types_per_dialect():
+    """Test added timestamp columns use each dialect's type name, as in create_all"""
+    assert add_column_ddl(postgresql.dialect(), "projects", "updated_at", UTCDateTime()) == (
+        "ALTER TABLE projects ADD COLUMN updated_at TIMESTAMP WITH TIME ZONE"
+    )
+    assert add_column_ddl(sqlite.dialect(), "projects", "updated_at", UTCDateTime()) == (
+        "ALTER TABLE projects ADD COLUMN updated_at DATETIME"
+    )
+    assert add_column_ddl(postgresql.dialect(), "time_entries", "idempotency_key", "VARCHAR") == (
+        "ALTER TABLE time_entries ADD COLUMN idempotency_key VARCHAR"
+    )
+
+
+@sqlite_only
+def test_hot_queries_use_indexes(test_db):
+    """Test with EXPLAIN QUERY PLAN that list and stats queries are index-backed"""
+    migrate(engine)
+    db = TestingSessionLocal()
+    for name, builder, index_name in HOT_QUERIES:
+        plan = explain(db, builder(db, 1))
+        assert_uses_index(plan, index_name)
+        if name == "list_time_entries":
+            # Keyset ordering must come straight from the index
+            assert "TEMP B-TREE" not in plan
+    db.close()
+
+
+def test_benchmark_dataset(test_db, monkeypatch):
+    """Test the load test dataset is consistent and its users can log in"""
+    monkeypatch.setattr(dataset, "BATCH_SIZE", 7)
+    db = TestingSessionLocal()
+    dataset.generate(db, users=3, entries=50, projects_per_user=2, todos_per_project=2)
+    assert db.query(models.TimeEntry).count() == 50
+    mismatched = db.query(models.TimeEntry).join(
+        models.Project, models.Project.id == models.TimeEntry.project_id
+    ).join(models.Todo, models.Todo.id == models.TimeEntry.todo_id).filter(
+        (models.Project.user_id != models.TimeEntry.user_id) | (models.Todo.project_id != models.Project.id)
+    ).count()
+    assert mismatched == 0
+    rollup_total = db.query(func.sum(models.TimeEntryRollup.total_seconds)).scalar()
+    assert rollup_total == db.query(func.sum(models.TimeEntry.duration)).scalar()
+    db.close()
+
+    client = TestClient(app)
+    response = client.post("/api/auth/login", json={"username": "bench2", "password": dataset.BENCH_PASSWORD})
+    assert response.status_code == 200
+
+
+def test_load_compare_flags_regressions():
+    """Test run comparison flags slower percentiles, lower throughput and new errors"""
+    result = {"scenario": "projects_list", "concurrency": 8, "requests": 100, "errors": 0,
+              "throughput_rps": 200.0, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0}
+    baseline = {"results": [result]}
+    assert load.compare(baseline, {"results": [{**result, "p95_ms": 21.0, "throughput_rps": 190.0}]}) == []
+    regressions = load.compare(baseline, {"results": [{**result, "p95_ms": 40.0, "throughput_rps": 100.0, "errors": 3}]})
+    assert regressions == [
+        "projects_list c=8: p95_ms 20.00 -> 40.00",
+        "projects_list c=8: throughput 200.0 -> 100.0 req/s",
+        "projects_list c=8: errors 0 -> 3",
+    ]
+    assert load.percentiles([0.010] * 99 + [1.0]) == {"p50_ms": 10.0, "p95_ms": 10.0, "p99_ms": 19.9}
+
+
+# ===== Query Budget Tests =====
+
+# Statements per request with a warm auth cache; raise a budget only together
+# with the change that needs the extra statement
+QUERY_BUDGETS = [
+    ("GET", "/api/projects", None, 2),
+    ("GET", "/api/todos", None, 2),
+    ("GET", "/api/timeentries", None, 2),
+    ("POST", "/api/projects", {"name": "Budget", "color": "red"}, 2),
+    ("PATCH", "/api/projects/{project_id}", {"is_completed": True}, 2),
+    ("POST", "/api/todos", {"project_id": "{project_id}", "title": "Budget"}, 2),
+    ("PATCH", "/api/todos/{todo_id}", {"status": "done"}, 2),
+    ("POST", "/api/timeentries", {"todo_id": "{todo_id}", "duration": 60}, 3),
+    ("GET", "/api/stats/totals", None, 1),
+    ("GET", "/api/stats/projects", None, 1),
+    ("GET", "/api/stats/daily", None, 1),
+    ("GET", "/api/stats/top-todos", None, 1),
+    ("PUT", "/api/settings", {"focus_duration": 30}, 1),
+    ("GET", "/api/sync", None, 3),
+    ("GET", "/api/sessions/current", None, 1),
+    ("POST", "/api/sessions/start", {"todo_id": "{todo_id}"}, 1),
+    ("GET", "/api/auth/me", None, 0),
+    ("DELETE", "/api/todos/{todo_id}", None, 5),
+    ("DELETE", "/api/projects/{project_id}", None, 6),
+]
+
+
+@pytest.mark.parametrize("method,path,body,budget", QUERY_BUDGETS, ids=[f"{m} {p}" for m, p, _, _ in QUERY_BUDGETS])
+def test_query_budget(auth_client, query_budget, method, path, body, budget):
+    """Test each endpoint stays within its statement budget"""
+    project_id, todo_id = create_project_with_todo(auth_client)
+    for _ in range(3):
+        auth_client.post("/api/timeentries", json={"todo_id": todo_id, "duration": 60})
+    ids = {"project_id": project_id, "todo_id": todo_id}
+    if body is not None:
+        body = {key: int(value.format(**ids)) if value in ("{project_id}", "{todo_id}") else value
+                for key, value in body.items()}
+
+    with query_budget(budget):
+        response = auth_client.request(method, path.format(**ids), json=body)
+    assert response.status_code < 300
+
+
+def test_query_budget_reports_overruns(auth_client, query_budget):
+    """Test an exceeded budget fails with the statements and sets Server-Timing"""
+    with pytest.raises(AssertionError, match="exceeds the budget of 0"):
+        with query_budget(0):
+            response = auth_client.get("/api/projects")
+    assert re.match(r'db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$', response.headers["Server-Timing"])
+
+
+def test_profile_flags_repeated_statements():
+    """Test N+1 detection groups statements by their SQL shape"""
+    profile = profiling.RequestProfile("GET", "/api/projects")
+    profile.statements = [("SELECT * FROM todos WHERE project_id = ?", 0.001)] * 5
+    profile.statements.append(("SELECT * FROM projects", 0.001))
+    assert profile.repeated(5) == [("SELECT * FROM todos WHERE project_id = ?", 5)]
+    assert profile.repeated(6) == []
+
+
 # ===== Integration Tests =====
 
 def test_full_workflow(client):
@@ -418,7 +1697,7 @@ def test_full_workflow(client):
     # 5. Verify data
     projects = client.get("/api/projects").json()
     todos = client.get("/api/todos").json()
-    entries = client.get("/api/timeentries").json()
+    entries = client.get("/api/timeentries").json()["items"]
     
     assert len(projects) == 1
     assert len(todos) == 2
@@ -0,0 +1,66 @@
+"""
+Per-user collection versions for conditional GET (ETag / If-None-Match)
+
+Every write bumps the version of the collections it changes, in the same
+transaction. List endpoints derive a strong ETag from that single row, so
+an unchanged collection is answered with 304 before the list query runs
+or anything is serialized.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy.orm import Session
+
+import models
+from database import dialect_insert
+
+PROJECTS = "projects"
+TODOS = "todos"
+TIMEENTRIES = "timeentries"
+
+Version = models.CollectionVersion
+
+
+def bump(db: Session, user_id: int, *collections: str) -> None:
+    """Increment the version of one or more collections (does not commit)"""
+    insert = dialect_insert(db)
+    for collection in collections:
+        stmt = insert(Version).values(user_id=user_id, collection=collection, version=1)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "collection"],
+            set_={"version": Version.version + 1}
+        ))
+
+
+def etag(db: Session, user_id: int, collection: str, variant: str = "") -> str:
+    """
+    Strong ETag of a user's collection
+
+    Args:
+        variant: Distinguishes representations of the same collection,
+            e.g. the query string of a filtered or paginated listing
+    """
+    version = db.query(Version.version).filter(
+        Version.user_id == user_id,
+        Version.collection == collection
+    ).scalar() or 0
+    tag = f"{collection}-{user_id}-{version}"
+    if variant:
+        tag += "-" + hashlib.sha1(variant.encode("utf-8")).hexdigest()[:12]
+    return f'"{tag}"'
+
+
+def not_modified(request: Request, response: Response, current_etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client already has current_etag,
+    otherwise set the validator headers on the regular response
+    """
+    headers = {"ETag": current_etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if current_etag in candidates or "*" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -2,6 +2,7 @@ import { useState, useEffect } from 'react';
 import { Play, Pause, Square } from 'lucide-react';
 import { motion } from 'framer-motion';
 import Button from './ui/Button';
+import type { ActiveSession } from '@/types';
 import styles from './Timer.module.css';
 
 type TimerMode = 'focus' | 'break';
@@ -9,15 +10,23 @@ type TimerMode = 'focus' | 'break';
 interface TimerProps {
   focusDuration: number; // in Minuten
   breakDuration: number; // in Minuten
+  session?: ActiveSession | null; // Laufende Session vom Server (z.B. nach Reload)
+  onStart: () => Promise<boolean>; // false = nicht gestartet
+  onPause: () => void;
+  onResume: () => void;
   onComplete: (elapsedSeconds: number) => void;
 }
 
-export default function Timer({ focusDuration, breakDuration, onComplete }: TimerProps) {
+export default function Timer({
+  focusDuration, breakDuration, session, onStart, onPause, onResume, onComplete,
+}: TimerProps) {
   const [mode, setMode] = useState<TimerMode>('focus');
   const [secondsLeft, setSecondsLeft] = useState(focusDuration * 60);
   const [isRunning, setIsRunning] = useState(false);
   const [totalSeconds, setTotalSeconds] = useState(focusDuration * 60);
   const [elapsedSeconds, setElapsedSeconds] = useState(0);
+  // Focus-Session auf dem Server gestartet (laufend oder pausiert)
+  const [sessionActive, setSessionActive] = useState(false);
 
   const progress = ((totalSeconds - secondsLeft) / totalSeconds) * 100;
 
@@ -33,6 +42,7 @@ export default function Timer({ focusDuration, breakDuration, onComplete }: Time
           if (mode === 'focus') {
             onComplete(elapsedSeconds + 1);
             setElapsedSeconds(0);
+            setSessionActive(false);
           }
           return 0;
         }
@@ -53,13 +63,38 @@ export default function Timer({ focusDuration, breakDuration, onComplete }: Time
     setIsRunning(false);
   }, [mode, focusDuration, breakDuration]);
 
-  const handleStart = () => setIsRunning(true);
-  const handlePause = () => setIsRunning(false);
+  // Session vom Server wiederherstellen (geschlossener Tab, anderes Gerät)
+  useEffect(() => {
+    if (!session) return;
+    setMode('focus');
+    setSecondsLeft(Math.max(focusDuration * 60 - session.duration, 0));
+    setElapsedSeconds(session.duration);
+    setIsRunning(session.running);
+    setSessionActive(true);
+  }, [session, focusDuration]);
+
+  const handleStart = async () => {
+    if (mode === 'focus') {
+      if (sessionActive) {
+        onResume();
+      } else {
+        if (!(await onStart())) return;
+        setSessionActive(true);
+      }
+    }
+    setIsRunning(true);
+  };
+
+  const handlePause = () => {
+    if (mode === 'focus') onPause();
+    setIsRunning(false);
+  };
   
   const handleStop = () => {
-    if (mode === 'focus' && elapsedSeconds > 0) {
+    if (mode === 'focus' && sessionActive) {
       onComplete(elapsedSeconds);
     }
+    setSessionActive(false);
     setIsRunning(false);
     setSecondsLeft(totalSeconds);
     setElapsedSeconds(0);
@@ -81,14 +116,14 @@ export default function Timer({ focusDuration, breakDuration, onComplete }: Time
         <button
           className={`${styles.modeBtn} ${mode === 'focus' ? styles.active : ''}`}
           onClick={() => setMode('focus')}
-          disabled={isRunning}
+          disabled={isRunning || sessionActive}
         >
           Focus ({focusDuration} min)
         </button>
         <button
           className={`${styles.modeBtn} ${mode === 'break' ? styles.active : ''}`}
           onClick={() => setMode('break')}
-          disabled={isRunning}
+          disabled={isRunning || sessionActive}
         >
           Break ({breakDuration} min)
         </button>
@@ -14,6 +14,8 @@ interface StoreContextType {
   refreshPomodoroSettings: () => Promise<void>;
 }
 
+const RECENT_TIME_ENTRIES = 200;
+
 const StoreContext = createContext<StoreContextType | undefined>(undefined);
 
 export function StoreProvider({ children }: { children: ReactNode }) {
@@ -45,8 +47,9 @@ export function StoreProvider({ children }: { children: ReactNode }) {
 
   const refreshTimeEntries = async () => {
     try {
-      const data = await api.timeEntries.getAll();
-      setTimeEntries(data);
+      // Nur die neuesten Einträge; Statistiken kommen aggregiert vom Server
+      const page = await api.timeEntries.getPage(null, RECENT_TIME_ENTRIES);
+      setTimeEntries(page.items);
     } catch (error) {
       console.error('Failed to fetch time entries:', error);
     }
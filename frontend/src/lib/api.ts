@@ -1,4 +1,7 @@
-import type { Project, Todo, TimeEntry, PomodoroSettings } from '@/types';
+import type {
+  Project, Todo, TimeEntry, TimeEntryPage, ActiveSession, PomodoroSettings,
+  StatsTotals, ProjectStats, DailyStats, TodoStats,
+} from '@/types';
 
 const BASE_URL = import.meta.env.VITE_API_URL || '/api';
 
@@ -55,13 +58,36 @@ export const api = {
       fetchApi<void>(`/todos/${id}`, { method: 'DELETE' }),
   },
   timeEntries: {
-    getAll: () => fetchApi<TimeEntry[]>('/timeentries'),
+    getPage: (cursor?: string | null, limit = 1000) =>
+      fetchApi<TimeEntryPage>(
+        `/timeentries?limit=${limit}${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`
+      ),
     create: (data: { todo_id: number; duration: number }) =>
       fetchApi<TimeEntry>('/timeentries', { 
         method: 'POST', 
         body: JSON.stringify(data) 
       }),
   },
+  // Auf dem Server aggregiert; tzOffset wie Date.getTimezoneOffset()
+  stats: {
+    today: (tzOffset: number) => fetchApi<StatsTotals>(`/stats/today?tz_offset=${tzOffset}`),
+    totals: () => fetchApi<StatsTotals>('/stats/totals'),
+    projects: () => fetchApi<ProjectStats[]>('/stats/projects'),
+    daily: (start: string, end: string, tzOffset: number) =>
+      fetchApi<DailyStats[]>(`/stats/daily?start=${start}&end=${end}&tz_offset=${tzOffset}`),
+    topTodos: (limit = 5) => fetchApi<TodoStats[]>(`/stats/top-todos?limit=${limit}`),
+  },
+  sessions: {
+    getCurrent: () => fetchApi<ActiveSession | null>('/sessions/current'),
+    start: (data: { todo_id: number }) =>
+      fetchApi<ActiveSession>('/sessions/start', {
+        method: 'POST',
+        body: JSON.stringify(data)
+      }),
+    pause: () => fetchApi<ActiveSession>('/sessions/pause', { method: 'POST' }),
+    resume: () => fetchApi<ActiveSession>('/sessions/resume', { method: 'POST' }),
+    stop: () => fetchApi<TimeEntry>('/sessions/stop', { method: 'POST' }),
+  },
   pomodoroSettings: {
     get: () => fetchApi<PomodoroSettings>('/settings'),
     update: (data: PomodoroSettings) =>
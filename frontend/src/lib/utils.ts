@@ -79,6 +79,13 @@ export function getDateString(date: Date): string {
   return date.toISOString().split('T')[0];
 }
 
+// YYYY-MM-DD des lokalen Tages (toISOString liefert den UTC-Tag)
+export function getLocalDateString(date: Date): string {
+  const month = (date.getMonth() + 1).toString().padStart(2, '0');
+  const day = date.getDate().toString().padStart(2, '0');
+  return `${date.getFullYear()}-${month}-${day}`;
+}
+
 export function getShortDate(date: Date): string {
   return new Date(date).toLocaleDateString('de-DE', {
     day: '2-digit',
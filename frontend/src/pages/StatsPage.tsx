@@ -1,128 +1,101 @@
-import { useMemo } from 'react';
+import { useEffect, useMemo, useState } from 'react';
 import { useStore } from '@/context/StoreContext';
 import { useTheme } from '@/context/ThemeContext';
+import { api } from '@/lib/api';
 import { COLORS } from '@/lib/utils';
-import { formatDuration, getDaysArray, getDateString, getShortDate, getStartOfDay } from '@/lib/utils';
+import { formatDuration, getDaysArray, getLocalDateString, getShortDate } from '@/lib/utils';
+import type { DailyStats, ProjectStats, StatsTotals, TodoStats } from '@/types';
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import { TrendingUp, Target, Flame, Clock } from 'lucide-react';
+import Loading from '@/components/Loading';
 import StatCard from '@/components/StatCard';
 import styles from './StatsPage.module.css';
 
+// Längster Zeitraum, den /stats/daily auf einmal liefert (für die Streak)
+const STREAK_DAYS = 366;
+
+interface Stats {
+  today: StatsTotals;
+  totals: StatsTotals;
+  projects: ProjectStats[];
+  daily: DailyStats[];
+  topTodos: TodoStats[];
+}
+
+const colorHex = (name: string) => COLORS.find(c => c.name === name)?.hex || '#6366f1';
+
 export default function StatsPage() {
-  const { timeEntries, projects, todos } = useStore();
+  const { timeEntries } = useStore();
   const { theme } = useTheme();
+  const [stats, setStats] = useState<Stats | null>(null);
 
-  // Heute Statistik
-  const todayStats = useMemo(() => {
-    const today = getStartOfDay(new Date());
-    const todayEntries = timeEntries.filter(entry => {
-      const entryDate = getStartOfDay(new Date(entry.timestamp));
-      return entryDate.getTime() === today.getTime();
-    });
-
-    return {
-      totalDuration: todayEntries.reduce((sum, entry) => sum + entry.duration, 0),
-      sessionCount: todayEntries.length,
-    };
+  // Aggregiert auf dem Server statt aus der kompletten Historie im Browser;
+  // neu laden, wenn sich die Einträge ändern
+  useEffect(() => {
+    const tzOffset = new Date().getTimezoneOffset();
+    const days = getDaysArray(STREAK_DAYS);
+    Promise.all([
+      api.stats.today(tzOffset),
+      api.stats.totals(),
+      api.stats.projects(),
+      api.stats.daily(getLocalDateString(days[0]), getLocalDateString(days[days.length - 1]), tzOffset),
+      api.stats.topTodos(5),
+    ])
+      .then(([today, totals, projects, daily, topTodos]) => setStats({ today, totals, projects, daily, topTodos }))
+      .catch((error) => console.error('Failed to fetch stats:', error));
   }, [timeEntries]);
 
+  // Heute Statistik
+  const todayStats = {
+    totalDuration: stats?.today.total_duration ?? 0,
+    sessionCount: stats?.today.session_count ?? 0,
+  };
+
   // Gesamtzeit pro Projekt (Pie Chart Data)
-  const projectData = useMemo(() => {
-    const projectMap: Record<number, number> = {};
+  const projectData = useMemo(() => (stats?.projects ?? []).map(project => ({
+    name: project.name,
+    value: project.total_duration,
+    color: colorHex(project.color),
+  })), [stats]);
 
-    timeEntries.forEach(entry => {
-      projectMap[entry.project_id] = (projectMap[entry.project_id] || 0) + entry.duration;
+  // Dauer pro lokalem Tag (YYYY-MM-DD)
+  const dayMap = useMemo(() => {
+    const map: Record<string, number> = {};
+    (stats?.daily ?? []).forEach(day => {
+      map[day.date] = day.total_duration;
     });
-
-    return Object.entries(projectMap).map(([projectId, duration]) => {
-      const project = projects.find(p => p.id === Number(projectId));
-      const colorHex = COLORS.find(c => c.name === project?.color)?.hex || '#6366f1';
-      
-      return {
-        name: project?.name || 'Unknown',
-        value: duration,
-        color: colorHex,
-      };
-    }).sort((a, b) => b.value - a.value);
-  }, [timeEntries, projects]);
+    return map;
+  }, [stats]);
 
   // Zeitverlauf letzte 7 Tage (Bar Chart Data)
-  const weekData = useMemo(() => {
-    const days = getDaysArray(7);
-    const dayMap: Record<string, number> = {};
-
-    timeEntries.forEach(entry => {
-      const entryDate = getDateString(new Date(entry.timestamp));
-      dayMap[entryDate] = (dayMap[entryDate] || 0) + entry.duration;
-    });
-
-    return days.map(date => ({
-      date: getShortDate(date),
-      duration: dayMap[getDateString(date)] || 0,
-    }));
-  }, [timeEntries]);
+  const weekData = useMemo(() => getDaysArray(7).map(date => ({
+    date: getShortDate(date),
+    duration: dayMap[getLocalDateString(date)] || 0,
+  })), [dayMap]);
 
   // Top 5 Tasks nach Dauer
-  const topTasks = useMemo(() => {
-    const taskMap: Record<number, number> = {};
-
-    timeEntries.forEach(entry => {
-      taskMap[entry.todo_id] = (taskMap[entry.todo_id] || 0) + entry.duration;
-    });
-
-    return Object.entries(taskMap)
-      .map(([todoId, duration]) => {
-        const todo = todos.find(t => t.id === Number(todoId));
-        const project = projects.find(p => p.id === todo?.project_id);
-        const colorHex = COLORS.find(c => c.name === project?.color)?.hex || '#6366f1';
+  const topTasks = useMemo(() => (stats?.topTodos ?? []).map(todo => ({
+    id: todo.todo_id,
+    title: todo.title,
+    projectName: todo.project_name,
+    duration: todo.total_duration,
+    color: colorHex(todo.project_color),
+  })), [stats]);
 
-        return {
-          id: Number(todoId),
-          title: todo?.title || 'Unknown',
-          projectName: project?.name || '',
-          duration,
-          color: colorHex,
-        };
-      })
-      .sort((a, b) => b.duration - a.duration)
-      .slice(0, 5);
-  }, [timeEntries, todos, projects]);
-
-  // Streak Berechnung (Tage in Folge getrackt)
+  // Streak Berechnung (Tage in Folge getrackt, heute oder gestern beginnend)
   const streak = useMemo(() => {
-    if (timeEntries.length === 0) return 0;
-
-    const uniqueDates = Array.from(
-      new Set(
-        timeEntries.map(entry => getDateString(new Date(entry.timestamp)))
-      )
-    ).sort().reverse();
-
-    let currentStreak = 0;
-    const today = getDateString(new Date());
-    const yesterday = getDateString(new Date(Date.now() - 86400000));
-
-    // Check if today or yesterday has entries
-    if (uniqueDates[0] !== today && uniqueDates[0] !== yesterday) {
-      return 0;
-    }
-
-    let expectedDate = new Date();
-    if (uniqueDates[0] === yesterday) {
-      expectedDate = new Date(Date.now() - 86400000);
+    const expectedDate = new Date();
+    if (!dayMap[getLocalDateString(expectedDate)]) {
+      expectedDate.setDate(expectedDate.getDate() - 1);
     }
 
-    for (const dateStr of uniqueDates) {
-      if (dateStr === getDateString(expectedDate)) {
-        currentStreak++;
-        expectedDate.setDate(expectedDate.getDate() - 1);
-      } else {
-        break;
-      }
+    let currentStreak = 0;
+    while (dayMap[getLocalDateString(expectedDate)]) {
+      currentStreak++;
+      expectedDate.setDate(expectedDate.getDate() - 1);
     }
-
     return currentStreak;
-  }, [timeEntries]);
+  }, [dayMap]);
 
   const maxTaskDuration = topTasks.length > 0 ? topTasks[0].duration : 1;
 
@@ -141,7 +114,9 @@ export default function StatsPage() {
         <p className={styles.subtitle}>Your productivity insights</p>
       </div>
 
-      {timeEntries.length === 0 ? (
+      {!stats ? (
+        <Loading text="Loading statistics..." />
+      ) : stats.totals.session_count === 0 ? (
         <div className={styles.empty}>
           <Clock size={48} />
           <p>No data yet</p>
@@ -300,7 +275,7 @@ export default function StatsPage() {
                 <TrendingUp size={20} className={styles.totalIcon} />
                 <div>
                   <div className={styles.totalValue}>
-                    {formatDuration(timeEntries.reduce((sum, e) => sum + e.duration, 0))}
+                    {formatDuration(stats.totals.total_duration)}
                   </div>
                   <div className={styles.totalLabel}>Total Tracked</div>
                 </div>
@@ -308,7 +283,7 @@ export default function StatsPage() {
               <div className={styles.totalItem}>
                 <Target size={20} className={styles.totalIcon} />
                 <div>
-                  <div className={styles.totalValue}>{timeEntries.length}</div>
+                  <div className={styles.totalValue}>{stats.totals.session_count}</div>
                   <div className={styles.totalLabel}>Total Sessions</div>
                 </div>
               </div>
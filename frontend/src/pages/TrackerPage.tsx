@@ -1,32 +1,61 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { useStore } from '@/context/StoreContext';
 import { api } from '@/lib/api';
 import Timer from '@/components/Timer';
 import TodoSelector from '@/components/TodoSelector';
 import TimeEntryList from '@/components/TimeEntryList';
 import Card from '@/components/ui/Card';
+import type { ActiveSession } from '@/types';
 import styles from './TrackerPage.module.css';
 
 export default function TrackerPage() {
   const { pomodoroSettings, refreshTimeEntries, todos } = useStore();
   const [selectedTodoId, setSelectedTodoId] = useState<number | null>(null);
+  const [activeSession, setActiveSession] = useState<ActiveSession | null>(null);
 
-  const handleTimerComplete = async (elapsedSeconds: number) => {
+  // Die Session läuft auf dem Server weiter, auch wenn der Tab geschlossen wurde
+  useEffect(() => {
+    api.sessions.getCurrent()
+      .then((session) => {
+        if (session) {
+          setActiveSession(session);
+          setSelectedTodoId(session.todo_id);
+        }
+      })
+      .catch((error) => console.error('Failed to load timer session:', error));
+  }, []);
+
+  const handleTimerStart = async () => {
     if (!selectedTodoId) {
       alert('Please select a task to track time for!');
-      return;
+      return false;
     }
 
-    const selectedTodo = todos.find(t => t.id === selectedTodoId);
-    if (!selectedTodo) return;
+    try {
+      await api.sessions.start({ todo_id: selectedTodoId });
+      return true;
+    } catch (error) {
+      console.error('Failed to start timer session:', error);
+      alert('Failed to start timer');
+      return false;
+    }
+  };
+
+  const handleTimerPause = () => {
+    api.sessions.pause().catch((error) => console.error('Failed to pause timer session:', error));
+  };
+
+  const handleTimerResume = () => {
+    api.sessions.resume().catch((error) => console.error('Failed to resume timer session:', error));
+  };
 
+  const handleTimerComplete = async () => {
     try {
-      await api.timeEntries.create({
-        todo_id: selectedTodoId,
-        duration: elapsedSeconds,
-      });
+      // Der Server berechnet die Dauer und legt den TimeEntry an
+      const entry = await api.sessions.stop();
+      setActiveSession(null);
       await refreshTimeEntries();
-      console.log(`✅ Time entry created: ${elapsedSeconds}s for task #${selectedTodoId}`);
+      console.log(`✅ Time entry created: ${entry.duration}s for task #${entry.todo_id}`);
     } catch (error) {
       console.error('Failed to create time entry:', error);
       alert('Failed to save time entry');
@@ -50,6 +79,10 @@ export default function TrackerPage() {
           <Timer
             focusDuration={pomodoroSettings.focus_duration}
             breakDuration={pomodoroSettings.break_duration}
+            session={activeSession}
+            onStart={handleTimerStart}
+            onPause={handleTimerPause}
+            onResume={handleTimerResume}
             onComplete={handleTimerComplete}
           />
         </div>
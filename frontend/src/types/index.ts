@@ -22,6 +22,44 @@ export interface TimeEntry {
   timestamp: string;
 }
 
+export interface TimeEntryPage {
+  items: TimeEntry[];
+  next_cursor: string | null;
+}
+
+export interface StatsTotals {
+  total_duration: number; // Sekunden
+  session_count: number;
+}
+
+export interface ProjectStats extends StatsTotals {
+  project_id: number;
+  name: string;
+  color: string;
+}
+
+export interface DailyStats extends StatsTotals {
+  date: string; // YYYY-MM-DD, lokaler Tag
+}
+
+export interface TodoStats {
+  todo_id: number;
+  title: string;
+  project_id: number;
+  project_name: string;
+  project_color: string;
+  total_duration: number;
+}
+
+export interface ActiveSession {
+  todo_id: number;
+  project_id: number;
+  started_at: string;
+  resumed_at: string | null;
+  running: boolean;
+  duration: number; // Sekunden bis zur Antwort
+}
+
 export interface PomodoroSettings {
   id?: number;
   focus_duration: number;